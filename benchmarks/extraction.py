@@ -0,0 +1,170 @@
+"""Benchmark count parsing and ID extraction against the per-spider copies
+
+    python benchmarks/extraction.py
+    python benchmarks/extraction.py --values 200000
+
+Checks that pinterest_scraper.utils returns what the previous copies in the
+spiders and DataValidationPipeline returned for the count and URL shapes
+found on Pinterest pages, lists the inputs where they deliberately differ,
+then times both on a synthetic page's worth of counts.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pinterest_scraper.utils import (  # noqa: E402
+    extract_board_id, extract_result_id, parse_count, parse_number, parse_numbers
+)
+
+
+def legacy_spider_number(text):
+    """parse_number() of the pins, boards and search spiders"""
+    if not text:
+        return 0
+    text = str(text).strip().replace(',', '')
+    for suffix, multiplier in (('k', 1000), ('m', 1000000), ('b', 1000000000)):
+        if text.lower().endswith(suffix):
+            try:
+                return int(float(text[:-1]) * multiplier)
+            except ValueError:
+                return 0
+    numbers = re.findall(r'\d+', text)
+    return int(numbers[0]) if numbers else 0
+
+
+def legacy_pipeline_number(value):
+    """DataValidationPipeline.parse_number()"""
+    if isinstance(value, (int, float)):
+        return value
+    if not value or value == 'N/A':
+        return 0
+    value_str = str(value).strip().replace(',', '')
+    for suffix, multiplier in (('k', 1000), ('m', 1000000), ('b', 1000000000)):
+        if value_str.lower().endswith(suffix):
+            try:
+                return int(float(value_str[:-1]) * multiplier)
+            except ValueError:
+                return 0
+    try:
+        return int(float(value_str))
+    except ValueError:
+        return 0
+
+
+def legacy_board_id(board_url):
+    """PinterestBoardsSpider.extract_board_id()"""
+    if '/board/' in board_url:
+        return board_url.split('/board/')[1].rstrip('/').split('/')[0] + '/'
+    return ""
+
+
+def legacy_result_id(result_url, search_type):
+    """PinterestSearchSpider.extract_result_id()"""
+    if search_type == "pins":
+        match = re.search(r'/pin/(\d+)/', result_url)
+    elif search_type == "boards":
+        match = re.search(r'/([^/]+/[^/]+)/?$', result_url.rstrip('/'))
+    else:
+        match = re.search(r'/([^/]+)/?$', result_url.rstrip('/'))
+    return match.group(1) if match else ""
+
+
+# Inputs whose result changed on purpose: (input, spiders, pipeline, now)
+DIFFERENCES = [
+    ('1.5M followers', 1, 0, 1500000),
+    ('3.2k saves', 3, 0, 3200),
+    ('12 Pins', 12, 0, 12),
+    ('10k+', 10, 0, 10000),
+]
+
+
+def count_corpus(size, seed=0):
+    """Count texts as pages render them"""
+    rng = random.Random(seed)
+    words = ['', ' Pins', ' pins', ' followers', ' saves', ' likes', ' comments', ' following']
+    values = []
+    for _ in range(size):
+        number = rng.choice([rng.randint(0, 999), rng.randint(1000, 999999), rng.randint(10 ** 6, 10 ** 9)])
+        shape = rng.randrange(4)
+        if shape == 0:
+            text = str(number)
+        elif shape == 1:
+            text = f'{number:,}'
+        elif shape == 2 and number >= 1000:
+            value, suffix = next((number / size, suffix) for size, suffix in ((10 ** 9, 'B'), (10 ** 6, 'M'), (10 ** 3, 'K')) if number >= size)
+            text = f'{value:.1f}'.rstrip('0').rstrip('.') + rng.choice([suffix, suffix.lower()])
+        else:
+            text = f'{number:,}'
+        values.append(text + (rng.choice(words) if shape == 3 else ''))
+    return values
+
+
+def check_parity(values):
+    failures = []
+    for value in values:
+        expected = legacy_spider_number(value)
+        if parse_number(value) != expected:
+            failures.append((value, expected, parse_number(value)))
+        # Numbers the pipeline could parse (no trailing words) must agree with it too
+        if value[-1:].isdigit() or value[-1:].lower() in 'kmb':
+            if parse_number(value) != legacy_pipeline_number(value):
+                failures.append((value, legacy_pipeline_number(value), parse_number(value)))
+
+    urls = {
+        'pins': ['https://www.pinterest.com/pin/1234567890/', '/pin/42/', '/pin/abc/'],
+        'boards': ['https://www.pinterest.com/alice/recipes/', '/alice/recipes/', '/alice/recipes'],
+        'users': ['https://www.pinterest.com/alice/', '/alice/', '/alice'],
+    }
+    for search_type, examples in urls.items():
+        for url in examples:
+            if extract_result_id(url, search_type) != legacy_result_id(url, search_type):
+                failures.append((url, legacy_result_id(url, search_type), extract_result_id(url, search_type)))
+    return failures
+
+
+def best_of(runs, function, *args):
+    timings = []
+    for _ in range(runs):
+        parse_count.cache_clear()
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--values', type=int, default=100000, help="Counts to parse")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    failures = check_parity(count_corpus(20000, seed=1))
+    if failures:
+        sys.exit(f"{len(failures)} mismatches, e.g. {failures[:10]}")
+    print("Parity: ok")
+    print("Deliberate differences (input: spiders / pipeline -> now):")
+    for value, spiders, pipeline, now in DIFFERENCES:
+        assert (legacy_spider_number(value), legacy_pipeline_number(value), parse_number(value)) == (spiders, pipeline, now), value
+        print(f"  {value!r:18} {spiders} / {pipeline} -> {now}")
+    board_url = 'https://www.pinterest.com/board/alice/recipes/'
+    print(f"  board_id of {board_url}: {legacy_board_id(board_url)!r} -> {extract_board_id(board_url)!r}")
+
+    # A page's worth of counts repeats the same few hundred strings
+    values = count_corpus(args.values, seed=2)
+    rng = random.Random(3)
+    page_values = [rng.choice(values[:500]) for _ in range(args.values)]
+    for label, corpus in (('distinct counts', values), ('repeated counts', page_values)):
+        legacy_time = best_of(args.runs, lambda: [legacy_spider_number(value) for value in corpus])
+        unified_time = best_of(args.runs, parse_numbers, corpus)
+        print(f"{label:16}: {len(corpus)} values, per-spider copy {legacy_time * 1000:7.1f} ms, "
+              f"shared core {unified_time * 1000:7.1f} ms ({legacy_time / unified_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark search results extraction on a large search page
+
+    python benchmarks/search_page.py                        # synthetic 2,000-result page
+    python benchmarks/search_page.py --page saved.html      # a saved search page
+    python benchmarks/search_page.py --results 5000 --search-type boards
+
+Compares the previous extraction (a css() query per selector and result,
+plus a serializing count of the visible results) with the single-pass
+extraction of pinterest_scraper.search_results, after checking that both
+return the same fields for every result. With selectolax installed, the
+single pass of SelectolaxBackend is checked and timed too.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from parsel import Selector
+from scrapy.http import HtmlResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pinterest_scraper.parsers import SelectolaxBackend  # noqa: E402
+from pinterest_scraper.search_results import (  # noqa: E402
+    RESULT_SELECTORS, result_containers, result_fields, visible_results_count
+)
+
+
+def legacy_fields(result):
+    """Per-result extraction as PinterestSearchSpider.extract_search_result did it"""
+    fields = {'href': result.css('a::attr(href)').get(), 'title': None, 'description': '', 'thumbnail': '', 'creator': ''}
+    for selector in ('::attr(alt)', '::attr(title)', '::text', 'img::attr(alt)', 'h3::text', 'h4::text', '.title::text'):
+        title = result.css(selector).get()
+        if title and title.strip() and len(title.strip()) > 2:
+            fields['title'] = title.strip()
+            break
+    for selector in ('.description::text', '.desc::text', 'p::text', 'span::text'):
+        description = result.css(selector).get()
+        if description and description.strip() and len(description.strip()) > 5:
+            fields['description'] = description.strip()
+            break
+    for selector in ('img::attr(src)', '::attr(data-src)', '.image img::attr(src)'):
+        thumbnail = result.css(selector).get()
+        if thumbnail and ('pinimg' in thumbnail or 'pinterest' in thumbnail):
+            fields['thumbnail'] = thumbnail
+            break
+    for selector in ('.creator::text', '.author::text', '.user-name::text', '.pinner::text'):
+        creator = result.css(selector).get()
+        if creator and creator.strip():
+            fields['creator'] = creator.strip()
+            break
+    return fields
+
+
+def legacy_extract(html, search_type):
+    selector = Selector(text=html)
+    total = len(selector.css('[data-test-id], .Pin, .Board, .User').getall())
+    for css in RESULT_SELECTORS[search_type]:
+        results = selector.css(css)
+        if results:
+            return total, [legacy_fields(result) for result in results]
+    return total, []
+
+
+def single_pass_extract(html, search_type):
+    root = Selector(text=html).root
+    total = visible_results_count(root)
+    _, results = result_containers(root, search_type)
+    return total, [result_fields(result) for result in results]
+
+
+def backend_extract(backend, html, search_type):
+    response = HtmlResponse('https://www.pinterest.com/search/', body=html.encode('utf-8'), encoding='utf-8')
+    total = backend.visible_results_count(response)
+    _, results = backend.search_results(response, search_type)
+    return total, [backend.result_fields(result) for result in results]
+
+
+def synthetic_page(results, search_type, seed=0):
+    """A search page shaped like Pinterest's rendered grid"""
+    rng = random.Random(seed)
+    path = {'pins': '/pin/{}/', 'boards': '/board/user{0}/board-{0}/', 'users': '/user{}/'}[search_type]
+    cards = []
+    for index in range(results):
+        href = path.format(10 ** 12 + index)
+        words = ' '.join(rng.choice(['cozy', 'modern', 'living', 'room', 'ideas', 'diy', 'kitchen']) for _ in range(6))
+        cards.append(
+            f'<div data-test-id="pin" class="Pin pinWrapper" data-index="{index}">'
+            f'<div class="image"><a href="{href}" aria-label="{words}">'
+            f'<img src="https://i.pinimg.com/236x/{index:08x}.jpg" alt="{words}" loading="lazy"></a></div>'
+            f'<div class="meta"><h3>{words.title()}</h3><p class="description"> {words} for every season </p>'
+            f'<span class="creator">creator{index % 97}</span>'
+            f'<div data-test-id="pin-stats"><span>{rng.randint(0, 9999)} saves</span></div></div></div>'
+        )
+    return (
+        '<html><head><title>Search</title>' + '<script>var x = 1;</script>' * 50 + '</head><body>'
+        '<div class="related-search">cozy living room</div><div id="grid">' + ''.join(cards) + '</div></body></html>'
+    )
+
+
+def best_of(runs, function, *args):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page', help="Saved search page (HTML); default: a synthetic page")
+    parser.add_argument('--results', type=int, default=2000, help="Results on the synthetic page")
+    parser.add_argument('--search-type', default='pins', choices=sorted(RESULT_SELECTORS))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, encoding='utf-8') as file:
+            html = file.read()
+    else:
+        html = synthetic_page(args.results, args.search_type)
+
+    legacy_time, legacy = best_of(args.runs, legacy_extract, html, args.search_type)
+    single_time, single = best_of(args.runs, single_pass_extract, html, args.search_type)
+    if legacy != single:
+        mismatches = [index for index, (a, b) in enumerate(zip(legacy[1], single[1])) if a != b]
+        sys.exit(f"Results differ: totals {legacy[0]} vs {single[0]}, results {mismatches[:10]}")
+
+    print(f"Page: {len(html) / 1e6:.1f} MB, {len(single[1])} results, {single[0]} visible result elements")
+    print(f"css() per selector : {legacy_time * 1000:8.1f} ms")
+    print(f"single pass        : {single_time * 1000:8.1f} ms  ({legacy_time / single_time:.1f}x)")
+
+    try:
+        backend = SelectolaxBackend()
+    except ImportError:
+        backend = None  # selectolax not installed
+    if backend is not None:
+        lexbor_time, lexbor = best_of(args.runs, backend_extract, backend, html, args.search_type)
+        if lexbor != single:
+            sys.exit(f"selectolax results differ: totals {single[0]} vs {lexbor[0]}")
+        print(f"single pass, lexbor: {lexbor_time * 1000:8.1f} ms  ({legacy_time / lexbor_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark URL validation, canonicalization and dedupe on pin items
+
+    python benchmarks/urls.py
+    python benchmarks/urls.py --items 200000 --boards 5000
+
+Runs generated pin items through DataValidationPipeline and
+DuplicateFilterPipeline, once as they were (URL regex compiled per call,
+duplicates keyed on the raw ID/URL) and once with pinterest_scraper.urls,
+and reports items/sec and the duplicates each caught. Board and pinner URLs
+follow a Zipf-like distribution, and pins come back under the URL variants
+seen on Pinterest pages (relative hrefs, country domains, tracking query
+strings, /board/ paths).
+
+The spiders canonicalize the URLs of an item when they build it, so the
+pipelines get canonical URLs; that spider-side step is timed on its own,
+and the pipelines are also run on the raw URLs, as for items from elsewhere.
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pinterest_scraper.items import PinterestPinItem  # noqa: E402
+from pinterest_scraper.pipelines import DataValidationPipeline, DuplicateFilterPipeline  # noqa: E402
+from pinterest_scraper.urls import (  # noqa: E402
+    BASE_URL, cache_info, canonical_url, is_valid_url, rebuild_url, url_key
+)
+
+URL_FIELDS = ('pin_url', 'board_url', 'pinner_url')
+
+
+class LegacyValidationPipeline(DataValidationPipeline):
+    """URL handling of DataValidationPipeline before pinterest_scraper.urls"""
+
+    def is_valid_url(self, url):
+        url_pattern = re.compile(
+            r'^https?://'
+            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'
+            r'localhost|'
+            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
+            r'(?::\d+)?'
+            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+        return url_pattern.match(url) is not None
+
+    def canonicalize_url_fields(self, adapter, fields):
+        pass
+
+
+class LegacyDuplicateFilterPipeline(DuplicateFilterPipeline):
+    def get_unique_identifier(self, adapter, item_type):
+        return adapter.get('pin_id') or adapter.get('pin_url', '')
+
+
+def zipf_choice(rng, population, weights):
+    return rng.choices(population, cum_weights=weights)[0]
+
+
+def pin_url_variant(rng, pin_id):
+    host = rng.choice(['https://www.pinterest.com', 'https://pinterest.com', 'https://de.pinterest.com', ''])
+    query = rng.choice(['', '', '?mt=login', '?rs=rp'])
+    return f"{host}/pin/{pin_id}/{query}"
+
+
+def board_url_variant(rng, user, board):
+    return rng.choice([
+        f"https://www.pinterest.com/{user}/{board}/",
+        f"/{user}/{board}/",
+        f"https://www.pinterest.com/board/{user}/{board}/",
+        f"https://pinterest.com/{user}/{board}",
+    ])
+
+
+def generate_items(count, boards, repeat=0.2, seed=0):
+    """Pin items; a repeat share of them are pins seen before, under another URL"""
+    rng = random.Random(seed)
+    users = [f"user{index}" for index in range(max(1, boards // 3))]
+    board_list = [(rng.choice(users), f"board-{index}") for index in range(boards)]
+    board_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(boards)))
+    user_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(users))))
+    seen = []
+    items = []
+    for index in range(count):
+        if seen and rng.random() < repeat:
+            pin_id, (user, board) = rng.choice(seen)
+        else:
+            pin_id, (user, board) = 10 ** 15 + index, zipf_choice(rng, board_list, board_weights)
+            seen.append((pin_id, (user, board)))
+        pinner = zipf_choice(rng, users, user_weights)
+        items.append({
+            'pin_id': str(pin_id), 'title': 'Cozy living room', 'image_url': 'https://i.pinimg.com/236x/a.jpg',
+            'pin_url': pin_url_variant(rng, pin_id),
+            'board_url': board_url_variant(rng, user, board),
+            'pinner_url': rng.choice([f"https://www.pinterest.com/{pinner}/", f"/{pinner}/"]),
+            'pin_likes': f"{rng.randint(1, 999)}", 'pin_repins': f"{rng.randint(1, 99)}.{rng.randint(0, 9)}k",
+        })
+    return items
+
+
+def spider_items(items):
+    """The items with their URLs canonicalized, as the spiders build them"""
+    return [dict(item, **{field: canonical_url(item[field]) for field in URL_FIELDS}) for item in items]
+
+
+def run(items, validation, dedupe, spider):
+    started = time.perf_counter()
+    kept = 0
+    for fields in items:
+        item = validation.process_item(PinterestPinItem(fields), spider)
+        if dedupe.process_item(item, spider) is not None:
+            kept += 1
+    return time.perf_counter() - started, kept
+
+
+class BenchmarkSpider:
+    logger = logging.getLogger('benchmark')
+    logger.disabled = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--boards', type=int, default=2000, help="Distinct boards the pins are saved to")
+    parser.add_argument('--repeat', type=float, default=0.2, help="Share of items that are pins seen before")
+    args = parser.parse_args()
+
+    items = generate_items(args.items, args.boards, args.repeat)
+    spider = BenchmarkSpider()
+    started = time.perf_counter()
+    built = spider_items(items)
+    spider_time = time.perf_counter() - started
+    legacy_time, legacy_kept = run(items, LegacyValidationPipeline(), LegacyDuplicateFilterPipeline(), spider)
+    new_time, new_kept = run(built, DataValidationPipeline(), DuplicateFilterPipeline(), spider)
+    raw_time, raw_kept = run(items, DataValidationPipeline(), DuplicateFilterPipeline(), spider)
+    unique = len({url_key(item['pin_url']) for item in items})
+
+    print(f"{len(items)} pin items, {unique} distinct pins, {args.boards} boards")
+    print(f"pipelines, before urls.py    : {len(items) / legacy_time:10,.0f} items/sec, {legacy_kept} kept")
+    print(f"pipelines, spider items      : {len(items) / new_time:10,.0f} items/sec, {new_kept} kept")
+    print(f"pipelines, raw URLs          : {len(items) / raw_time:10,.0f} items/sec, {raw_kept} kept")
+    print(f"spiders, canonicalizing items: {len(items) / spider_time:10,.0f} items/sec")
+    for name, info in cache_info().items():
+        if info.hits or info.misses:
+            print(f"  {name:14} {info.hits / (info.hits + info.misses):6.1%} cache hits, {info.currsize} entries")
+
+    # URL validation alone, on the pin URLs of the items
+    urls = [item['pin_url'] for item in built]
+    legacy_valid = LegacyValidationPipeline().is_valid_url
+    is_valid_url.cache_clear()
+    print(f"is_valid_url : compiled per call {rate(urls, legacy_valid):10,.0f}/sec, "
+          f"precompiled and cached {rate(urls, is_valid_url):10,.0f}/sec")
+
+    # Spider side: absolute URLs of extracted hrefs
+    hrefs = [item['board_url'] for item in items] + [item['pin_url'] for item in items]
+    rebuild_url.cache_clear()
+    print(f"hrefs        : urljoin {rate(hrefs, lambda href: urljoin(BASE_URL, href)):10,.0f}/sec, "
+          f"canonical_url {rate(hrefs, canonical_url):10,.0f}/sec")
+
+
+def rate(values, function):
+    started = time.perf_counter()
+    for value in values:
+        function(value)
+    return len(values) / (time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# In-process Python API
+#
+#   from pinterest_scraper.api import scrape_pins
+#
+#   async for item in scrape_pins('home decor', max_pins=50):
+#       ...
+#
+# Runs the project's spiders inside the caller's asyncio event loop, with
+# Twisted's asyncio reactor installed on that loop, and hands items over
+# through a bounded queue. When the consumer falls behind, the spider's item
+# processing waits for room in the queue instead of buffering the crawl in
+# memory. Closing the generator early (await items.aclose() after breaking
+# out of the loop) stops the crawl.
+#
+# The reactor keeps running between crawls, but its thread pool (DNS
+# lookups) is stopped when the last crawl ends: its threads are not daemon
+# threads and would keep the interpreter from exiting after asyncio.run().
+#
+# The CSV export pipeline is left out, items come back as scraped; pass
+# settings={'ITEM_PIPELINES': {...}} to run pipelines as well.
+
+import asyncio
+
+from scrapy import signals
+from scrapy.crawler import AsyncCrawlerRunner
+from scrapy.settings import Settings
+from scrapy.utils.reactor import install_reactor
+from twisted.internet.defer import Deferred
+
+
+SETTINGS_MODULE = 'pinterest_scraper.settings'
+
+# Queue marker for the end of a crawl
+_DONE = object()
+
+# Crawls running in this process
+_running = 0
+
+
+def project_settings(settings=None):
+    """Project settings for in-process crawls, overridden by settings
+
+    Loaded from the package rather than a scrapy.cfg, so the spiders are
+    found whatever the caller's working directory is.
+    """
+    project = Settings()
+    project.setmodule(SETTINGS_MODULE, priority='project')
+    project.set('ITEM_PIPELINES', {}, priority='project')
+    project.setdict(settings or {}, priority='cmdline')
+    return project
+
+
+def start_reactor(settings):
+    """Install the asyncio reactor on the running event loop and start it"""
+    install_reactor(settings.get('TWISTED_REACTOR'))
+    from twisted.internet import reactor
+
+    loop = asyncio.get_running_loop()
+    if getattr(reactor, '_asyncioEventloop', loop) is not loop:
+        raise RuntimeError("The Twisted reactor is bound to another event loop; use one event loop per process")
+    if not reactor.running:
+        # Fires the startup triggers (thread pool for DNS lookups, etc.);
+        # the event loop itself is already running
+        reactor.startRunning(installSignalHandlers=False)
+
+
+def stop_thread_pool():
+    """Stop the reactor's thread pool; the next crawl that needs one starts a new pool"""
+    from twisted.internet import reactor
+    pool = reactor.threadpool
+    if pool is None:
+        return
+    # Detach the pool first so reactor.getThreadPool() creates a fresh one,
+    # and drop the trigger that would stop this one at reactor shutdown
+    if reactor.threadpoolShutdownID is not None:
+        reactor.removeSystemEventTrigger(reactor.threadpoolShutdownID)
+        reactor.threadpoolShutdownID = None
+    reactor.threadpool = None
+    pool.stop()
+
+
+async def crawl(spider, settings=None, max_queue=100, **spider_args):
+    """Run a spider in-process and yield its items as they are scraped"""
+    global _running
+    settings = project_settings(settings)
+    start_reactor(settings)
+    _running += 1
+    items = _crawl(spider, settings, max_queue, spider_args)
+    try:
+        async for item in items:
+            yield item
+    finally:
+        await items.aclose()
+        _running -= 1
+        if not _running:
+            stop_thread_pool()
+
+
+async def _crawl(spider, settings, max_queue, spider_args):
+    runner = AsyncCrawlerRunner(settings)
+    crawler = runner.create_crawler(spider)
+    queue = asyncio.Queue(max_queue)
+    closed = False
+
+    async def item_scraped(item):
+        # Scrapy awaits this handler, so a full queue holds the spider back
+        if not closed:
+            await queue.put(item)
+
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped, weak=False)
+
+    async def run():
+        try:
+            crawling = runner.crawl(crawler, **spider_args)
+            if isinstance(crawling, Deferred):  # older Scrapy
+                crawling = crawling.asFuture(asyncio.get_running_loop())
+            await crawling
+        finally:
+            await queue.put(_DONE)
+
+    async def discard():
+        while await queue.get() is not _DONE:
+            pass
+
+    task = asyncio.ensure_future(run())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            yield item
+        await task  # re-raise crawl errors
+    finally:
+        if not task.done():
+            # Consumer stopped early: unblock the spider and shut it down
+            closed = True
+            drain = asyncio.ensure_future(discard())
+            await crawler.stop_async()
+            await asyncio.gather(task, drain, return_exceptions=True)
+
+
+def scrape_pins(search_query=None, max_pins=20, **kwargs):
+    """Pins for a search query (or a queries_file=... bulk run)"""
+    return crawl('pinterest_pins', search_query=search_query, max_pins=max_pins, **kwargs)
+
+
+def scrape_boards(search_query=None, max_boards=20, **kwargs):
+    """Boards for a search query (or a queries_file=... bulk run)"""
+    return crawl('pinterest_boards', search_query=search_query, max_boards=max_boards, **kwargs)
+
+
+def search(search_query=None, search_type='pins', max_results=20, **kwargs):
+    """Search results (and today's trends) for a search query"""
+    return crawl(
+        'pinterest_search', search_query=search_query, search_type=search_type, max_results=max_results, **kwargs
+    )
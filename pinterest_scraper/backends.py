@@ -0,0 +1,414 @@
+# Shared request queue and dedupe set
+#
+# SharedScheduler keeps a crawl's pending requests and seen-request set in a
+# QueueBackend instead of each process's memory:
+#
+#   QUEUE_BACKEND = 'memory'                  in-process (default)
+#   QUEUE_BACKEND = 'redis://host:6379/0'     any Redis-protocol server
+#
+# With a network backend several hosts can run the same spider against one
+# queue: every pin page is scheduled once, and a node started mid-run simply
+# begins taking requests from the shared queue.
+#
+# Delivery is at-least-once. A request taken from the queue is reserved, not
+# removed: SharedQueueAckMiddleware acknowledges it once its download has
+# finished (or it was dropped or sent back to the queue), and reservations
+# not acknowledged within QUEUE_VISIBILITY_TIMEOUT seconds, e.g. those of a
+# host that died, go back to the queue. Enqueued requests are sent in
+# batches and acknowledgements ride along with the next reservation, so the
+# scheduler makes one or two pipelined round trips per batch instead of
+# several per request.
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.misc import load_object
+
+from pinterest_scraper.utils import request_from_record, request_key, request_to_record
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackendError(Exception):
+    """Error reply or protocol failure from a queue backend"""
+
+
+class QueueBackend:
+    """Priority queues of strings with reserve/ack delivery, plus sets of seen keys"""
+
+    def push(self, queue, item, priority=0):
+        self.push_many(queue, [(item, priority)])
+
+    def push_many(self, queue, items):
+        """Queue (item, priority) pairs"""
+        raise NotImplementedError
+
+    def reserve(self, queue, timeout, ack=()):
+        """(receipt, item) of the highest-priority item (FIFO among equal priorities), or None
+
+        The item stays reserved for timeout seconds; unless ack() is called
+        with its receipt by then, it is queued again. Receipts passed as ack
+        are acknowledged in the same call.
+        """
+        raise NotImplementedError
+
+    def ack(self, queue, receipts):
+        """Finish reserved items"""
+        raise NotImplementedError
+
+    def size(self, queue):
+        """Queued plus reserved items"""
+        raise NotImplementedError
+
+    def add(self, name, member):
+        """Add member to a set; True if it was not there yet"""
+        return self.add_many(name, [member])[0]
+
+    def add_many(self, name, members):
+        """add() for each member, in order"""
+        raise NotImplementedError
+
+    def clear(self, *names):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(QueueBackend):
+    """In-process backend; also the stand-in for RespBackend in local runs
+
+    Items live and die with the process, so a reservation is simply a pop.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.sets = {}
+        self.counter = itertools.count()
+
+    def push_many(self, queue, items):
+        heap = self.queues.setdefault(queue, [])
+        for item, priority in items:
+            heapq.heappush(heap, (-priority, next(self.counter), item))
+
+    def reserve(self, queue, timeout, ack=()):
+        heap = self.queues.get(queue)
+        if not heap:
+            return None
+        return None, heapq.heappop(heap)[2]
+
+    def ack(self, queue, receipts):
+        pass
+
+    def size(self, queue):
+        return len(self.queues.get(queue, ()))
+
+    def add_many(self, name, members):
+        seen = self.sets.setdefault(name, set())
+        added = []
+        for member in members:
+            added.append(member not in seen)
+            seen.add(member)
+        return added
+
+    def clear(self, *names):
+        for name in names:
+            self.queues.pop(name, None)
+            self.sets.pop(name, None)
+
+
+# Move the best item of a sorted set queue (KEYS[1]) to its reservations
+# (KEYS[2], scored by deadline), after putting expired reservations back.
+# A reservation's member is "<queue score>|<queue member>", its receipt.
+RESERVE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+for _, receipt in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 100)) do
+    local separator = string.find(receipt, '|', 1, true)
+    redis.call('ZADD', KEYS[1], string.sub(receipt, 1, separator - 1), string.sub(receipt, separator + 1))
+    redis.call('ZREM', KEYS[2], receipt)
+end
+local best = redis.call('ZPOPMIN', KEYS[1])
+if #best == 0 then
+    return false
+end
+local receipt = best[2] .. '|' .. best[1]
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[1]), receipt)
+return receipt
+"""
+
+
+class RespBackend(QueueBackend):
+    """Redis-protocol (RESP) backend using sorted sets and sets
+
+    Talks RESP over a plain socket, so it needs no client library and works
+    with Redis, Valkey, KeyDB or a local fake server (Lua scripting needed
+    for reserve()). Commands of one call are pipelined: written together,
+    then all replies read.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=10):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile('rb')
+        self.node = os.urandom(4).hex()  # tells apart members pushed by different hosts
+        self.counter = itertools.count()
+        if password:
+            self.command('AUTH', password)
+        if db:
+            self.command('SELECT', db)
+
+    @classmethod
+    def from_url(cls, url):
+        parsed = urlparse(url)
+        db = parsed.path.lstrip('/')
+        return cls(
+            host=parsed.hostname or 'localhost',
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=parsed.password,
+        )
+
+    @staticmethod
+    def encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(parts)
+
+    def pipeline(self, commands):
+        """Send several commands at once; their replies, in order"""
+        if not commands:
+            return []
+        self.sock.sendall(b''.join(self.encode(args) for args in commands))
+        replies, error = [], None
+        for _ in commands:
+            try:
+                replies.append(self.read_reply())
+            except BackendError as exc:
+                if self.reader.closed:
+                    raise
+                error = error or exc  # keep reading so the connection stays in sync
+                replies.append(None)
+        if error is not None:
+            raise error
+        return replies
+
+    def command(self, *args):
+        return self.pipeline([args])[0]
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            self.reader.close()
+            raise BackendError('Connection closed by server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise BackendError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode('utf-8')
+        if kind == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self.read_reply() for _ in range(length)]
+        raise BackendError(f'Unexpected reply: {line!r}')
+
+    @staticmethod
+    def reserved_key(queue):
+        return f'{queue}:reserved'
+
+    def push_many(self, queue, items):
+        # Members start with a time-ordered sequence, so equal priorities stay FIFO
+        args = ['ZADD', queue]
+        for item, priority in items:
+            sequence = time.time_ns() * 1000 + next(self.counter) % 1000
+            args += [-priority, f'{sequence:023d}{self.node}|{item}']
+        if len(args) > 2:
+            self.command(*args)
+
+    def reserve(self, queue, timeout, ack=()):
+        commands = [('ZREM', self.reserved_key(queue), *ack)] if ack else []
+        commands.append(('EVAL', RESERVE_SCRIPT, 2, queue, self.reserved_key(queue), timeout))
+        receipt = self.pipeline(commands)[-1]
+        if receipt is None:
+            return None
+        return receipt, receipt.split('|', 2)[2]
+
+    def ack(self, queue, receipts):
+        if receipts:
+            self.command('ZREM', self.reserved_key(queue), *receipts)
+
+    def size(self, queue):
+        return sum(self.pipeline([('ZCARD', queue), ('ZCARD', self.reserved_key(queue))]))
+
+    def add_many(self, name, members):
+        return [reply == 1 for reply in self.pipeline([('SADD', name, member) for member in members])]
+
+    def clear(self, *names):
+        self.pipeline([('DEL', name, self.reserved_key(name)) for name in names])
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+def load_queue_backend(settings):
+    """Create the backend named by QUEUE_BACKEND"""
+    name = settings.get('QUEUE_BACKEND', 'memory')
+    if name == 'memory':
+        return MemoryBackend()
+    if name.startswith(('redis://', 'resp://')):
+        return RespBackend.from_url(name)
+    raise ValueError(f"Unknown QUEUE_BACKEND: {name!r} (use 'memory' or 'redis://host:port/db')")
+
+
+class SharedScheduler:
+    """Scrapy scheduler keeping pending requests and dedupe in a QueueBackend
+
+    Enable with SCHEDULER = 'pinterest_scraper.backends.SharedScheduler'.
+    Requests are stored as JSON records, so only spider-method callbacks and
+    JSON-serializable meta survive the trip (all of this project's do).
+    Enqueued requests are buffered and sent QUEUE_BATCH_SIZE at a time, or
+    before the next request is taken; duplicates found then are reported
+    through the request_dropped signal.
+    """
+
+    def __init__(self, crawler, backend, flush_on_start=False, batch_size=100, visibility_timeout=600):
+        self.crawler = crawler
+        self.backend = backend
+        self.flush_on_start = flush_on_start
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.spider = None
+        self.queue_key = None
+        self.seen_key = None
+        self.outbox = []  # requests enqueued since the last flush
+        self.acks = []  # receipts of finished requests, sent with the next reservation
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            crawler,
+            load_queue_backend(settings),
+            flush_on_start=settings.getbool('QUEUE_FLUSH_ON_START', False),
+            batch_size=settings.getint('QUEUE_BATCH_SIZE', 100),
+            visibility_timeout=settings.getfloat('QUEUE_VISIBILITY_TIMEOUT', 600),
+        )
+
+    def open(self, spider):
+        self.spider = spider
+        spider.shared_scheduler = self
+        prefix = self.crawler.settings.get('QUEUE_KEY_PREFIX') or spider.name
+        self.queue_key = f'{prefix}:requests'
+        self.seen_key = f'{prefix}:seen'
+        if self.flush_on_start:
+            self.backend.clear(self.queue_key, self.seen_key)
+        pending = self.backend.size(self.queue_key)
+        if pending:
+            logger.info(f"🗂️ Joining shared queue {self.queue_key} with {pending} pending requests")
+
+    def close(self, reason):
+        self.flush()
+        self.backend.ack(self.queue_key, self.acks)
+        self.acks = []
+        self.backend.close()
+
+    def has_pending_requests(self):
+        return bool(self.outbox) or len(self) > 0
+
+    def enqueue_request(self, request):
+        self.finished(request)  # a retried or held request coming back
+        self.outbox.append(request)
+        if len(self.outbox) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Send the buffered requests: one round trip for dedupe, one to queue the new ones"""
+        requests, self.outbox = self.outbox, []
+        if not requests:
+            return
+        keyed = [request for request in requests if not request.dont_filter]
+        added = self.backend.add_many(self.seen_key, [request_key(request, self.crawler) for request in keyed])
+        duplicates = {id(request) for request, new in zip(keyed, added) if not new}
+
+        items = []
+        for request in requests:
+            if id(request) in duplicates:
+                self.crawler.stats.inc_value('scheduler/dupefiltered')
+                self.crawler.signals.send_catch_log(signals.request_dropped, request=request, spider=self.spider)
+                continue
+            items.append((json.dumps(request_to_record(request), ensure_ascii=False), request.priority))
+        self.backend.push_many(self.queue_key, items)
+        self.crawler.stats.inc_value('scheduler/enqueued/shared', len(items))
+
+    def next_request(self):
+        self.flush()
+        acks, self.acks = self.acks, []
+        reserved = self.backend.reserve(self.queue_key, self.visibility_timeout, ack=acks)
+        if reserved is None:
+            return None
+        receipt, record = reserved
+        request = request_from_record(json.loads(record), self.spider)
+        if receipt is not None:
+            request.meta['queue_receipt'] = receipt
+        self.crawler.stats.inc_value('scheduler/dequeued/shared')
+        return request
+
+    def finished(self, request):
+        """Acknowledge the reservation of a request that was handled"""
+        receipt = request.meta.pop('queue_receipt', None)
+        if receipt is not None:
+            self.acks.append(receipt)
+
+    def __len__(self):
+        return self.backend.size(self.queue_key)
+
+
+class SharedQueueAckMiddleware:
+    """Downloader middleware acknowledging shared-queue requests once they are handled
+
+    Keep it outermost (lowest order) so it sees every response and every
+    exception, including requests dropped by later middlewares.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not issubclass(load_object(crawler.settings['SCHEDULER']), SharedScheduler):
+            raise NotConfigured
+        return cls(crawler)
+
+    def finished(self, request):
+        scheduler = getattr(self.crawler.spider, 'shared_scheduler', None)
+        if scheduler is not None:
+            scheduler.finished(request)
+
+    def process_response(self, request, response, spider=None):
+        self.finished(request)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        self.finished(request)
+        return None
@@ -0,0 +1,329 @@
+# Long-running crawl daemon
+#
+#   python -m pinterest_scraper.daemon --port 6810
+#   python -m pinterest_scraper.daemon --socket /tmp/pinterest.sock
+#
+# Keeps one Twisted reactor alive and runs crawl jobs inside it, so a job
+# costs a spider instantiation instead of a whole Python/Scrapy start-up.
+# Jobs of the same spider share the learned fetch tiers, render waits and
+# latency estimates (see fetch.py), and Scrapy's DNS cache is process-wide.
+#
+# HTTP API (JSON):
+#   POST   /jobs               {"spider": "pinterest_search", "args": {...},
+#                               "settings": {...}, "every": 900}
+#   GET    /jobs               all jobs
+#   GET    /jobs/<id>          one job with its latest stats
+#   GET    /jobs/<id>/events   job events as JSON lines, streamed until it ends
+#   DELETE /jobs/<id>          cancel the job (and its schedule)
+
+import argparse
+import json
+import logging
+import time
+import uuid
+from collections import deque
+
+from scrapy import signals
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.log import configure_logging
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+
+
+logger = logging.getLogger(__name__)
+
+# Stats included in job status and progress events
+STATUS_STATS = (
+    'item_scraped_count', 'downloader/request_count', 'fetch/credits',
+    'budget/requests_avoided', 'finish_reason', 'elapsed_time_seconds',
+)
+
+
+class Job:
+    """A crawl submitted to the daemon, possibly recurring every N seconds"""
+
+    def __init__(self, spider, args=None, settings=None, every=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.spider = spider
+        self.args = args or {}
+        self.settings = settings or {}
+        self.every = every
+        self.state = 'scheduled'
+        self.runs = 0
+        self.stats = {}
+        self.crawler = None
+        self.next_run = None  # IDelayedCall of the next recurring run
+        self.events = deque(maxlen=500)
+        self.listeners = []  # open event streams
+
+    @property
+    def finished(self):
+        return self.state in ('finished', 'failed', 'cancelled') and self.next_run is None
+
+    def emit(self, event, **data):
+        record = dict(data, event=event, job=self.id, time=time.time())
+        self.events.append(record)
+        for listener in list(self.listeners):
+            listener(record)
+
+    def status(self):
+        return {
+            'id': self.id,
+            'spider': self.spider,
+            'args': self.args,
+            'every': self.every,
+            'state': self.state,
+            'runs': self.runs,
+            'stats': self.stats,
+        }
+
+
+class CrawlDaemon:
+    """Runs jobs concurrently on one CrawlerRunner"""
+
+    def __init__(self, settings, progress_interval=5):
+        self.settings = settings
+        self.runner = CrawlerRunner(settings)
+        self.jobs = {}
+        self.progress_interval = progress_interval
+        self.shared_fetch_state = {}  # spider name -> FetchStrategy learned state
+
+    def submit(self, spider, args=None, settings=None, every=None):
+        every = parse_every(every)
+        if spider not in self.runner.spider_loader.list():
+            raise ValueError(f"Unknown spider: {spider!r}")
+        job = Job(spider, args, settings, every)
+        self.jobs[job.id] = job
+        job.emit('scheduled', spider=spider, every=every)
+        self.run(job)
+        return job
+
+    def spider_class(self, job):
+        spidercls = self.runner.spider_loader.load(job.spider)
+        if not job.settings:
+            return spidercls
+        custom_settings = dict(spidercls.custom_settings or {}, **job.settings)
+        return type(spidercls.__name__, (spidercls,), {'custom_settings': custom_settings})
+
+    def run(self, job):
+        from twisted.internet import reactor
+
+        job.next_run = None
+        job.runs += 1
+        job.state = 'running'
+        job.stats = {}
+        crawler = self.runner.create_crawler(self.spider_class(job))
+        crawler.signals.connect(
+            lambda spider: self.share_fetch_state(job, spider),
+            signal=signals.spider_opened,
+            weak=False,
+        )
+        job.crawler = crawler
+        job.emit('started', run=job.runs)
+        started = time.monotonic()
+
+        def progress():
+            if job.crawler is crawler and job.state == 'running':
+                self.snapshot(job)
+                job.emit('progress', stats=job.stats)
+                reactor.callLater(self.progress_interval, progress)
+
+        reactor.callLater(self.progress_interval, progress)
+
+        deferred = self.runner.crawl(crawler, **job.args)
+        deferred.addCallbacks(lambda _: self.finished(job, crawler, started), lambda failure: self.failed(job, failure))
+        return deferred
+
+    def share_fetch_state(self, job, spider):
+        """Let jobs of the same spider reuse what earlier runs learned about fetching"""
+        strategy = getattr(spider, 'fetch_strategy', None)
+        if strategy is None:
+            return
+        shared = self.shared_fetch_state.setdefault(job.spider, {
+            'learned_tiers': strategy.learned_tiers,
+            'latency': strategy.latency,
+            'wait_tuner': strategy.wait_tuner,
+        })
+        strategy.learned_tiers = shared['learned_tiers']
+        strategy.latency = shared['latency']
+        if strategy.wait_tuner is not None and shared['wait_tuner'] is not None:
+            strategy.wait_tuner = shared['wait_tuner']
+
+    def snapshot(self, job):
+        try:
+            stats = job.crawler.stats.get_stats()
+        except (AttributeError, RuntimeError):
+            return  # crawl not started yet
+        job.stats = {key: stats[key] for key in STATUS_STATS if key in stats}
+
+    def finished(self, job, crawler, started):
+        from twisted.internet import reactor
+
+        self.snapshot(job)
+        job.crawler = None
+        if job.state == 'cancelled':
+            job.emit('cancelled', stats=job.stats)
+            return
+        job.state = 'finished'
+        job.emit('finished', stats=job.stats, seconds=round(time.monotonic() - started, 3))
+        if job.every:
+            delay = max(0.0, job.every - (time.monotonic() - started))
+            job.next_run = reactor.callLater(delay, self.run, job)
+            job.state = 'scheduled'
+
+    def failed(self, job, failure):
+        job.crawler = None
+        job.state = 'failed'
+        job.emit('failed', error=failure.getErrorMessage())
+        logger.error(f"❌ Job {job.id} failed: {failure.getErrorMessage()}")
+
+    def cancel(self, job):
+        if job.next_run is not None and job.next_run.active():
+            job.next_run.cancel()
+        job.next_run = None
+        if job.crawler is not None:
+            job.state = 'cancelled'
+            return deferred_from_coro(job.crawler.stop_async())
+        job.state = 'cancelled'
+        job.emit('cancelled', stats=job.stats)
+        return None
+
+
+def parse_job(body):
+    """submit() arguments of a POST /jobs body; ValueError if it is not a valid job"""
+    try:
+        payload = json.loads(body or b'{}')
+    except ValueError:
+        raise ValueError('Body is not JSON')
+    if not isinstance(payload, dict) or not isinstance(payload.get('spider'), str):
+        raise ValueError('"spider" is required')
+    job = {'spider': payload['spider'], 'every': payload.get('every')}
+    for key in ('args', 'settings'):
+        if payload.get(key) is not None and not isinstance(payload[key], dict):
+            raise ValueError(f'"{key}" must be an object')
+        job[key] = payload.get(key)
+    return job
+
+
+def parse_every(every):
+    """Seconds between runs of a recurring job as a float, None for a one-off job"""
+    if every is None:
+        return None
+    try:
+        seconds = float(every)
+    except (TypeError, ValueError):
+        raise ValueError(f'"every" must be a number of seconds, got {every!r}')
+    if not 0 < seconds < float('inf'):
+        raise ValueError(f'"every" must be a positive number of seconds, got {every!r}')
+    return seconds
+
+
+def json_body(request, payload, code=200):
+    request.setResponseCode(code)
+    request.setHeader(b'Content-Type', b'application/json')
+    return json.dumps(payload, default=str).encode('utf-8')
+
+
+def build_site(daemon):
+    """twisted.web site exposing the job API"""
+    from twisted.web.resource import NoResource, Resource
+    from twisted.web.server import NOT_DONE_YET, Site
+
+    class JobEventsResource(Resource):
+        isLeaf = True
+
+        def __init__(self, job):
+            super(JobEventsResource, self).__init__()
+            self.job = job
+
+        def render_GET(self, request):
+            request.setHeader(b'Content-Type', b'application/x-ndjson')
+            job = self.job
+
+            def write(record):
+                request.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+                if record['event'] in ('finished', 'failed', 'cancelled') and job.finished:
+                    stop()
+                    request.finish()
+
+            def stop(_=None):
+                if write in job.listeners:
+                    job.listeners.remove(write)
+
+            for record in list(job.events):
+                request.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+            if job.finished:
+                return b''
+            job.listeners.append(write)
+            request.notifyFinish().addBoth(stop)
+            return NOT_DONE_YET
+
+    class JobResource(Resource):
+        def __init__(self, job):
+            super(JobResource, self).__init__()
+            self.job = job
+
+        def getChild(self, name, request):
+            if name == b'events':
+                return JobEventsResource(self.job)
+            return self
+
+        def render_GET(self, request):
+            if self.job.crawler is not None:
+                daemon.snapshot(self.job)
+            return json_body(request, self.job.status())
+
+        def render_DELETE(self, request):
+            daemon.cancel(self.job)
+            return json_body(request, self.job.status())
+
+    class JobsResource(Resource):
+        def getChild(self, name, request):
+            job = daemon.jobs.get(name.decode('utf-8'))
+            if job is None:
+                return NoResource('Unknown job')
+            return JobResource(job)
+
+        def render_GET(self, request):
+            return json_body(request, [job.status() for job in daemon.jobs.values()])
+
+        def render_POST(self, request):
+            try:
+                job = daemon.submit(**parse_job(request.content.read()))
+            except ValueError as error:
+                return json_body(request, {'error': str(error)}, code=400)
+            return json_body(request, job.status(), code=201)
+
+    root = Resource()
+    root.putChild(b'jobs', JobsResource())
+    return Site(root)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run Pinterest crawl jobs in one long-lived process')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6810)
+    parser.add_argument('--socket', default=None, help='Listen on a Unix socket instead of TCP')
+    parser.add_argument('--progress-interval', type=float, default=5, help='Seconds between progress events')
+    args = parser.parse_args(argv)
+
+    settings = get_project_settings()
+    install_reactor(settings.get('TWISTED_REACTOR'))
+    configure_logging(settings)
+
+    from twisted.internet import reactor
+
+    daemon = CrawlDaemon(settings, progress_interval=args.progress_interval)
+    site = build_site(daemon)
+    if args.socket:
+        reactor.listenUNIX(args.socket, site)
+        logger.info(f"🛰️ Crawl daemon listening on {args.socket}")
+    else:
+        reactor.listenTCP(args.port, site, interface=args.host)
+        logger.info(f"🛰️ Crawl daemon listening on http://{args.host}:{args.port}")
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main()
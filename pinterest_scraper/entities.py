@@ -0,0 +1,127 @@
+# Boards and users seen in passing
+#
+# Every pin page names the board it was saved to and the pinner who saved
+# it. EntityCache collects those sightings as partial PinterestBoardItem /
+# PinterestUserItem records, merges them by ID as more pages mention the same
+# board or user, and hands back the records that changed since they were last
+# emitted: every ENTITY_FLUSH_INTERVAL seconds while the crawl runs, and once
+# more when the spider runs out of requests. A record can therefore be emitted
+# more than once, each time with more fields; keep the last one per ID.
+#
+# Users are merged by username; their user_id is the numeric Pinterest ID
+# when the pin carries it (resource feeds), as on pinterest_users records,
+# and is left empty otherwise.
+#
+#   ENTITY_CACHE_ENABLED = True
+#   ENTITY_FLUSH_INTERVAL = 300
+
+import time
+from datetime import datetime
+
+from scrapy import signals
+
+from pinterest_scraper.items import PinterestBoardItem, PinterestUserItem
+from pinterest_scraper.urls import board_path, parse_username
+
+
+# Most pin URLs kept per board / user record
+SAMPLE_LIMIT = 10
+
+
+class EntityCache:
+    """Partial board and user records, merged by ID"""
+
+    def __init__(self, flush_interval=300, clock=time.monotonic, stats=None):
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.stats = stats
+        self.records = {}  # (item class, ID) -> merged field dict
+        self.changed = set()  # keys of records changed since they were emitted
+        self.last_flush = clock()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """EntityCache configured from settings, or None when disabled"""
+        if not crawler.settings.getbool('ENTITY_CACHE_ENABLED'):
+            return None
+        cache = cls(flush_interval=crawler.settings.getfloat('ENTITY_FLUSH_INTERVAL', 300))
+        crawler.signals.connect(cache.spider_opened, signal=signals.spider_opened)
+        return cache
+
+    def spider_opened(self, spider):
+        # Stats are only created once the crawl starts, after the spider
+        self.stats = spider.crawler.stats
+
+    def __len__(self):
+        return len(self.records)
+
+    def merge(self, item_cls, entity_id, fields):
+        """Fill in missing fields of a record; list fields collect new values"""
+        key = (item_cls, entity_id)
+        record = self.records.get(key)
+        if record is None:
+            record = self.records[key] = {}
+            if self.stats:
+                self.stats.inc_value(f'entities/{item_cls.__name__}')
+        changed = False
+        for field, value in fields.items():
+            if not value:
+                continue
+            if isinstance(value, list):
+                values = record.setdefault(field, [])
+                for entry in value:
+                    if entry not in values and len(values) < SAMPLE_LIMIT:
+                        values.append(entry)
+                        changed = True
+            elif field not in record:
+                record[field] = value
+                changed = True
+        if changed:
+            self.changed.add(key)
+
+    def add_pin(self, item):
+        """Record the board and pinner named on a parsed pin page"""
+        pin_url = item.get('pin_url')
+        board_url = item.get('board_url')
+        path = board_path(board_url) if board_url else None
+        username = item.get('pinner_username')
+        if not username and item.get('pinner_url'):
+            username = parse_username(item['pinner_url'])
+
+        if path:
+            owner, slug = path.split('/')
+            self.merge(PinterestBoardItem, path, {
+                'board_id': path,
+                'board_url': f'https://www.pinterest.com/{path}/',
+                'board_name': item.get('board_name'),
+                'board_slug': slug,
+                'owner_username': owner,
+                'sample_pins': [pin_url],
+            })
+        if username:
+            self.merge(PinterestUserItem, username.lower(), {
+                'user_id': item.get('pinner_id'),
+                'username': username,
+                'full_name': item.get('pinner_name'),
+                'profile_url': item.get('pinner_url') or f'https://www.pinterest.com/{username}/',
+                'recent_pins': [pin_url],
+                'recent_boards': [board_url] if path else [],
+            })
+
+    def due(self):
+        """True when the flush interval has passed and there is something to emit"""
+        return bool(self.changed) and self.clock() - self.last_flush >= self.flush_interval
+
+    def flush(self):
+        """Items for the records changed since the last flush"""
+        self.last_flush = self.clock()
+        items = []
+        for key in self.changed:
+            item_cls, _ = key
+            item = item_cls(**self.records[key])
+            item['scraped_at'] = datetime.now().isoformat()
+            items.append(item)
+        self.changed.clear()
+        if self.stats and items:
+            self.stats.inc_value('entities/emitted', len(items))
+        return items
@@ -0,0 +1,349 @@
+# Fetch strategy for ScrapeOps proxy requests
+#
+# Pages are requested on the cheapest proxy tier first and only escalated to
+# JavaScript rendering / residential IPs when the callback could not extract
+# its required fields. The tier that worked is remembered per page type, and
+# the credits spent are tracked against an optional per-run budget. On the
+# rendering tiers the proxy's render wait is learned per page type as well.
+
+import logging
+import re
+import time
+from collections import deque
+from urllib.parse import urlencode, urlparse
+
+import scrapy
+from scrapy import signals
+
+
+logger = logging.getLogger(__name__)
+
+PROXY_ENDPOINT = 'https://proxy.scrapeops.io/v1/'
+
+# Meta keys describing a finished fetch, not carried over to escalations
+RESPONSE_META_KEYS = ('fetch_url', 'fetch_tier', 'render_wait', 'download_latency')
+
+# Cheapest first; credits are the ScrapeOps cost of one request on the tier
+DEFAULT_FETCH_TIERS = [
+    {'name': 'plain', 'params': {'render_js': 'false', 'residential': 'false'}, 'credits': 1},
+    {'name': 'render_js', 'params': {'render_js': 'true', 'wait': 3000, 'residential': 'false'}, 'credits': 10},
+    {'name': 'residential', 'params': {'render_js': 'true', 'wait': 3000, 'residential': 'true'}, 'credits': 25},
+]
+
+
+def build_proxy_url(api_key, url, params, country='US'):
+    """Wrap a Pinterest URL in a ScrapeOps proxy URL"""
+    query = {'api_key': api_key, 'url': url}
+    query.update(params)
+    query['country'] = country
+    return f"{PROXY_ENDPOINT}?{urlencode(query)}"
+
+
+def page_type(url):
+    """Classify a Pinterest URL: search, pin, today, resource or board"""
+    path = urlparse(url).path
+    if path.startswith('/search/'):
+        return 'search'
+    if path.startswith('/pin/'):
+        return 'pin'
+    if path.startswith('/today'):
+        return 'today'
+    if path.startswith('/resource/'):
+        return 'resource'
+    return 'board'
+
+
+class LatencyTracker:
+    """Rolling download latency samples (seconds) per page type"""
+
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self.samples = {}  # page type -> deque of recent latencies
+
+    def observe(self, kind, seconds):
+        if kind not in self.samples:
+            self.samples[kind] = deque(maxlen=self.window)
+        self.samples[kind].append(seconds)
+
+    def quantile(self, kind, q):
+        """Latency quantile for a page type, or None until enough samples"""
+        samples = self.samples.get(kind)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def mean(self, kind):
+        samples = self.samples.get(kind)
+        if not samples:
+            return None
+        return sum(samples) / len(samples)
+
+
+class Deadline:
+    """Wall-clock limit of a crawl (-a deadline=90m)"""
+
+    DURATION_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$', re.IGNORECASE)
+    UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+    def __init__(self, seconds, clock=time.monotonic):
+        self.clock = clock
+        self.seconds = seconds
+        self.ends_at = clock() + seconds
+
+    @classmethod
+    def parse(cls, value):
+        """Deadline from seconds or a duration like '900', '45m' or '2h'"""
+        match = cls.DURATION_RE.match(str(value))
+        if not match:
+            raise ValueError(f"Invalid deadline: {value!r} (use seconds or e.g. '45m', '2h')")
+        return cls(float(match.group(1)) * cls.UNITS[match.group(2).lower()])
+
+    def remaining(self):
+        return max(0.0, self.ends_at - self.clock())
+
+    def allows(self, seconds):
+        """True if work expected to take this long can finish in time"""
+        return seconds <= self.remaining()
+
+
+class RenderWaitTuner:
+    """Learns the proxy render wait (ms) per page type from extraction results
+
+    Waits start low and double whenever a rendered page comes back without its
+    required fields; after a run of successes they creep back down.
+    """
+
+    def __init__(self, initial=1000, maximum=10000, settle=10):
+        self.initial = initial
+        self.maximum = maximum
+        self.settle = settle
+        self.waits = {}  # page type -> current wait
+        self.streaks = {}  # page type -> consecutive successes at the current wait
+
+    def wait_for(self, kind):
+        return self.waits.get(kind, self.initial)
+
+    def record_success(self, kind, wait):
+        streak = self.streaks.get(kind, 0) + 1
+        current = self.wait_for(kind)
+        if streak >= self.settle and wait <= current:
+            self.waits[kind] = max(self.initial, int(current * 0.9))
+            streak = 0
+        self.streaks[kind] = streak
+
+    def record_failure(self, kind, wait):
+        """Back off upward; returns True if the wait actually grew"""
+        self.streaks[kind] = 0
+        current = self.wait_for(kind)
+        if wait < current:
+            # A newer, longer wait is already in use
+            return True
+        if current >= self.maximum:
+            return False
+        self.waits[kind] = min(self.maximum, current * 2)
+        return True
+
+
+class FetchStrategy:
+    """Chooses the proxy tier for each request and escalates on failure"""
+
+    def __init__(self, api_key, tiers=None, credit_budget=0, probe_every=0, stats=None,
+                 wait_tuner=None, wait_selectors=None):
+        self.api_key = api_key
+        self.tiers = tiers or DEFAULT_FETCH_TIERS
+        self.credit_budget = credit_budget
+        self.probe_every = probe_every
+        self.stats = stats
+        self.wait_tuner = wait_tuner
+        self.wait_selectors = wait_selectors or {}
+        self.credits_spent = 0
+        self.learned_tiers = {}  # page type -> index of the cheapest tier that worked
+        self.requests_made = {}  # page type -> number of requests issued
+        self.latency = LatencyTracker()
+        self.shared_budget = None  # spend(credits) -> bool across processes, see shard.py
+        self.deadline = None  # Deadline of the crawl, if it has one
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        strategy = cls(
+            api_key=settings.get('SCRAPEOPS_API_KEY'),
+            tiers=settings.getlist('FETCH_TIERS') or None,
+            credit_budget=settings.getint('FETCH_CREDIT_BUDGET', 0),
+            probe_every=settings.getint('FETCH_PROBE_EVERY', 0),
+            wait_selectors=settings.getdict('RENDER_WAIT_FOR_SELECTORS'),
+        )
+        if settings.getbool('RENDER_WAIT_ADAPTIVE', True):
+            strategy.wait_tuner = RenderWaitTuner(
+                initial=settings.getint('RENDER_WAIT_INITIAL', 1000),
+                maximum=settings.getint('RENDER_WAIT_MAX', 10000),
+            )
+        if not settings.getbool('FETCH_ESCALATION_ENABLED', True):
+            # Historical behaviour: every page rendered with JavaScript
+            strategy.learned_tiers = {kind: 1 for kind in ('search', 'pin', 'board', 'today', 'resource')}
+            strategy.probe_every = 0
+        crawler.signals.connect(strategy.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(strategy.response_received, signal=signals.response_received)
+        crawler.signals.connect(strategy.spider_closed, signal=signals.spider_closed)
+        return strategy
+
+    def request(self, url, callback, meta=None, **kwargs):
+        """Build a proxy request for url on the learned tier, or None if over budget"""
+        kind = page_type(url)
+        tier = self.learned_tiers.get(kind, 0)
+
+        # Periodically re-try one tier cheaper in case the page type got easier
+        count = self.requests_made.get(kind, 0) + 1
+        self.requests_made[kind] = count
+        if tier and self.probe_every and count % self.probe_every == 0:
+            tier -= 1
+
+        # Short on time: fall back to a cheaper (faster) tier that can finish
+        while tier and self.deadline and not self.deadline.allows(self.expected_latency(kind, tier)):
+            tier -= 1
+            self.inc_stat('deadline/cheaper_tier')
+
+        return self.request_for_tier(url, tier, callback, meta, **kwargs)
+
+    def expected_latency(self, kind, tier=None):
+        """Expected seconds to fetch a page type on a tier (learned, else a prior)"""
+        if tier is None:
+            tier = self.learned_tiers.get(kind, 0)
+        learned = self.latency.mean(f'{kind}/{tier}')
+        if learned is not None:
+            return learned
+        # Prior: a couple of seconds through the proxy plus any render wait
+        return 2.0 + self.render_wait(kind, tier) / 1000
+
+    def request_for_tier(self, url, tier, callback, meta=None, **kwargs):
+        """Build a proxy request on a given tier index, or None if over budget"""
+        tier_config = self.tiers[tier]
+        if not self.spend(tier_config['credits']):
+            return None
+
+        params = self.tier_params(url, tier)
+        meta = dict(meta or {})
+        meta['fetch_url'] = url
+        meta['fetch_tier'] = tier
+        if 'wait' in params:
+            meta['render_wait'] = params['wait']
+        self.inc_stat(f"fetch/requests/{tier_config['name']}")
+
+        return scrapy.Request(
+            url=build_proxy_url(self.api_key, url, params),
+            callback=callback,
+            meta=meta,
+            **kwargs
+        )
+
+    def tier_params(self, url, tier):
+        """Proxy parameters for fetching url on a tier"""
+        params = dict(self.tiers[tier]['params'])
+        if 'wait' in params:
+            kind = page_type(url)
+            params['wait'] = self.render_wait(kind, tier)
+            if kind in self.wait_selectors:
+                params['wait_for'] = self.wait_selectors[kind]
+        return params
+
+    def render_wait(self, kind, tier):
+        """Render wait (ms) for a page type on a tier; 0 on tiers without JS rendering"""
+        wait = self.tiers[tier]['params'].get('wait', 0)
+        if wait and self.wait_tuner:
+            wait = self.wait_tuner.wait_for(kind)
+        return wait
+
+    def succeeded(self, response):
+        """Record that the page's required fields were extracted"""
+        kind = page_type(response.meta.get('fetch_url', ''))
+        tier = response.meta.get('fetch_tier')
+        if tier is None:
+            return
+        if self.wait_tuner and 'render_wait' in response.meta:
+            self.wait_tuner.record_success(kind, response.meta['render_wait'])
+        if tier != self.learned_tiers.get(kind, 0):
+            logger.debug(f"Fetch tier for {kind} pages is now {self.tiers[tier]['name']}")
+        self.learned_tiers[kind] = tier
+
+    def escalate(self, response):
+        """Re-request the page on the next tier, or return None when none is left"""
+        url = response.meta.get('fetch_url')
+        tier = response.meta.get('fetch_tier')
+        if url is None or tier is None:
+            self.inc_stat('fetch/exhausted')
+            return None
+
+        meta = {key: value for key, value in response.meta.items() if key not in RESPONSE_META_KEYS}
+
+        # A rendered page may just have needed longer: retry once on the same
+        # tier with the backed-off wait before paying for the next tier
+        render_wait = response.meta.get('render_wait')
+        if self.wait_tuner and render_wait is not None:
+            kind = page_type(url)
+            grew = self.wait_tuner.record_failure(kind, render_wait)
+            if self.stats:
+                self.stats.set_value(f'fetch/render_wait/{kind}', self.wait_tuner.wait_for(kind))
+            if grew and not meta.get('render_wait_retried'):
+                meta['render_wait_retried'] = True
+                request = self.request_for_tier(
+                    url, tier, response.request.callback, meta,
+                    errback=response.request.errback, dont_filter=True
+                )
+                if request is not None:
+                    self.inc_stat('fetch/render_wait_retries')
+                return request
+
+        if tier + 1 >= len(self.tiers):
+            self.inc_stat('fetch/exhausted')
+            return None
+
+        if self.deadline and not self.deadline.allows(self.expected_latency(page_type(url), tier + 1)):
+            self.inc_stat('deadline/escalations_skipped')
+            return None
+
+        meta.pop('render_wait_retried', None)
+        request = self.request_for_tier(
+            url, tier + 1, response.request.callback, meta,
+            errback=response.request.errback, dont_filter=True
+        )
+        if request is not None:
+            self.inc_stat('fetch/escalations')
+        return request
+
+    def spend(self, credits):
+        """Reserve credits for a request; False once the run budget is used up"""
+        if self.credit_budget and self.credits_spent + credits > self.credit_budget:
+            self.inc_stat('fetch/budget_exhausted')
+            return False
+        if self.shared_budget is not None and not self.shared_budget.spend(credits):
+            self.inc_stat('fetch/budget_exhausted')
+            return False
+        self.credits_spent += credits
+        if self.stats:
+            self.stats.set_value('fetch/credits', self.credits_spent)
+        return True
+
+    def inc_stat(self, key):
+        if self.stats:
+            self.stats.inc_value(key)
+
+    def spider_opened(self, spider):
+        # Stats are only created once the crawl starts, after the spider
+        self.stats = spider.crawler.stats
+
+    def response_received(self, response, request, spider):
+        """Feed the downloader's latency for proxy fetches into the tracker"""
+        latency = request.meta.get('download_latency')
+        if latency is not None and 'fetch_url' in request.meta:
+            kind = page_type(request.meta['fetch_url'])
+            self.latency.observe(kind, latency)
+            self.latency.observe(f"{kind}/{request.meta.get('fetch_tier', 0)}", latency)
+
+    def spider_closed(self, spider):
+        if not self.stats:
+            return
+        items = self.stats.get_value('item_scraped_count', 0)
+        if items:
+            self.stats.set_value('fetch/credits_per_item', round(self.credits_spent / items, 2))
@@ -0,0 +1,280 @@
+# Resumable crawl frontier
+#
+# Enabled with -s FRONTIER_DIR=crawls/home-decor. Every scheduled request,
+# every completed request and the spider's progress counters are appended to
+# FRONTIER_DIR/journal.jsonl as the crawl runs. When a crawl dies and is
+# started again with the same FRONTIER_DIR, unfinished requests are re-issued,
+# completed ones are never fetched again and counters such as pins_scraped
+# continue where they stopped. The log is compacted every
+# FRONTIER_COMPACT_EVERY records so it does not grow without bound.
+#
+# A request counts as completed once its callback has run to the end
+# (FrontierSpiderMiddleware); a page whose callback failed or escalated it to
+# another tier stays pending. The spiders skip completed pages before they
+# build a request (PinterestBaseSpider.fetch), so nothing is dropped after it
+# was scheduled.
+#
+# Pair it with JOBDIR so Scrapy's scheduler keeps the queued requests on disk
+# as well. The done/pending fingerprints are kept in a temporary SQLite
+# database rebuilt from the journal at start, so memory stays flat however
+# many requests the crawl has seen.
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request
+from scrapy.utils.job import job_dir
+
+from pinterest_scraper.utils import request_from_record, request_key, request_to_record
+
+
+logger = logging.getLogger(__name__)
+
+
+def frontier_dir(settings):
+    """FRONTIER_DIR, or a directory inside JOBDIR, or None"""
+    directory = settings.get('FRONTIER_DIR')
+    if not directory and settings.get('JOBDIR'):
+        directory = os.path.join(settings.get('JOBDIR'), 'frontier')
+    return directory or None
+
+
+class CrawlFrontier:
+    """Append-only on-disk journal of a crawl's frontier and progress"""
+
+    def __init__(self, crawler, directory, compact_every=10000, save_interval=1.0):
+        self.crawler = crawler
+        self.directory = directory
+        self.path = os.path.join(directory, 'journal.jsonl')
+        self.compact_every = compact_every
+        self.save_interval = save_interval
+        self.progress = {}
+        self.last_saved = 0.0
+        self.records_since_compaction = 0
+        self.file = None
+        self.spider = None
+        # Private temporary database, spilled to disk by SQLite as it grows.
+        # done = 1 for completed requests; record = how to re-issue a pending one
+        self.db = sqlite3.connect('')
+        self.db.execute('CREATE TABLE keys (key TEXT PRIMARY KEY, done INTEGER, record TEXT) WITHOUT ROWID')
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        directory = frontier_dir(settings)
+        if not directory:
+            raise NotConfigured
+
+        frontier = cls(
+            crawler, directory,
+            compact_every=settings.getint('FRONTIER_COMPACT_EVERY', 10000),
+            save_interval=settings.getfloat('FRONTIER_SAVE_INTERVAL', 1.0),
+        )
+        crawler.signals.connect(frontier.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(frontier.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(frontier.request_scheduled, signal=signals.request_scheduled)
+        return frontier
+
+    def fingerprint(self, request):
+        return request_key(request, self.crawler)
+
+    # Fingerprints
+
+    def mark_pending(self, key, record):
+        self.db.execute(
+            'INSERT INTO keys VALUES (?, 0, ?) ON CONFLICT (key) DO UPDATE SET done = 0, record = excluded.record',
+            (key, json.dumps(record, ensure_ascii=False))
+        )
+
+    def mark_done(self, key):
+        self.db.execute('INSERT INTO keys VALUES (?, 1, NULL) ON CONFLICT (key) DO UPDATE SET done = 1, record = NULL', (key,))
+
+    def state(self, key):
+        """1 if completed, 0 if pending, None if never scheduled"""
+        row = self.db.execute('SELECT done FROM keys WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def count(self, done):
+        return self.db.execute('SELECT COUNT(*) FROM keys WHERE done = ?', (int(done),)).fetchone()[0]
+
+    # Journal file
+
+    def iter_records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+
+    def load(self):
+        """Rebuild done/pending fingerprints and progress from the journal"""
+        with self.db:
+            for record in self.iter_records():
+                op = record.get('op')
+                if op == 'scheduled':
+                    self.mark_pending(record['key'], record)
+                elif op == 'done':
+                    self.mark_done(record['key'])
+                elif op == 'progress':
+                    self.progress = record['state']
+            # What to re-issue, apart from the table the running crawl updates
+            self.db.execute('CREATE TABLE resume AS SELECT key, record FROM keys WHERE done = 0')
+
+    def append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.records_since_compaction += 1
+        if self.records_since_compaction >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal keeping only progress, done keys and pending requests"""
+        self.save_progress(write=False)
+        self.file.close()
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write(json.dumps({'op': 'progress', 'state': self.progress}, ensure_ascii=False) + '\n')
+            for key, done, record in self.db.execute('SELECT key, done, record FROM keys'):
+                out.write((json.dumps({'op': 'done', 'key': key}) if done else record) + '\n')
+        os.replace(tmp_path, self.path)
+
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.records_since_compaction = 0
+        self.crawler.stats.inc_value('frontier/compactions')
+
+    def save_progress(self, write=True):
+        if hasattr(self.spider, 'frontier_state'):
+            self.progress = self.spider.frontier_state()
+        self.last_saved = time.monotonic()
+        self.db.commit()
+        if write:
+            self.append({'op': 'progress', 'state': self.progress})
+            self.file.flush()
+
+    # Resuming
+
+    def scheduler_resumes(self):
+        """True if Scrapy's JOBDIR queue was saved and restores the pending requests itself"""
+        path = job_dir(self.crawler.settings)
+        return bool(path) and os.path.exists(os.path.join(path, 'requests.queue', 'active.json'))
+
+    def pending_requests(self, spider):
+        """Rebuild the requests that were scheduled but never completed"""
+        if self.scheduler_resumes():
+            # Stopped gracefully with JOBDIR: the scheduler already has them
+            return
+        cursor = self.db.execute('SELECT key, record FROM resume')
+        for rows in iter(lambda: cursor.fetchmany(100), []):
+            for key, record in rows:
+                if self.state(key) != 0:
+                    continue  # completed since the crawl started again
+                self.crawler.stats.inc_value('frontier/resumed_requests')
+                yield request_from_record(json.loads(record), spider, dont_filter=True)
+
+    def is_known(self, request):
+        """True if an equivalent request was already completed or is pending"""
+        return self.state(self.fingerprint(request)) is not None
+
+    def is_done(self, request):
+        """True if an equivalent request was already completed"""
+        return self.state(self.fingerprint(request)) == 1
+
+    def complete(self, request, rescheduled=False):
+        """Mark a request done once its callback ran, unless it was sent again"""
+        key = self.fingerprint(request)
+        if rescheduled or self.state(key) == 1:
+            return
+        self.mark_done(key)
+        self.append({'op': 'done', 'key': key})
+        if time.monotonic() - self.last_saved >= self.save_interval:
+            self.save_progress()
+
+    # Signals
+
+    def spider_opened(self, spider):
+        os.makedirs(self.directory, exist_ok=True)
+        self.spider = spider
+        self.load()
+        if self.progress and hasattr(spider, 'restore_frontier_state'):
+            spider.restore_frontier_state(self.progress)
+        done, pending = self.count(True), self.count(False)
+        if done or pending:
+            logger.info(f"♻️ Resuming crawl: {done} requests done, {pending} pending")
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.last_saved = time.monotonic()
+        spider.frontier = self
+
+    def spider_closed(self, spider, reason):
+        if self.file is None:
+            return
+        self.save_progress()
+        self.file.close()
+        self.file = None
+        self.db.close()
+
+    def request_scheduled(self, request, spider):
+        if request.meta.get('hedge_copy'):
+            return
+        key = self.fingerprint(request)
+        if self.state(key) == 0 and not request.dont_filter:
+            return
+        # New, or sent again (escalation to another tier, retry): re-issue this one on resume
+        record = {'op': 'scheduled', 'key': key, **request_to_record(request)}
+        self.mark_pending(key, record)
+        self.append(record)
+
+
+class FrontierSpiderMiddleware:
+    """Mark requests done in the crawl frontier once their callback ran to the end
+
+    A callback that raises leaves its request pending, and one that sends the
+    same page again (fetch tier escalation) leaves it to the new request.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not frontier_dir(crawler.settings):
+            raise NotConfigured
+        return cls(crawler)
+
+    def tracker(self, response):
+        """(frontier, request) to mark done after the callback, or None"""
+        frontier = getattr(self.crawler.spider, 'frontier', None)
+        request = getattr(response, 'request', None)
+        if frontier is None or request is None:
+            return None
+        return frontier, request
+
+    def sends_again(self, frontier, request, output):
+        return isinstance(output, Request) and frontier.fingerprint(output) == frontier.fingerprint(request)
+
+    def process_spider_output(self, response, result, spider=None):
+        tracker = self.tracker(response)
+        if tracker is None:
+            yield from result
+            return
+        rescheduled = False
+        for output in result:
+            rescheduled = rescheduled or self.sends_again(*tracker, output)
+            yield output
+        tracker[0].complete(tracker[1], rescheduled)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        tracker = self.tracker(response)
+        rescheduled = False
+        async for output in result:
+            rescheduled = rescheduled or (tracker is not None and self.sends_again(*tracker, output))
+            yield output
+        if tracker is not None:
+            tracker[0].complete(tracker[1], rescheduled)
@@ -0,0 +1,169 @@
+# Related-pins graph expansion
+#
+#   scrapy crawl pinterest_pins -a search_query="home decor" -a expand_related=true -a max_depth=2
+#
+# Pins found by the search (or given with -a seed_pins=...) are expanded
+# breadth-first through Pinterest's related pins ("more like this") feed.
+# Every related pin is emitted as an item and recorded as an edge
+# (source pin -> related pin), and pins closer than max_depth to a seed are
+# expanded in turn. Within a depth, pins with more engagement go first.
+#
+# Neither the frontier nor the set of seen pins is held in memory in full:
+# the frontier keeps GRAPH_FRONTIER_MEMORY entries in a heap and spills the
+# rest to a temporary SQLite database, which also holds the seen set. Edges
+# are streamed to GRAPH_EDGES_FILE as fixed-size binary records, or to
+# Parquet when the file name ends in .parquet (pip install pyarrow).
+
+import heapq
+import itertools
+import os
+import sqlite3
+import struct
+from array import array
+
+
+# Edge record of the binary edge file: source pin ID, related pin ID,
+# depth of the source pin, rank of the related pin in the feed
+EDGE_RECORD = struct.Struct('<QQBB')
+
+
+class GraphFrontier:
+    """Pins waiting for expansion, ordered by (depth, -engagement), plus the seen set
+
+    Entries beyond memory_limit are moved to an SQLite table; pop() takes
+    whichever of the heap and the table holds the better entry.
+    """
+
+    def __init__(self, memory_limit=10000, path='', commit_every=1000):
+        # path '' = private temporary database, deleted when closed
+        self.memory_limit = memory_limit
+        self.commit_every = commit_every
+        self.heap = []
+        self.counter = itertools.count()  # FIFO among equal priorities
+        self.spilled = 0
+        self.disk_best = None  # best entry on disk, cached between spills
+        self.uncommitted = 0
+        self.db = sqlite3.connect(path)
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS seen (pin_id TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS frontier (
+                depth INTEGER, score INTEGER, seq INTEGER, pin_id TEXT,
+                PRIMARY KEY (depth, score, seq)
+            ) WITHOUT ROWID;
+        ''')
+
+    def __len__(self):
+        return len(self.heap) + self.spilled
+
+    def see(self, pin_id):
+        """Mark a pin as seen; False if it was seen before"""
+        cursor = self.db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (pin_id,))
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.db.commit()
+            self.uncommitted = 0
+        return cursor.rowcount == 1
+
+    def push(self, pin_id, depth, engagement=0):
+        heapq.heappush(self.heap, (depth, -int(engagement or 0), next(self.counter), pin_id))
+        if len(self.heap) > self.memory_limit:
+            self.spill()
+
+    def spill(self):
+        """Move the worse half of the heap to disk"""
+        self.heap.sort()
+        keep = self.memory_limit // 2
+        spilled = self.heap[keep:]
+        del self.heap[keep:]  # a sorted list is a valid heap
+        self.db.executemany('INSERT INTO frontier VALUES (?, ?, ?, ?)', spilled)
+        self.spilled += len(spilled)
+        self.disk_best = self.read_disk_best()
+
+    def read_disk_best(self):
+        return self.db.execute('SELECT * FROM frontier ORDER BY depth, score, seq LIMIT 1').fetchone()
+
+    def pop(self):
+        """(pin_id, depth) of the best waiting pin, or None when empty"""
+        if self.disk_best is not None and (not self.heap or self.disk_best < self.heap[0]):
+            entry = self.disk_best
+            self.db.execute('DELETE FROM frontier WHERE depth = ? AND score = ? AND seq = ?', entry[:3])
+            self.spilled -= 1
+            self.disk_best = self.read_disk_best() if self.spilled else None
+        elif self.heap:
+            entry = heapq.heappop(self.heap)
+        else:
+            return None
+        depth, _, _, pin_id = entry
+        return pin_id, depth
+
+    def close(self):
+        self.db.close()
+
+
+class EdgeWriter:
+    """Append-only edge list: binary EDGE_RECORD rows, or Parquet"""
+
+    def __init__(self, path, batch_size=100000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self.columns = {name: array(code) for name, code in self.column_types()}
+        if path.endswith('.parquet'):
+            import pyarrow
+            import pyarrow.parquet
+            self.pyarrow = pyarrow
+            schema = pyarrow.schema([
+                ('source', pyarrow.uint64()), ('target', pyarrow.uint64()),
+                ('depth', pyarrow.uint8()), ('rank', pyarrow.uint8()),
+            ])
+            self.writer = pyarrow.parquet.ParquetWriter(path, schema)
+            self.file = None
+        else:
+            self.writer = None
+            self.file = open(path, 'wb')
+
+    @staticmethod
+    def column_types():
+        return (('source', 'Q'), ('target', 'Q'), ('depth', 'B'), ('rank', 'B'))
+
+    def write(self, source, target, depth, rank):
+        """Record an edge; pin IDs must be numeric"""
+        row = (int(source), int(target), min(depth, 255), min(rank, 255))
+        if self.file is not None:
+            self.file.write(EDGE_RECORD.pack(*row))
+        else:
+            for (name, _), value in zip(self.column_types(), row):
+                self.columns[name].append(value)
+            if len(self.columns['source']) >= self.batch_size:
+                self.flush()
+        self.count += 1
+
+    def flush(self):
+        if self.writer is None or not self.columns['source']:
+            return
+        pa = self.pyarrow
+        self.writer.write_table(pa.table({
+            name: pa.array(values, type=self.writer.schema.field(name).type)
+            for name, values in self.columns.items()
+        }))
+        self.columns = {name: array(code) for name, code in self.column_types()}
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        else:
+            self.flush()
+            self.writer.close()
+
+
+def read_edges(path):
+    """Yield (source, target, depth, rank) tuples of a binary edge file"""
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(EDGE_RECORD.size * 4096)
+            if not chunk:
+                return
+            yield from EDGE_RECORD.iter_unpack(chunk)
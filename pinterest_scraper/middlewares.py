@@ -3,11 +3,20 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import random
+import time
+from urllib.parse import urlparse
+
 from scrapy import signals
+from scrapy.downloadermiddlewares.retry import RetryMiddleware, get_retry_request
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured, StopDownload
+from scrapy.utils.response import response_status_message
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from pinterest_scraper.fetch import LatencyTracker, page_type
+
 
 class PinterestScraperSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -100,4 +109,401 @@ class PinterestScraperDownloaderMiddleware:
         pass
 
     def spider_opened(self, spider):
-        spider.logger.info('Spider opened: %s' % spider.name) 
\ No newline at end of file
+        spider.logger.info('Spider opened: %s' % spider.name)
+
+
+class BudgetCancellationMiddleware:
+    """Stop spending on requests once their item budget is met
+
+    Queued requests that can no longer contribute (spider.request_redundant)
+    or cannot finish before the crawl's deadline (spider.request_unfinishable)
+    are dropped when they reach the downloader, and downloads already in
+    flight are aborted as soon as their response starts arriving once their
+    budget is met. All of them count towards the budget/requests_avoided stat.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.announced = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('BUDGET_CANCELLATION_ENABLED', True):
+            raise NotConfigured
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.response_started, signal=signals.headers_received)
+        return middleware
+
+    def redundant(self, request):
+        check = getattr(self.crawler.spider, 'request_redundant', None)
+        if check is None or not check(request):
+            return False
+        if not self.announced:
+            self.announced = True
+            self.crawler.spider.logger.info("🎯 Budget reached, cancelling requests that can no longer contribute")
+        self.crawler.stats.inc_value('budget/requests_avoided')
+        return True
+
+    def process_request(self, request, spider=None):
+        if self.redundant(request):
+            self.crawler.stats.inc_value('budget/requests_dropped')
+            raise IgnoreRequest(f"Budget already met: {request.meta.get('fetch_url', request.url)}")
+        unfinishable = getattr(self.crawler.spider, 'request_unfinishable', None)
+        if unfinishable is not None and unfinishable(request):
+            self.crawler.stats.inc_value('budget/requests_avoided')
+            self.crawler.stats.inc_value('deadline/requests_skipped')
+            raise IgnoreRequest(f"Cannot finish before the deadline: {request.meta.get('fetch_url', request.url)}")
+        return None
+
+    def response_started(self, headers, body_length, request, spider):
+        if self.redundant(request):
+            self.crawler.stats.inc_value('budget/downloads_aborted')
+            raise StopDownload(fail=True)
+
+
+class Superseded(IgnoreRequest):
+    """Dropped because another request carries on the work of this one"""
+
+
+class HedgeLost(Superseded):
+    """The other copy of a hedged request answered first"""
+
+
+class RequestHeld(Superseded):
+    """Sent back to the scheduler to go out later, freeing its downloader slot"""
+
+
+class HedgeRace:
+    """The original of a slow request and its duplicate, until one answers"""
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.outstanding = 1
+        self.hedged = False
+        self.winner = None  # True if the duplicate answered first
+
+
+class HedgedRequestMiddleware:
+    """Send a duplicate of slow proxy fetches and keep the first response
+
+    Requests go through the downloader as usual. Once one has been in flight
+    longer than the learned latency quantile for its page type
+    (HEDGE_QUANTILE, e.g. p95), an identical copy marked hedge_copy is
+    scheduled as a request of its own; whichever response arrives first goes
+    to the spider and the other download is aborted and dropped with
+    HedgeLost. HEDGE_MAX_RATIO caps the duplicates as a share of requests.
+    Hedging needs CONCURRENT_REQUESTS of at least 2 to run both at once.
+    """
+
+    def __init__(self, crawler, quantile=0.95, max_ratio=0.1):
+        self.crawler = crawler
+        self.quantile = quantile
+        self.max_ratio = max_ratio
+        self.fallback_latency = LatencyTracker()
+        self.requests_seen = 0
+        self.hedges_sent = 0
+        self.races = {}  # proxy URL (page and tier) -> HedgeRace
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('HEDGED_REQUESTS_ENABLED'):
+            raise NotConfigured
+        middleware = cls(
+            crawler,
+            quantile=crawler.settings.getfloat('HEDGE_QUANTILE', 0.95),
+            max_ratio=crawler.settings.getfloat('HEDGE_MAX_RATIO', 0.1),
+        )
+        crawler.signals.connect(middleware.response_started, signal=signals.headers_received)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    @property
+    def latency(self):
+        fetch_strategy = getattr(self.crawler.spider, 'fetch_strategy', None)
+        return fetch_strategy.latency if fetch_strategy else self.fallback_latency
+
+    def process_request(self, request, spider=None):
+        fetch_url = request.meta.get('fetch_url')
+        if fetch_url is None or request.meta.get('hedge_copy') or request.url in self.races:
+            return None  # not a proxy fetch, a duplicate, or a retry within a race
+
+        self.requests_seen += 1
+        threshold = self.latency.quantile(page_type(fetch_url), self.quantile)
+        if threshold is None:
+            return None  # not enough samples yet for this page type
+
+        from twisted.internet import reactor
+        self.races[request.url] = HedgeRace(reactor.callLater(threshold, self.hedge, request))
+        return None
+
+    def hedge(self, request):
+        """Schedule a duplicate of a request that is still in flight after the threshold"""
+        race = self.races.get(request.url)
+        if race is None or race.winner is not None:
+            return
+        if self.hedges_sent >= self.max_ratio * self.requests_seen:
+            self.crawler.stats.inc_value('hedge/skipped_ratio_cap')
+            return
+        if not self.spend(request):
+            self.crawler.stats.inc_value('hedge/skipped_budget')
+            return
+
+        self.hedges_sent += 1
+        self.crawler.stats.inc_value('hedge/sent')
+        race.hedged = True
+        race.outstanding += 1
+        meta = dict(request.meta)
+        meta['hedge_copy'] = True
+        self.crawler.engine.crawl(request.replace(meta=meta, dont_filter=True, priority=request.priority + 100))
+
+    def spend(self, request):
+        """Charge the duplicate's tier credits to the crawl's budget; False if refused"""
+        fetch_strategy = getattr(self.crawler.spider, 'fetch_strategy', None)
+        if fetch_strategy is None:
+            return True
+        tier = fetch_strategy.tiers[request.meta.get('fetch_tier', 0)]
+        return fetch_strategy.spend(tier['credits'])
+
+    def settle(self, request):
+        """Record that one copy of a race got its outcome; returns the race or None"""
+        race = self.races.get(request.url)
+        if race is None:
+            return None
+        race.outstanding -= 1
+        if race.outstanding <= 0:
+            del self.races[request.url]
+            if race.timer.active():
+                race.timer.cancel()
+        return race
+
+    def process_response(self, request, response, spider=None):
+        race = self.settle(request)
+        if race is None:
+            return response
+        is_copy = bool(request.meta.get('hedge_copy'))
+        if race.winner is None:
+            race.winner = is_copy
+            if race.hedged:
+                self.crawler.stats.inc_value('hedge/won' if is_copy else 'hedge/lost')
+            return response
+        if race.winner != is_copy:
+            raise HedgeLost(f"The other copy answered first: {request.meta['fetch_url']}")
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        race = self.settle(request)
+        if race is None or isinstance(exception, HedgeLost):
+            return None
+        if race.winner is not None and race.winner != bool(request.meta.get('hedge_copy')):
+            raise HedgeLost(f"The other copy answered first: {request.meta['fetch_url']}")
+        if race.winner is None and race.outstanding > 0:
+            # The other copy is still in flight: a failure only counts if both fail
+            raise HedgeLost(f"Failed while the other copy is in flight: {request.meta['fetch_url']}")
+        return None
+
+    def response_started(self, headers, body_length, request, spider):
+        race = self.races.get(request.url)
+        if race is not None and race.winner is not None and race.winner != bool(request.meta.get('hedge_copy')):
+            self.crawler.stats.inc_value('hedge/downloads_aborted')
+            raise StopDownload(fail=True)
+
+    def spider_closed(self, spider):
+        for race in self.races.values():
+            if race.timer.active():
+                race.timer.cancel()
+        self.races.clear()
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one endpoint"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, max_cooldown=600.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = None
+
+    def allow_request(self):
+        """True if a request may go out now"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self.trial_started_at = None
+        # Half-open: a single trial request at a time (a lost trial times out)
+        if self.trial_started_at is None or now - self.trial_started_at > self.cooldown:
+            self.trial_started_at = now
+            return True
+        return False
+
+    def retry_after(self):
+        """Seconds until the breaker may let a request through again"""
+        if self.state == self.OPEN:
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+        if self.state == self.HALF_OPEN and self.trial_started_at is not None:
+            return max(0.0, self.cooldown - (time.monotonic() - self.trial_started_at))
+        return 0.0
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self.trial_started_at = None
+
+    def record_failure(self):
+        """Count a failure; returns True if this failure opened the breaker"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            # The trial failed: stay away for longer this time
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        elif self.failures < self.failure_threshold or self.state == self.OPEN:
+            return False
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.trial_started_at = None
+        return True
+
+
+class CircuitBreakerRetryMiddleware(RetryMiddleware):
+    """Retry middleware with per-endpoint circuit breakers and a retry budget
+
+    Replaces Scrapy's RetryMiddleware. Endpoints are Pinterest page types for
+    proxy fetches (search, pin, board, ...) and hosts otherwise. While an
+    endpoint's breaker is open its requests are held back instead of being
+    sent into a wall. Retries are spaced with jittered exponential backoff and
+    limited to RETRY_BUDGET_RATIO of successful responses. Held and backed-off
+    requests are raised as RequestHeld and re-scheduled after their delay, so
+    they do not occupy a downloader slot while they wait.
+    """
+
+    def __init__(self, settings):
+        super(CircuitBreakerRetryMiddleware, self).__init__(settings)
+        self.failure_threshold = settings.getint('BREAKER_FAILURE_THRESHOLD', 5)
+        self.cooldown = settings.getfloat('BREAKER_COOLDOWN', 30.0)
+        self.max_hold = settings.getfloat('BREAKER_MAX_HOLD', 600.0)
+        self.budget_ratio = settings.getfloat('RETRY_BUDGET_RATIO', 0.2)
+        self.budget_minimum = settings.getint('RETRY_BUDGET_MIN', 10)
+        self.backoff_base = settings.getfloat('RETRY_BACKOFF_BASE', 1.0)
+        self.backoff_max = settings.getfloat('RETRY_BACKOFF_MAX', 60.0)
+        self.breakers = {}
+        self.held = set()  # delayed calls re-scheduling held requests
+        self.successes = 0
+        self.retries = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = super(CircuitBreakerRetryMiddleware, cls).from_crawler(crawler)
+        crawler.signals.connect(middleware.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def endpoint(self, request):
+        if 'fetch_url' in request.meta:
+            return page_type(request.meta['fetch_url'])
+        return urlparse(request.url).netloc
+
+    def breaker_for(self, request):
+        endpoint = self.endpoint(request)
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return endpoint, self.breakers[endpoint]
+
+    def process_request(self, request, spider=None):
+        delay = request.meta.get('retry_not_before', 0) - time.time()
+        if delay > 0:
+            self.hold(request, delay)
+
+        endpoint, breaker = self.breaker_for(request)
+        if breaker.allow_request():
+            request.meta.pop('breaker_held_since', None)
+            return None
+        if 'breaker_held_since' not in request.meta:
+            request.meta['breaker_held_since'] = time.time()
+            self.crawler.stats.inc_value('breaker/requests_held')
+        elif time.time() - request.meta['breaker_held_since'] >= self.max_hold:
+            self.crawler.stats.inc_value('breaker/requests_dropped')
+            raise IgnoreRequest(f"Circuit breaker for {endpoint} stayed open")
+        self.hold(request, max(1.0, breaker.retry_after()))
+
+    def hold(self, request, delay):
+        """Hand the request back to the scheduler after a delay instead of waiting in its slot"""
+        from twisted.internet import reactor
+        self.held.add(reactor.callLater(delay, self.release, request))
+        raise RequestHeld(f"Held for {delay:.1f}s: {request.url}")
+
+    def release(self, request):
+        self.held = {call for call in self.held if call.active()}
+        self.crawler.engine.crawl(request.replace(dont_filter=True))
+
+    def spider_idle(self, spider):
+        if self.held:
+            raise DontCloseSpider  # held requests are still to come
+
+    def spider_closed(self, spider):
+        for call in self.held:
+            if call.active():
+                call.cancel()
+        self.held.clear()
+
+    def process_response(self, request, response, spider=None):
+        endpoint, breaker = self.breaker_for(request)
+        if response.status in self.retry_http_codes:
+            self.record_failure(endpoint, breaker)
+            if request.meta.get('dont_retry', False):
+                return response
+            return self.retry(request, response_status_message(response.status)) or response
+
+        breaker.record_success()
+        self.update_state_stat(endpoint, breaker)
+        self.successes += 1
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        if not isinstance(exception, self.exceptions_to_retry):
+            return None
+        endpoint, breaker = self.breaker_for(request)
+        self.record_failure(endpoint, breaker)
+        if request.meta.get('dont_retry', False):
+            return None
+        return self.retry(request, exception)
+
+    def record_failure(self, endpoint, breaker):
+        if breaker.record_failure():
+            self.crawler.stats.inc_value('breaker/opened')
+            self.crawler.stats.inc_value(f'breaker/{endpoint}/opened')
+        self.update_state_stat(endpoint, breaker)
+
+    def update_state_stat(self, endpoint, breaker):
+        self.crawler.stats.set_value(f'breaker/{endpoint}/state', breaker.state)
+
+    def retry(self, request, reason):
+        """Build a backed-off retry request, within the global retry budget"""
+        if self.retries >= self.budget_minimum + self.budget_ratio * self.successes:
+            self.crawler.stats.inc_value('retry_budget/denied')
+            return None
+
+        retry_request = get_retry_request(
+            request,
+            spider=self.crawler.spider,
+            reason=reason,
+            max_retry_times=request.meta.get('max_retry_times', self.max_retry_times),
+            priority_adjust=request.meta.get('priority_adjust', self.priority_adjust),
+        )
+        if retry_request is None:
+            return None
+
+        self.retries += 1
+        attempt = retry_request.meta.get('retry_times', 1)
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_request.meta['retry_not_before'] = time.time() + delay
+        self.crawler.stats.inc_value('retry/backoff_seconds', round(delay, 2))
+        return retry_request
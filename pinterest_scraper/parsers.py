@@ -0,0 +1,218 @@
+# HTML parser backends used by the spiders' extraction helpers
+#
+# The spiders never call response.css() directly for field extraction; they go
+# through the backend selected with the PARSER_BACKEND setting:
+#
+#   PARSER_BACKEND = 'lxml'        # parsel/lxml, the historical behaviour
+#   PARSER_BACKEND = 'selectolax'  # lexbor engine, pip install selectolax
+
+import re
+from weakref import WeakKeyDictionary
+
+from scrapy.http import TextResponse
+
+from pinterest_scraper import search_results
+
+
+# Splits parsel's pseudo-elements off a query: 'h1::text', 'a::attr(href)'
+PSEUDO_ELEMENT_RE = re.compile(r'^(?P<css>.*?)::(?:(?P<text>text)|attr\((?P<attr>[^)]+)\))\s*$', re.DOTALL)
+
+# Selector extensions understood by cssselect but not by standard CSS engines
+UNSUPPORTED_CSS_RE = re.compile(r':contains\(')
+
+
+class ParserBackend:
+    """Interface every parser backend implements"""
+
+    name = None
+
+    def get(self, response, query):
+        """Return the first match of a CSS query (with ::text/::attr) or None"""
+        raise NotImplementedError
+
+    def getall(self, response, query):
+        """Return all matches of a CSS query as a list of strings"""
+        raise NotImplementedError
+
+    def exists(self, response, query):
+        """Check whether a CSS query matches anything"""
+        raise NotImplementedError
+
+    def search_results(self, response, search_type):
+        """(selector, results) of the first result selector of a search page matching anything"""
+        raise NotImplementedError
+
+    def result_fields(self, result):
+        """href, title, description, thumbnail and creator of one result (see search_results.py)"""
+        raise NotImplementedError
+
+    def visible_results_count(self, response):
+        """Number of result-like elements on a search page"""
+        raise NotImplementedError
+
+
+class LxmlBackend(ParserBackend):
+    """parsel/lxml backend, identical to calling response.css() directly"""
+
+    name = 'lxml'
+
+    def get(self, response, query):
+        return response.css(query).get()
+
+    def getall(self, response, query):
+        return response.css(query).getall()
+
+    def exists(self, response, query):
+        return bool(response.css(query))
+
+    def search_results(self, response, search_type):
+        return search_results.result_containers(response.selector.root, search_type)
+
+    def result_fields(self, result):
+        return search_results.result_fields(result)
+
+    def visible_results_count(self, response):
+        return search_results.visible_results_count(response.selector.root)
+
+
+class SelectolaxBackend(ParserBackend):
+    """selectolax/lexbor backend
+
+    The document is parsed once per response and CSS queries run natively,
+    skipping the CSS-to-XPath translation. Queries lexbor cannot handle
+    (parsel's :contains(), selections on sub-selectors) fall back to lxml.
+    """
+
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.parser_cls = LexborHTMLParser
+        self.fallback = LxmlBackend()
+        self.trees = WeakKeyDictionary()
+
+    def get(self, response, query):
+        values = self._select(response, query, first=True)
+        if values is None:
+            return self.fallback.get(response, query)
+        return values[0] if values else None
+
+    def getall(self, response, query):
+        values = self._select(response, query)
+        if values is None:
+            return self.fallback.getall(response, query)
+        return values
+
+    def exists(self, response, query):
+        if not isinstance(response, TextResponse) or UNSUPPORTED_CSS_RE.search(query):
+            return self.fallback.exists(response, query)
+        try:
+            return self._tree(response).css_first(query) is not None
+        except Exception:
+            return self.fallback.exists(response, query)
+
+    def search_results(self, response, search_type):
+        if not isinstance(response, TextResponse):
+            return None, []
+        return search_results.lexbor_result_containers(self._tree(response), search_type)
+
+    def result_fields(self, result):
+        return search_results.lexbor_result_fields(result)
+
+    def visible_results_count(self, response):
+        if not isinstance(response, TextResponse):
+            return 0
+        # lexbor returns an element once per selector of the list it matches
+        return len({node.mem_id for node in self._tree(response).css(search_results.VISIBLE_RESULTS_CSS)})
+
+    def _tree(self, response):
+        tree = self.trees.get(response)
+        if tree is None:
+            tree = self.parser_cls(response.text)
+            self.trees[response] = tree
+        return tree
+
+    def _select(self, response, query, first=False):
+        """Run a query natively, returning None when lxml must handle it"""
+        if not isinstance(response, TextResponse) or UNSUPPORTED_CSS_RE.search(query):
+            return None
+
+        match = PSEUDO_ELEMENT_RE.match(query)
+        raw_css = match.group('css') if match else query
+        css = raw_css.strip()
+        if not css:
+            return None
+        # 'div ::text' (note the space) selects the text of all descendants,
+        # 'div::text' only the text nodes directly inside the div
+        descendant = match is not None and raw_css != raw_css.rstrip()
+
+        try:
+            nodes = self._tree(response).css(css)
+        except Exception:
+            return None
+
+        values = []
+        visited = set()  # nested matches share descendants; parsel returns each node once
+        for node in nodes:
+            if match is None:
+                values.append(node.html)
+            elif descendant:
+                for child in node.traverse(include_text=True):
+                    if child.mem_id in visited:
+                        continue
+                    visited.add(child.mem_id)
+                    value = self._node_value(child, match)
+                    if value is not None:
+                        values.append(value)
+            elif match.group('attr'):
+                value = node.attributes.get(match.group('attr').strip())
+                if value is not None:
+                    values.append(value)
+            else:
+                # parsel's ::text yields each direct child text node separately
+                values.extend(
+                    child.text_content for child in node.iter(include_text=True)
+                    if child.tag == '-text' and child.text_content is not None
+                )
+            if first and values:
+                break
+
+        return values
+
+    @staticmethod
+    def _node_value(node, match):
+        """Text of a text node, or an attribute of an element, for a descendant query"""
+        if match.group('attr'):
+            if node.tag == '-text':
+                return None
+            return node.attributes.get(match.group('attr').strip())
+        return node.text_content if node.tag == '-text' else None
+
+
+PARSER_BACKENDS = {
+    LxmlBackend.name: LxmlBackend,
+    SelectolaxBackend.name: SelectolaxBackend,
+}
+
+
+def load_parser_backend(settings):
+    """Instantiate the backend named by the PARSER_BACKEND setting"""
+    name = settings.get('PARSER_BACKEND', 'lxml')
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown PARSER_BACKEND: {name} (choose from {', '.join(PARSER_BACKENDS)})")
+    return PARSER_BACKENDS[name]()
+
+
+def compare_backends(response, queries, backends=None):
+    """Return the queries whose results differ between backends
+
+    Useful from `scrapy shell` or against saved pages before switching
+    PARSER_BACKEND: maps each differing query to {backend name: result}.
+    """
+    backends = backends or [backend_cls() for backend_cls in PARSER_BACKENDS.values()]
+    mismatches = {}
+    for query in queries:
+        results = {backend.name: backend.getall(response, query) for backend in backends}
+        if len({tuple(result) for result in results.values()}) > 1:
+            mismatches[query] = results
+    return mismatches
@@ -5,9 +5,13 @@
 
 import csv
 import json
-import re
 from datetime import datetime
 from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+
+from pinterest_scraper.trends import TrendStore
+from pinterest_scraper.urls import canonical_url, is_canonical, is_valid_url, url_key
+from pinterest_scraper.utils import parse_numbers
 
 
 class PinterestScrapyPipeline:
@@ -20,17 +24,30 @@ class PinterestScrapyPipeline:
     def open_spider(self, spider):
         """Initialize CSV files for different item types based on spider type"""
         timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+        if spider.settings.getint('SHARD_COUNT', 1) > 1:
+            # Sharded run: workers start together, keep their files apart
+            timestamp += f"_shard{spider.settings.getint('SHARD_INDEX', 0)}"
         
         # Define which item types each spider generates
         spider_item_types = {
             'pinterest_search': ['PinterestSearchItem', 'PinterestTrendingItem'],
             'pinterest_pins': ['PinterestPinItem'],
-            'pinterest_boards': ['PinterestBoardItem']
+            'pinterest_boards': ['PinterestBoardItem'],
+            'pinterest_users': ['PinterestUserItem'],
+            'pinterest_combined': ['PinterestPinItem', 'PinterestBoardItem', 'PinterestSearchItem', 'PinterestTrendingItem']
         }
         
         # Get the item types for this specific spider
         spider_name = spider.name
-        item_types_to_create = spider_item_types.get(spider_name, [])
+        item_types_to_create = list(spider_item_types.get(spider_name, []))
+        if getattr(spider, 'entities', None) is not None and 'PinterestPinItem' in item_types_to_create:
+            # Boards and users collected from pin pages (see entities.py)
+            item_types_to_create += [
+                item_type for item_type in ('PinterestBoardItem', 'PinterestUserItem')
+                if item_type not in item_types_to_create
+            ]
+        if getattr(spider, 'expand_pins', False) and 'PinterestPinItem' not in item_types_to_create:
+            item_types_to_create.append('PinterestPinItem')  # pins streamed from board feeds
         
         # Define item types and their corresponding CSV files
         item_types = {
@@ -133,15 +150,15 @@ class DataValidationPipeline:
             if not adapter.get(field):
                 raise ValueError(f"Missing required field for pin: {field}")
                 
-        # Validate URL format
-        if adapter.get('pin_url') and not self.is_valid_url(adapter['pin_url']):
-            adapter['pin_url'] = ''
+        # Validate URL format (canonical Pinterest URLs are valid)
+        pin_url = adapter.get('pin_url')
+        if pin_url and not is_canonical(pin_url):
+            pin_url = canonical_url(pin_url)
+            adapter['pin_url'] = pin_url if self.is_valid_url(pin_url) else ''
+        self.canonicalize_url_fields(adapter, ['board_url', 'pinner_url'])
             
         # Validate numeric fields
-        numeric_fields = ['pin_likes', 'pin_comments', 'pin_repins', 'pinner_follower_count']
-        for field in numeric_fields:
-            if adapter.get(field):
-                adapter[field] = self.parse_number(adapter[field])
+        self.parse_numeric_fields(adapter, ['pin_likes', 'pin_comments', 'pin_repins', 'pinner_follower_count'])
 
     def validate_board_item(self, adapter):
         """Validate Pinterest board data"""
@@ -151,15 +168,15 @@ class DataValidationPipeline:
             if not adapter.get(field):
                 raise ValueError(f"Missing required field for board: {field}")
                 
+        self.canonicalize_url_fields(adapter, ['board_url', 'owner_url'])
+        
         # Validate numeric fields
-        numeric_fields = ['pin_count', 'follower_count', 'collaborator_count']
-        for field in numeric_fields:
-            if adapter.get(field):
-                adapter[field] = self.parse_number(adapter[field])
+        self.parse_numeric_fields(adapter, ['pin_count', 'follower_count', 'collaborator_count'])
 
     def validate_user_item(self, adapter):
         """Validate Pinterest user data"""
-        required_fields = ['user_id', 'username']
+        # user_id is the numeric ID, unknown for users only seen on pin pages
+        required_fields = ['username']
         
         for field in required_fields:
             if not adapter.get(field):
@@ -168,12 +185,10 @@ class DataValidationPipeline:
         # Clean username
         if adapter.get('username'):
             adapter['username'] = adapter['username'].replace('@', '').strip()
+        self.canonicalize_url_fields(adapter, ['profile_url'])
             
         # Validate numeric fields
-        numeric_fields = ['follower_count', 'following_count', 'pin_count', 'board_count']
-        for field in numeric_fields:
-            if adapter.get(field):
-                adapter[field] = self.parse_number(adapter[field])
+        self.parse_numeric_fields(adapter, ['follower_count', 'following_count', 'pin_count', 'board_count'])
 
     def validate_search_item(self, adapter):
         """Validate Pinterest search data"""
@@ -182,49 +197,32 @@ class DataValidationPipeline:
         for field in required_fields:
             if not adapter.get(field):
                 raise ValueError(f"Missing required field for search result: {field}")
+        self.canonicalize_url_fields(adapter, ['result_url'])
 
     def is_valid_url(self, url):
         """Check if URL is valid"""
-        url_pattern = re.compile(
-            r'^https?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-            r'localhost|'  # localhost...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-        return url_pattern.match(url) is not None
-
-    def parse_number(self, value):
-        """Parse number from string with K, M suffixes"""
-        if isinstance(value, (int, float)):
-            return value
-            
-        if not value or value == 'N/A':
-            return 0
-            
-        value_str = str(value).strip().replace(',', '')
-        
-        # Handle K, M, B suffixes
-        if value_str.endswith('K') or value_str.endswith('k'):
-            try:
-                return int(float(value_str[:-1]) * 1000)
-            except ValueError:
-                return 0
-        elif value_str.endswith('M') or value_str.endswith('m'):
-            try:
-                return int(float(value_str[:-1]) * 1000000)
-            except ValueError:
-                return 0
-        elif value_str.endswith('B') or value_str.endswith('b'):
-            try:
-                return int(float(value_str[:-1]) * 1000000000)
-            except ValueError:
-                return 0
-        else:
-            try:
-                return int(float(value_str))
-            except ValueError:
-                return 0
+        return is_valid_url(url)
+
+    def canonicalize_url_fields(self, adapter, fields):
+        """Rewrite Pinterest URLs in their canonical form (see urls.py)
+
+        The spiders canonicalize when they build items, so this mostly only
+        checks; items from elsewhere are rewritten.
+        """
+        for field in fields:
+            url = adapter.get(field)
+            if url and not is_canonical(url):
+                adapter[field] = canonical_url(url)
+
+    def parse_numeric_fields(self, adapter, fields):
+        """Replace scraped counts ("1.2K") with numbers"""
+        present = {}
+        for field in fields:
+            value = adapter.get(field)
+            if value:
+                present[field] = value
+        for field, number in zip(present, parse_numbers(list(present.values()))):
+            adapter[field] = number
 
 
 class DuplicateFilterPipeline:
@@ -256,12 +254,17 @@ class DuplicateFilterPipeline:
 
     def get_unique_identifier(self, adapter, item_type):
         """Get unique identifier for different item types"""
+        # Pins, boards and users are keyed by URL when they have one, so every
+        # spelling of the same pin/board/profile URL gives the same key
         if item_type == 'PinterestPinItem':
-            return adapter.get('pin_id') or adapter.get('pin_url', '')
+            url = adapter.get('pin_url')
+            return url_key(url) if url else adapter.get('pin_id', '')
         elif item_type == 'PinterestBoardItem':
-            return adapter.get('board_id') or adapter.get('board_url', '')
+            url = adapter.get('board_url')
+            return url_key(url) if url else adapter.get('board_id', '')
         elif item_type == 'PinterestUserItem':
-            return adapter.get('user_id') or adapter.get('username', '')
+            url = adapter.get('profile_url')
+            return url_key(url) if url else f"user:{adapter.get('username', '').lower()}"
         elif item_type == 'PinterestSearchItem':
             return f"{adapter.get('search_query', '')}_{adapter.get('result_id', '')}"
         elif item_type == 'PinterestTrendingItem':
@@ -320,4 +323,43 @@ class DataEnrichmentPipeline:
         try:
             return int(float(str(value).replace(',', '')))
         except (ValueError, TypeError):
-            return 0 
\ No newline at end of file
+            return 0 
+
+
+class TrendStorePipeline:
+    """Append trending snapshots to the trend time-series store (see trends.py)"""
+
+    def __init__(self, directory, compact_every=1000, max_segments=8):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.max_segments = max_segments
+        self.store = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get('TREND_STORE_DIR'):
+            raise NotConfigured
+        return cls(
+            settings.get('TREND_STORE_DIR'),
+            settings.getint('TREND_COMPACT_EVERY', 1000),
+            settings.getint('TREND_MAX_SEGMENTS', 8)
+        )
+
+    def open_spider(self, spider):
+        if spider.name in ('pinterest_search', 'pinterest_combined'):
+            self.store = TrendStore(self.directory, self.compact_every, self.max_segments)
+
+    def close_spider(self, spider):
+        if self.store is not None:
+            self.store.close()
+
+    def process_item(self, item, spider):
+        """Record a trend and fill in its growth rate from earlier snapshots"""
+        if self.store is None or item.__class__.__name__ != 'PinterestTrendingItem':
+            return item
+        adapter = ItemAdapter(item)
+        timestamp = datetime.fromisoformat(adapter['scraped_at']).timestamp() if adapter.get('scraped_at') else None
+        self.store.append(adapter['trend_name'], adapter['position'], adapter.get('trend_score'), timestamp)
+        adapter['growth_rate'] = self.store.growth_rate(adapter['trend_name'], now=timestamp)
+        return item
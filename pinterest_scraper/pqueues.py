@@ -0,0 +1,129 @@
+# Fair scheduling between search queries
+#
+# Scrapy's scheduler pops requests in priority + LIFO order, so on a bulk run
+# the first query's pin pages keep jumping ahead of everything else and a
+# time-boxed crawl ends with complete data for a few queries and nothing for
+# the rest. FairQueryPriorityQueue keeps one priority queue per
+# (search query, discovery/detail) group and serves the groups by weighted
+# fair queuing: each group gets a share of the downloads proportional to its
+# weight, whatever order its requests were scheduled in.
+#
+#   SCHEDULER_PRIORITY_QUEUE = 'pinterest_scraper.pqueues.FairQueryPriorityQueue'
+#
+# Query weights come from a 'weight' column/key in the queries file or from
+# the QUERY_WEIGHTS setting; SCHEDULER_DISCOVERY_WEIGHT and
+# SCHEDULER_DETAIL_WEIGHT balance search pages against pin/board pages.
+
+import hashlib
+
+from scrapy.pqueues import ScrapyPriorityQueue
+
+from pinterest_scraper.fetch import page_type
+
+
+# Page types that only lead to more requests, as opposed to item pages
+DISCOVERY_PAGE_TYPES = ('search', 'today', 'resource')
+
+
+def path_safe(text):
+    """Filesystem-safe name of a group's disk queue, unique per group
+
+    Same names as Scrapy's (private) pqueues._path_safe, so JOBDIRs of
+    earlier runs still resume.
+    """
+    safe = ''.join(c if c.isalnum() or c in '-._' else '_' for c in text)
+    return f"{safe}-{hashlib.md5(text.encode('utf8')).hexdigest()}"
+
+
+class FairQueryPriorityQueue:
+    """Weighted fair queuing across search query groups"""
+
+    @classmethod
+    def from_crawler(cls, crawler, downstream_queue_cls, key, startprios=None, **kwargs):
+        return cls(crawler, downstream_queue_cls, key, startprios, **kwargs)
+
+    def __init__(self, crawler, downstream_queue_cls, key, group_startprios=None, start_queue_cls=None):
+        if group_startprios and not isinstance(group_startprios, dict):
+            raise ValueError(
+                "FairQueryPriorityQueue can only resume a crawl started with the same priority queue class"
+            )
+        settings = crawler.settings
+        self.crawler = crawler
+        self.downstream_queue_cls = downstream_queue_cls
+        self.start_queue_cls = start_queue_cls
+        self.key = key
+        self.query_weights = settings.getdict('QUERY_WEIGHTS')
+        self.kind_weights = {
+            'discovery': settings.getfloat('SCHEDULER_DISCOVERY_WEIGHT', 1.0),
+            'detail': settings.getfloat('SCHEDULER_DETAIL_WEIGHT', 1.0),
+        }
+
+        self.pqueues = {}  # group -> ScrapyPriorityQueue
+        self.weights = {}  # group -> weight
+        self.finish = {}  # group -> virtual finish time of its last served request
+        self.virtual_time = 0.0
+        for group, startprios in (group_startprios or {}).items():
+            self.pqueues[group] = self.pqfactory(group, startprios)
+            self.weights.setdefault(group, 1.0)
+            self.finish[group] = 0.0
+
+    def pqfactory(self, group, startprios=()):
+        kwargs = {'start_queue_cls': self.start_queue_cls} if self.start_queue_cls else {}
+        return ScrapyPriorityQueue(
+            self.crawler,
+            self.downstream_queue_cls,
+            self.key + '/' + path_safe(group),
+            startprios,
+            **kwargs
+        )
+
+    def group_of(self, request):
+        """(group name, weight) of a request"""
+        meta = request.meta
+        url = meta.get('fetch_url', request.url)
+        kind = 'discovery' if page_type(url) in DISCOVERY_PAGE_TYPES else 'detail'
+        query = meta.get('search_query') or ''
+        weight = meta.get('query_weight') or self.query_weights.get(query, 1.0)
+        return f'{kind}:{query}', float(weight) * self.kind_weights[kind]
+
+    def push(self, request):
+        group, weight = self.group_of(request)
+        if group not in self.pqueues:
+            self.pqueues[group] = self.pqfactory(group)
+            # A group joining (or re-joining) starts at the current virtual
+            # time, so it gets its fair share from now on but no back-credit
+            self.finish[group] = max(self.finish.get(group, 0.0), self.virtual_time)
+        self.weights[group] = weight
+        self.pqueues[group].push(request)
+
+    def next_group(self):
+        if not self.pqueues:
+            return None
+        return min(self.pqueues, key=lambda group: (self.finish[group], group))
+
+    def pop(self):
+        group = self.next_group()
+        if group is None:
+            return None
+        queue = self.pqueues[group]
+        request = queue.pop()
+        self.virtual_time = self.finish[group]
+        self.finish[group] += 1.0 / max(self.weights.get(group, 1.0), 1e-6)
+        if len(queue) == 0:
+            del self.pqueues[group]
+            queue.close()
+        return request
+
+    def peek(self):
+        group = self.next_group()
+        if group is None:
+            return None
+        return self.pqueues[group].peek()
+
+    def close(self):
+        active = {group: queue.close() for group, queue in self.pqueues.items()}
+        self.pqueues.clear()
+        return active
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.pqueues.values())
@@ -0,0 +1,134 @@
+# Query files for bulk crawls
+#
+# A queries file holds one search query per entry and is read lazily, so a
+# crawl over tens of thousands of keywords never loads the whole list:
+#
+#   queries.txt       one query per line ('#' starts a comment)
+#   queries.csv       header row with a 'query' column, optional 'max_items'
+#   queries.jsonl     {"query": "...", "max_items": 50}
+#
+# Any of them may be gzip-compressed (queries.txt.gz, queries.csv.gz, ...).
+#
+# QueryFrontier holds the queries a search crawl discovers on its own, from
+# the suggestions on its search pages (-a expand_queries=true).
+
+import csv
+import gzip
+import heapq
+import itertools
+import json
+
+
+def open_text(path):
+    """Open a possibly gzip-compressed text file"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def file_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return 'text'
+
+
+def iter_queries(path):
+    """Lazily yield query entries: dicts with 'query' and optional 'max_items'"""
+    with open_text(path) as file:
+        fmt = file_format(path)
+        if fmt == 'jsonl':
+            rows = (json.loads(line) for line in file if line.strip())
+        elif fmt == 'csv':
+            rows = csv.DictReader(file)
+        else:
+            rows = ({'query': line} for line in file if not line.lstrip().startswith('#'))
+
+        for row in rows:
+            entry = normalize_entry(row)
+            if entry:
+                yield entry
+
+
+def normalize_entry(row):
+    """Clean one raw row; returns None for rows without a query"""
+    query = (row.get('query') or row.get('search_query') or '').strip()
+    if not query:
+        return None
+
+    entry = dict(row)
+    entry['query'] = query
+    entry.pop('search_query', None)
+
+    max_items = row.get('max_items')
+    try:
+        entry['max_items'] = int(max_items) if max_items not in (None, '') else None
+    except (TypeError, ValueError):
+        entry['max_items'] = None
+
+    return entry
+
+
+def normalize_query(query):
+    """Dedupe key of a query: lowercase, single spaces"""
+    return ' '.join(query.lower().split())
+
+
+class QueryFrontier:
+    """Queries discovered from search suggestions, ranked by how often they recur
+
+    Every query is crawled at most once. A suggestion scores one point per
+    search page it appears on; pop() returns the highest-scoring query
+    (shallowest first on ties) until max_queries queries, seeds included,
+    have been handed out. Suggestions deeper than max_depth are ignored.
+    """
+
+    def __init__(self, max_queries=50, max_depth=2, min_count=1):
+        self.max_queries = max_queries
+        self.max_depth = max_depth
+        self.min_count = min_count
+        self.crawled = set()  # keys of seeds and popped queries
+        self.counts = {}  # key -> pages it was suggested on
+        self.candidates = {}  # key -> (query as first seen, depth)
+        self.heap = []  # (-count, depth, seq, key); stale entries are skipped
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def add_seed(self, query):
+        key = normalize_query(query)
+        self.crawled.add(key)
+        self.candidates.pop(key, None)
+
+    def observe(self, suggestions, depth):
+        """Count the suggestions of one search page, found at a given depth"""
+        if depth > self.max_depth:
+            return
+        for suggestion in set(suggestions):
+            key = normalize_query(suggestion)
+            if not key or key in self.crawled:
+                continue
+            self.counts[key] = self.counts.get(key, 0) + 1
+            query, known_depth = self.candidates.get(key, (suggestion.strip(), depth))
+            self.candidates[key] = (query, min(depth, known_depth))
+            heapq.heappush(self.heap, (-self.counts[key], min(depth, known_depth), next(self.counter), key))
+
+    def exhausted(self):
+        return len(self.crawled) >= self.max_queries
+
+    def pop(self):
+        """(query, depth) of the best candidate, or None"""
+        while self.heap and not self.exhausted():
+            negative_count, depth, _, key = heapq.heappop(self.heap)
+            if key not in self.candidates or -negative_count != self.counts[key]:
+                continue  # crawled already, or counted again since this entry
+            if -negative_count < self.min_count:
+                heapq.heappush(self.heap, (negative_count, depth, next(self.counter), key))
+                return None
+            query, depth = self.candidates.pop(key)
+            self.crawled.add(key)
+            return query, depth
+        return None
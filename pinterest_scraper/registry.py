@@ -0,0 +1,68 @@
+# Request registry for entity pages (pins, boards)
+#
+# Tracks every pin/board the spider has asked for, keyed on its ID, so the
+# same pin found under several queries is requested once. Requests are
+# counted as in flight until their item is produced (completed) or they fail
+# (released), which lets budgets count completed + in-flight work: a failed
+# pin frees its budget slot instead of cutting the run short.
+
+from collections import deque
+
+
+class RequestRegistry:
+    """In-flight and completed entity keys with per-query counts"""
+
+    def __init__(self, spare_limit=100):
+        self.in_flight = {}  # key -> search query it was requested for
+        self.completed = set()
+        self.in_flight_per_query = {}
+        self.spare_limit = spare_limit
+        self.spares = {}  # search query -> deque of (key, url, meta) not requested yet
+
+    def __contains__(self, key):
+        return key in self.in_flight or key in self.completed
+
+    def admit(self, key, query=None):
+        """Mark key in flight; False if it was already requested"""
+        if key in self:
+            return False
+        self.in_flight[key] = query
+        self.in_flight_per_query[query] = self.in_flight_per_query.get(query, 0) + 1
+        return True
+
+    def complete(self, key):
+        """Mark key done; returns the query it was requested for"""
+        query = self.forget(key)
+        self.completed.add(key)
+        return query
+
+    def release(self, key):
+        """Drop a failed key so it can be requested again"""
+        return self.forget(key)
+
+    def forget(self, key):
+        if key not in self.in_flight:
+            return None
+        query = self.in_flight.pop(key)
+        self.in_flight_per_query[query] -= 1
+        return query
+
+    def in_flight_count(self, query=None):
+        """In-flight requests for a query, or for all queries"""
+        if query is None:
+            return len(self.in_flight)
+        return self.in_flight_per_query.get(query, 0)
+
+    def keep_spare(self, query, key, url, meta):
+        """Remember a link found beyond the budget, used if a request fails"""
+        spares = self.spares.setdefault(query, deque())
+        if key not in self and len(spares) < self.spare_limit:
+            spares.append((key, url, meta))
+
+    def next_spare(self, query):
+        spares = self.spares.get(query)
+        while spares:
+            key, url, meta = spares.popleft()
+            if key not in self:
+                return key, url, meta
+        return None
@@ -0,0 +1,192 @@
+# Pinterest's JSON resource endpoints
+#
+# The web app loads its data from /resource/<Name>Resource/get/ endpoints
+# that return JSON, paged with opaque "bookmarks". One resource call returns
+# dozens of complete pin records, so feeds (boards, users) can be exported
+# without fetching a rendered page per pin.
+#
+#   GET /resource/BoardFeedResource/get/?source_url=/user/board/
+#       &data={"options": {"board_id": "123", "page_size": 100, "bookmarks": ["..."]}, "context": {}}
+
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from pinterest_scraper.items import PinterestBoardItem, PinterestPinItem, PinterestUserItem
+from pinterest_scraper.urls import canonical_url
+
+
+BASE_URL = "https://www.pinterest.com"
+
+# Bookmark returned with the last page of a feed
+END_BOOKMARK = '-end-'
+
+
+def resource_url(name, options, source_url='/'):
+    """URL of a GET call to a Pinterest resource endpoint"""
+    data = json.dumps({'options': options, 'context': {}}, separators=(',', ':'))
+    return f"{BASE_URL}/resource/{name}/get/?" + urlencode({'source_url': source_url, 'data': data})
+
+
+def resource_payload(response):
+    """Decoded JSON of a resource response, or None if it is not resource JSON"""
+    try:
+        payload = json.loads(response.text)
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(payload, dict) or 'resource_response' not in payload:
+        return None
+    return payload
+
+
+def resource_data(payload):
+    return (payload.get('resource_response') or {}).get('data')
+
+
+def next_bookmark(payload):
+    """Bookmark of the next page, or None on the last page"""
+    bookmark = (payload.get('resource_response') or {}).get('bookmark')
+    if bookmark is None:
+        bookmarks = ((payload.get('resource') or {}).get('options') or {}).get('bookmarks') or []
+        bookmark = bookmarks[0] if bookmarks else None
+    if not bookmark or bookmark == END_BOOKMARK:
+        return None
+    return bookmark
+
+
+def image_url(images, size='orig'):
+    """URL of one size of a resource 'images' dict, falling back to the largest"""
+    images = images or {}
+    image = images.get(size)
+    if image is None and images:
+        image = max(images.values(), key=lambda candidate: candidate.get('width') or 0)
+    return (image or {}).get('url', '')
+
+
+def pin_item(pin):
+    """PinterestPinItem from a pin record of a resource feed"""
+    images = pin.get('images') or {}
+    board = pin.get('board') or {}
+    pinner = pin.get('pinner') or {}
+    stats = (pin.get('aggregated_pin_data') or {}).get('aggregated_stats') or {}
+    orig = images.get('orig') or {}
+
+    item = PinterestPinItem()
+    item['pin_id'] = str(pin.get('id', ''))
+    item['pin_url'] = f"{BASE_URL}/pin/{item['pin_id']}/"
+    item['title'] = (pin.get('title') or pin.get('grid_title') or '').strip() or "No title available"
+    item['description'] = (pin.get('description') or '').strip()
+    item['alt_text'] = pin.get('alt_text') or pin.get('auto_alt_text') or ''
+
+    item['image_url'] = image_url(images)
+    item['image_width'] = orig.get('width')
+    item['image_height'] = orig.get('height')
+    item['image_signature'] = pin.get('image_signature', '')
+    if pin.get('videos') or pin.get('is_video'):
+        item['media_type'] = 'video'
+    elif pin.get('story_pin_data'):
+        item['media_type'] = 'story_pin'
+    else:
+        item['media_type'] = 'image'
+
+    item['board_id'] = str(board.get('id', ''))
+    item['board_name'] = board.get('name', '')
+    item['board_url'] = canonical_url(board['url']) if board.get('url') else ''
+
+    item['pinner_id'] = str(pinner.get('id', ''))
+    item['pinner_username'] = pinner.get('username', '')
+    item['pinner_name'] = pinner.get('full_name', '')
+    item['pinner_url'] = f"{BASE_URL}/{pinner['username']}/" if pinner.get('username') else ''
+    item['pinner_follower_count'] = pinner.get('follower_count')
+
+    item['pin_comments'] = pin.get('comment_count', 0)
+    item['pin_repins'] = pin.get('repin_count', 0)
+    item['pin_saves'] = stats.get('saves', 0)
+
+    item['created_at'] = pin.get('created_at', '')
+    item['is_promoted'] = bool(pin.get('is_promoted'))
+    item['is_video'] = item['media_type'] == 'video'
+    item['dominant_color'] = pin.get('dominant_color', '')
+    item['source_url'] = pin.get('link') or ''
+    item['source_domain'] = pin.get('domain') or ''
+
+    item['scraped_at'] = datetime.now().isoformat()
+    item['scraper_version'] = "1.0"
+    return item
+
+
+def board_record(board, board_url):
+    """Field dict of a PinterestBoardItem from a BoardResource record"""
+    owner = board.get('owner') or {}
+    cover = board.get('image_cover_hd_url') or board.get('image_cover_url')
+    return {
+        'board_id': str(board.get('id', '')),
+        'board_url': board_url,
+        'board_name': board.get('name', ''),
+        'board_slug': (board.get('url') or '').strip('/').split('/')[-1],
+        'description': board.get('description', ''),
+        'category': board.get('category') or '',
+        'is_collaborative': bool(board.get('is_collaborative')),
+        'privacy': board.get('privacy', ''),
+        'owner_id': str(owner.get('id', '')),
+        'owner_username': owner.get('username', ''),
+        'owner_name': owner.get('full_name', ''),
+        'owner_url': f"{BASE_URL}/{owner['username']}/" if owner.get('username') else '',
+        'pin_count': board.get('pin_count'),
+        'follower_count': board.get('follower_count'),
+        'collaborator_count': board.get('collaborator_count'),
+        'section_count': board.get('section_count'),
+        'created_at': board.get('created_at', ''),
+        'cover_images': [cover] if cover else [],
+        'recent_pins': [],
+    }
+
+
+def board_item(record):
+    item = PinterestBoardItem(**record)
+    item['scraped_at'] = datetime.now().isoformat()
+    return item
+
+
+def user_item(user):
+    """PinterestUserItem from a UserResource record"""
+    username = user.get('username', '')
+    partner = user.get('partner') or {}
+    cover = user.get('profile_cover') or {}
+
+    item = PinterestUserItem()
+    item['user_id'] = str(user.get('id', ''))
+    item['username'] = username
+    item['profile_url'] = f"{BASE_URL}/{username}/" if username else ''
+
+    item['full_name'] = user.get('full_name', '')
+    item['first_name'] = user.get('first_name', '')
+    item['last_name'] = user.get('last_name', '')
+    item['bio'] = (user.get('about') or '').strip()
+    item['location'] = user.get('location', '')
+
+    item['profile_image'] = user.get('image_medium_url') or user.get('image_small_url', '')
+    item['profile_image_large'] = user.get('image_xlarge_url') or user.get('image_large_url', '')
+    item['cover_image'] = image_url(cover.get('images'))
+
+    item['account_type'] = 'business' if user.get('is_partner') or partner else 'personal'
+    item['verified'] = bool(user.get('verified_identity') or user.get('is_verified_merchant'))
+    item['is_partner'] = bool(user.get('is_partner'))
+    item['website_url'] = user.get('website_url') or user.get('domain_url') or ''
+
+    item['follower_count'] = user.get('follower_count')
+    item['following_count'] = user.get('following_count')
+    item['pin_count'] = user.get('pin_count')
+    item['board_count'] = user.get('board_count')
+    item['likes_count'] = user.get('like_count')
+    item['monthly_views'] = user.get('profile_reach') or user.get('monthly_views')
+
+    item['business_name'] = partner.get('business_name') or partner.get('name', '')
+    item['business_type'] = partner.get('account_type', '')
+    item['business_location'] = partner.get('contact_address') or ''
+
+    item['created_at'] = user.get('created_at', '')
+    item['last_pin_save_time'] = user.get('last_pin_save_time', '')
+
+    item['scraped_at'] = datetime.now().isoformat()
+    return item
@@ -0,0 +1,190 @@
+# Single-pass extraction of search result pages
+#
+# The result containers of a search page are found with XPath compiled once
+# per process, and every field of a result (link, title, description,
+# thumbnail, creator) is read in one walk over the container's elements
+# instead of one css() query per selector. Page-wide counts use XPath
+# count(), which never serializes the matched elements.
+#
+# Each field keeps the fallback order of the original selector lists, and
+# every candidate is the first match in document order, as .css(...).get()
+# would return it.
+#
+# The spiders reach this module through their parser backend
+# (parsers.py): LxmlBackend walks lxml elements with scan_result(), and
+# SelectolaxBackend walks lexbor nodes with scan_lexbor_result(), which
+# visits the same candidates in the same order.
+
+from cssselect import HTMLTranslator
+from lxml import etree
+
+
+_translator = HTMLTranslator()
+
+
+def compile_css(css):
+    """Precompiled XPath of a CSS selector, evaluated from an element (descendant-or-self)"""
+    return etree.XPath(_translator.css_to_xpath(css))
+
+
+# Result containers per search type; the first selector with matches wins
+RESULT_SELECTORS = {
+    'pins': ['a[href*="/pin/"]', '[data-test-id="pin"]', '.pinWrapper', '.Pin'],
+    'boards': ['a[href*="/board/"]', '[data-test-id="board"]', '.boardWrapper', '.Board'],
+    'users': ['a[href^="/"][href$="/"]', '[data-test-id="user"]', '.userWrapper', '.User'],
+}
+RESULT_XPATHS = {
+    search_type: [(css, compile_css(css)) for css in selectors]
+    for search_type, selectors in RESULT_SELECTORS.items()
+}
+
+# Elements counted as visible results when the page states no total
+VISIBLE_RESULTS_CSS = '[data-test-id], .Pin, .Board, .User'
+VISIBLE_RESULTS_COUNT = etree.XPath(f"count({_translator.css_to_xpath(VISIBLE_RESULTS_CSS)})")
+
+IMAGE_IMG_SRC = etree.XPath(_translator.css_to_xpath('.image img') + '/@src')
+
+# Candidates whose value is the first direct text of an element, by tag / class
+TEXT_TAGS = ('h3', 'h4', 'p', 'span')
+TEXT_CLASSES = ('title', 'description', 'desc', 'creator', 'author', 'user-name', 'pinner')
+
+# Field -> candidate keys in fallback order
+TITLE_CANDIDATES = ('@alt', '@title', 'text()', 'img/@alt', 'h3', 'h4', '.title')
+DESCRIPTION_CANDIDATES = ('.description', '.desc', 'p', 'span')
+CREATOR_CANDIDATES = ('.creator', '.author', '.user-name', '.pinner')
+
+
+def result_containers(root, search_type):
+    """(selector, elements) of the first result selector matching anything"""
+    for css, xpath in RESULT_XPATHS.get(search_type, RESULT_XPATHS['users']):
+        elements = xpath(root)
+        if elements:
+            return css, elements
+    return None, []
+
+
+def lexbor_result_containers(tree, search_type):
+    """result_containers() of a selectolax lexbor tree"""
+    for css in RESULT_SELECTORS.get(search_type, RESULT_SELECTORS['users']):
+        nodes = tree.css(css)
+        if nodes:
+            return css, nodes
+    return None, []
+
+
+def visible_results_count(root):
+    return int(VISIBLE_RESULTS_COUNT(root))
+
+
+def visit_element(found, tag, attrib):
+    """Record the attribute candidates of an element; returns the text keys it owns"""
+    keys = []
+    if attrib:
+        for name in ('alt', 'title', 'data-src'):
+            if name in attrib and f'@{name}' not in found:
+                found[f'@{name}'] = attrib[name] or ''
+        if tag == 'a' and 'href' in attrib and 'a/@href' not in found:
+            found['a/@href'] = attrib['href'] or ''
+        elif tag == 'img':
+            if 'alt' in attrib and 'img/@alt' not in found:
+                found['img/@alt'] = attrib['alt'] or ''
+            if 'src' in attrib and 'img/@src' not in found:
+                found['img/@src'] = attrib['src'] or ''
+        classes = attrib.get('class')
+        if classes:
+            keys = [f'.{name}' for name in classes.split() if name in TEXT_CLASSES]
+    if tag in TEXT_TAGS:
+        keys.append(tag)
+    return keys
+
+
+def visit_text(found, keys, text):
+    """Record a text node directly inside an element owning keys"""
+    if 'text()' not in found:
+        found['text()'] = text
+    for key in keys:
+        if key not in found:
+            found[key] = text
+
+
+def scan_result(element):
+    """First match of every candidate selector within a result, in one walk
+
+    Text nodes are visited in document order together with the element they
+    belong to, so 'h3::text' is the first text node directly inside any h3,
+    as parsel would return it, and 'text()' the first text node of all.
+    """
+    found = {}
+
+    def walk(node):
+        keys = visit_element(found, node.tag, node.attrib)
+        if node.text is not None:
+            visit_text(found, keys, node.text)
+        for child in node:
+            if isinstance(child.tag, str):  # not a comment / processing instruction
+                walk(child)
+            if child.tail is not None:
+                visit_text(found, keys, child.tail)
+
+    walk(element)
+    return found
+
+
+def scan_lexbor_result(node):
+    """scan_result() over a selectolax lexbor node"""
+    found = {}
+
+    def walk(node):
+        keys = visit_element(found, node.tag, node.attributes)
+        for child in node.iter(include_text=True):
+            if child.tag == '-text':
+                visit_text(found, keys, child.text_content)
+            elif not child.tag.startswith('-'):  # not a comment
+                walk(child)
+
+    walk(node)
+    return found
+
+
+def first_valid(found, candidates, min_length):
+    """First candidate whose value is longer than min_length once stripped"""
+    for key in candidates:
+        value = found.get(key)
+        if value and value.strip() and len(value.strip()) > min_length:
+            return value.strip()
+    return None
+
+
+def result_fields(element):
+    """href, title, description, thumbnail and creator of one result element"""
+    return scanned_fields(scan_result(element), lambda: [str(source) for source in IMAGE_IMG_SRC(element)])
+
+
+def lexbor_result_fields(node):
+    """result_fields() of a selectolax lexbor node"""
+    return scanned_fields(
+        scan_lexbor_result(node),
+        lambda: [img.attributes.get('src') or '' for img in node.css('.image img') if 'src' in img.attributes]
+    )
+
+
+def scanned_fields(found, image_sources):
+    """Fields of a result from its scan; image_sources() lists the '.image img' sources"""
+    thumbnail = ''
+    for candidate in (found.get('img/@src'), found.get('@data-src')):
+        if candidate and ('pinimg' in candidate or 'pinterest' in candidate):
+            thumbnail = candidate
+            break
+    else:
+        sources = image_sources() if 'img/@src' in found else []
+        if sources and ('pinimg' in sources[0] or 'pinterest' in sources[0]):
+            thumbnail = sources[0]
+
+    creator = next((found[key].strip() for key in CREATOR_CANDIDATES if found.get(key, '').strip()), '')
+    return {
+        'href': found.get('a/@href'),
+        'title': first_valid(found, TITLE_CANDIDATES, 2),
+        'description': first_valid(found, DESCRIPTION_CANDIDATES, 5) or '',
+        'thumbnail': thumbnail,
+        'creator': creator,
+    }
@@ -13,6 +13,46 @@ SCRAPEOPS_API_KEY = 'Your API Key here'  # Get free API key from: https://scrape
 SCRAPEOPS_PROXY_ENABLED = True
 SCRAPEOPS_MONITOR_ENABLED = True
 
+# Proxy fetch tiers (see pinterest_scraper/fetch.py): pages are fetched on the
+# cheapest tier first and escalated to JS rendering / residential IPs only
+# when the spider could not extract the page's required fields.
+FETCH_ESCALATION_ENABLED = True
+# Maximum ScrapeOps credits to spend per run (0 = unlimited)
+FETCH_CREDIT_BUDGET = 0
+# Every Nth request of a page type re-tries one tier cheaper (0 = never)
+FETCH_PROBE_EVERY = 50
+
+# Render wait (ms) on the JS tiers is learned per page type: it starts at
+# RENDER_WAIT_INITIAL and backs off up to RENDER_WAIT_MAX when pages come back
+# without their required fields. False = fixed wait from the fetch tiers.
+RENDER_WAIT_ADAPTIVE = True
+RENDER_WAIT_INITIAL = 1000
+RENDER_WAIT_MAX = 10000
+# Optional CSS selector per page type the proxy waits for before returning
+#RENDER_WAIT_FOR_SELECTORS = {
+#    'pin': '[data-test-id="pin-closeup-image"]',
+#    'search': '[data-test-id="pin"]',
+#}
+
+# Bulk crawls (-a queries_file=...): start requests are generated lazily and
+# the next query is only read while fewer than this many requests wait in the
+# scheduler, keeping memory bounded (0 = no limit)
+START_REQUESTS_MAX_PENDING = 50
+
+# Serve queries fairly: one priority queue per (query, search/detail page)
+# group, interleaved by weighted fair queuing so a time-boxed run returns
+# data for every query instead of only the first few (see pqueues.py)
+SCHEDULER_PRIORITY_QUEUE = 'pinterest_scraper.pqueues.FairQueryPriorityQueue'
+# Relative share of downloads for search pages vs pin/board pages
+SCHEDULER_DISCOVERY_WEIGHT = 1.0
+SCHEDULER_DETAIL_WEIGHT = 1.0
+# Per-query weights (a queries file 'weight' column takes precedence)
+#QUERY_WEIGHTS = {'home decor': 3.0}
+
+# HTML parser backend used for field extraction: 'lxml' (parsel, default)
+# or 'selectolax' (faster on large rendered pages, pip install selectolax)
+PARSER_BACKEND = 'lxml'
+
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 CONCURRENT_REQUESTS = 1
 
@@ -38,9 +78,11 @@ DEFAULT_REQUEST_HEADERS = {
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
+SPIDER_MIDDLEWARES = {
 #    'pinterest_scraper.middlewares.PinterestScraperSpiderMiddleware': 543,
-#}
+    # Marks requests done in the crawl frontier once their callback ran (FRONTIER_DIR only)
+    'pinterest_scraper.frontier.FrontierSpiderMiddleware': 950,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
@@ -51,18 +93,134 @@ DEFAULT_REQUEST_HEADERS = {
 #     'scrapeops_scrapy_proxy_sdk.scrapeops_scrapy_proxy_sdk.ScrapeOpsScrapyProxySdk': 725,
 # }
 
+DOWNLOADER_MIDDLEWARES = {
+    # Acknowledges shared-queue requests (SCHEDULER = SharedScheduler only)
+    'pinterest_scraper.backends.SharedQueueAckMiddleware': 50,
+    'pinterest_scraper.middlewares.BudgetCancellationMiddleware': 530,
+    'pinterest_scraper.shard.ShardClaimMiddleware': 535,
+    'pinterest_scraper.middlewares.HedgedRequestMiddleware': 540,
+    'pinterest_scraper.middlewares.CircuitBreakerRetryMiddleware': 550,
+    'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
+}
+
+# Circuit breakers (per page type / host) and retry budget used by
+# CircuitBreakerRetryMiddleware. A breaker opens after
+# BREAKER_FAILURE_THRESHOLD consecutive failures and holds that endpoint's
+# requests for BREAKER_COOLDOWN seconds before letting a trial through.
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+# Requests held longer than this by an open breaker are dropped
+BREAKER_MAX_HOLD = 600
+# Retries allowed: RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * successful responses
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN = 10
+# Full-jitter exponential backoff between retries, in seconds
+RETRY_BACKOFF_BASE = 1
+RETRY_BACKOFF_MAX = 60
+
+# Drop queued requests and abort downloads that can no longer contribute
+# once max_pins / max_boards / max_results (or a query's budget) is met
+BUDGET_CANCELLATION_ENABLED = True
+
+# Hedged requests (opt-in): once a proxy fetch has taken longer than the
+# learned HEDGE_QUANTILE latency for its page type, send a duplicate and use
+# whichever response arrives first. Duplicates are capped at HEDGE_MAX_RATIO
+# of all requests. The duplicate needs a free slot: raise CONCURRENT_REQUESTS.
+HEDGED_REQUESTS_ENABLED = False
+HEDGE_QUANTILE = 0.95
+HEDGE_MAX_RATIO = 0.1
+
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    'scrapy.extensions.telnet.TelnetConsole': None,
-#}
+EXTENSIONS = {
+    'pinterest_scraper.frontier.CrawlFrontier': 500,
+    'pinterest_scraper.shard.ShardWorker': 510,
+}
+
+# Resumable crawls: set FRONTIER_DIR (or JOBDIR) to journal the crawl
+# frontier and progress counters to disk; re-running with the same directory
+# picks up where the previous run stopped. Use together with JOBDIR to keep
+# the scheduler queue on disk too.
+#FRONTIER_DIR = 'crawls/run1'
+# Rewrite the journal after this many appended records
+FRONTIER_COMPACT_EVERY = 10000
+# Save the progress counters at most this often, in seconds, as requests complete
+FRONTIER_SAVE_INTERVAL = 1
+
+# Boards and users named on pin pages are collected, merged by ID and emitted
+# as PinterestBoardItem / PinterestUserItem without fetching their pages
+# (see entities.py). Changed records are emitted every ENTITY_FLUSH_INTERVAL
+# seconds and when the crawl runs out of requests.
+ENTITY_CACHE_ENABLED = False
+ENTITY_FLUSH_INTERVAL = 300
+
+# Pins per BoardFeedResource call when boards are expanded
+# (scrapy crawl pinterest_boards -a expand_pins=true)
+BOARD_FEED_PAGE_SIZE = 100
+
+# Profile crawls (scrapy crawl pinterest_users): profiles fetched at once,
+# usernames checked against the state file per batch, and how old a profile
+# must be before a later run fetches it again (0 = refetch every profile).
+# USERS_STATE_FILE = None keeps no state between runs.
+USERS_CONCURRENCY = 8
+USERS_BATCH_SIZE = 200
+USERS_REFRESH_DAYS = 7
+USERS_STATE_FILE = 'data/pinterest_users_state.sqlite'
+
+# Related-pins graph expansion (scrapy crawl pinterest_pins -a expand_related=true):
+# frontier entries kept in memory before spilling to a temporary SQLite file,
+# and the edge list output ('{timestamp}' is filled in; a .parquet name
+# writes Parquet instead of binary records, pip install pyarrow)
+GRAPH_FRONTIER_MEMORY = 10000
+GRAPH_EDGES_FILE = 'data/pinterest_edges_{timestamp}.bin'
+
+# Query expansion (scrapy crawl pinterest_search -a expand_queries=true):
+# when the crawl runs out of requests, the QUERY_EXPANSION_BATCH suggestions
+# seen on the most search pages are searched next. Suggestions seen on fewer
+# than QUERY_EXPANSION_MIN_COUNT pages are never searched.
+QUERY_EXPANSION_BATCH = 5
+QUERY_EXPANSION_MIN_COUNT = 1
+
+# Shared request queue / dedupe for multi-host crawls (see backends.py).
+# QUEUE_BACKEND is 'memory' (in-process) or 'redis://host:port/db'; hosts
+# running the same spider against one server share its queue and schedule
+# each pin once. Delivery is at-least-once: a request taken by a host that
+# dies before finishing it goes back to the queue after
+# QUEUE_VISIBILITY_TIMEOUT seconds.
+#SCHEDULER = 'pinterest_scraper.backends.SharedScheduler'
+QUEUE_BACKEND = 'memory'
+# Start from an empty queue and seen set instead of joining a running crawl
+QUEUE_FLUSH_ON_START = False
+# Requests sent to the backend per pipelined batch
+QUEUE_BATCH_SIZE = 100
+QUEUE_VISIBILITY_TIMEOUT = 600
+
+# Combined crawl (pinterest_combined): pages kept in memory for consumers
+# asking for a page another consumer fetched a moment ago (0 = off)
+COMBINED_RESPONSE_CACHE_SIZE = 32
+
+# Sharded runs (python -m pinterest_scraper.shard) set SHARD_INDEX,
+# SHARD_COUNT, SHARD_COORDINATOR and SHARD_AUTHKEY for each worker process
+SHARD_COUNT = 1
+# Credits a worker reserves from the run's budget at a time
+SHARD_CREDIT_BATCH = 100
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
+   # Before the CSV pipeline, so growth_rate is filled in when items are written
+   'pinterest_scraper.pipelines.TrendStorePipeline': 290,
    'pinterest_scraper.pipelines.PinterestScrapyPipeline': 300,
 }
 
+# Trending snapshots are appended to a time-series store (see trends.py) and
+# compacted into columnar segment files every TREND_COMPACT_EVERY rows;
+# segments are merged once there are more than TREND_MAX_SEGMENTS.
+# TREND_STORE_DIR = None disables the store.
+TREND_STORE_DIR = 'data/trends'
+TREND_COMPACT_EVERY = 1000
+TREND_MAX_SEGMENTS = 8
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 AUTOTHROTTLE_ENABLED = True
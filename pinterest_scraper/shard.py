@@ -0,0 +1,380 @@
+# Multi-process sharded crawling
+#
+#   python -m pinterest_scraper.shard pinterest_pins --workers 8 \
+#       -a queries_file=keywords.txt -a max_pins=50 --output pins.jsonl
+#
+# Starts one Scrapy process per worker. Queries are split between workers by
+# hashing them (see shard_of), and a coordinator in the launcher process
+# shares state between workers over a local socket: the first worker to
+# claim a pin or board page fetches it, the others skip it, and the
+# ScrapeOps credit budget is accounted for across all workers. Each worker
+# writes its own JSON lines feed, merged into --output at the end.
+#
+# A claim is a lease: it becomes permanent once the claiming worker got the
+# page, is given back when its request fails or is dropped, and otherwise
+# expires after --claim-ttl seconds, so a page is never lost with a worker.
+# Workers make their claims from ShardClaimMiddleware, off the reactor thread,
+# and reserve credits SHARD_CREDIT_BATCH at a time (see SharedBudget), so up
+# to that many credits per worker may go unspent near the end of the budget.
+#
+# Work is split by query (or username): a run without a queries file has one
+# query, crawled by the first worker only, so use a queries file for
+# --workers above 1.
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from multiprocessing.connection import Client, Listener
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+
+from pinterest_scraper.fetch import page_type
+
+
+logger = logging.getLogger(__name__)
+
+# Page types fetched by at most one worker
+CLAIMED_PAGE_TYPES = ('pin', 'board')
+
+# Spider arguments whose entries are split between workers
+SHARDED_ARGS = ('queries_file=', 'usernames_file=')
+
+
+def shard_of(key, count):
+    """Stable shard index of a key (query, pin ID, ...)"""
+    return zlib.crc32(key.encode('utf-8')) % count
+
+
+class Coordinator:
+    """Shared dedupe and credit accounting for the workers of one run"""
+
+    def __init__(self, credit_budget=0, claim_ttl=300.0):
+        self.credit_budget = credit_budget
+        self.credits_spent = 0
+        self.claim_ttl = claim_ttl
+        self.claims = {}  # key -> (worker, lease expiry, None once fetched)
+        self.duplicates = 0
+        self.expired = 0
+        self.lock = threading.Lock()
+
+    def claim(self, key, worker=None):
+        """True for the first worker to claim a key, or once its lease has expired"""
+        with self.lock:
+            now = time.monotonic()
+            current = self.claims.get(key)
+            if current is not None:
+                holder, expires = current
+                if holder == worker:
+                    return True  # a retry or escalation of its own request
+                if expires is None or expires > now:
+                    self.duplicates += 1
+                    return False
+                self.expired += 1
+            self.claims[key] = (worker, now + self.claim_ttl)
+            return True
+
+    def release(self, key, worker=None):
+        """Give back a claim whose request failed, so another worker may fetch the page"""
+        with self.lock:
+            current = self.claims.get(key)
+            if current is not None and current[0] == worker and current[1] is not None:
+                del self.claims[key]
+        return True
+
+    def complete(self, key, worker=None):
+        """Make a claim permanent: the page was fetched"""
+        with self.lock:
+            current = self.claims.get(key)
+            if current is not None and current[0] == worker:
+                self.claims[key] = (worker, None)
+        return True
+
+    def reserve(self, credits):
+        """Grant a worker up to credits from the budget; 0 once it is used up"""
+        with self.lock:
+            if self.credit_budget:
+                credits = max(0, min(credits, self.credit_budget - self.credits_spent))
+            self.credits_spent += credits
+            return credits
+
+    def refund(self, credits):
+        """Take back credits a worker reserved but did not spend"""
+        with self.lock:
+            self.credits_spent -= min(credits, self.credits_spent)
+        return True
+
+    def serve(self, listener):
+        """Accept worker connections until the listener is closed"""
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, *args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if op in ('claim', 'release', 'complete', 'reserve', 'refund'):
+                    conn.send(getattr(self, op)(*args))
+                else:
+                    conn.send(None)
+
+
+class CoordinatorClient:
+    """Worker side of the coordinator connection (one call at a time, from any thread)"""
+
+    def __init__(self, address, authkey):
+        host, port = address.rsplit(':', 1)
+        self.conn = Client((host, int(port)), authkey=authkey.encode('utf-8'))
+        self.lock = threading.Lock()
+
+    def call(self, op, *args):
+        with self.lock:
+            self.conn.send((op, *args))
+            return self.conn.recv()
+
+    def close(self):
+        self.conn.close()
+
+
+class SharedBudget:
+    """Worker side of the run-wide credit budget (FetchStrategy.shared_budget)
+
+    Credits are reserved from the coordinator a batch at a time and spent
+    locally, so a request costs no round trip on the reactor thread. The
+    next batch is reserved in a thread once half the reservation is spent;
+    spend() only waits for the coordinator when the reservation runs out
+    before that refill arrives. Unspent credits are refunded at close.
+    """
+
+    def __init__(self, client, batch=100):
+        self.client = client
+        self.batch = batch
+        self.reserved = 0
+        self.refilling = False
+        self.exhausted = False
+
+    def spend(self, credits):
+        if self.reserved < credits and not self.exhausted:
+            wanted = max(self.batch, credits)
+            self.add(wanted, self.client.call('reserve', wanted))
+        if self.reserved < credits:
+            return False
+        self.reserved -= credits
+        if self.reserved < self.batch / 2 and not self.refilling and not self.exhausted:
+            self.refill()
+        return True
+
+    def refill(self):
+        from twisted.internet import threads
+        self.refilling = True
+        deferred = threads.deferToThread(self.client.call, 'reserve', self.batch)
+        deferred.addCallbacks(lambda granted: self.add(self.batch, granted), self.refill_failed)
+        deferred.addBoth(self.refilled)
+
+    def refilled(self, _):
+        self.refilling = False
+
+    def refill_failed(self, failure):
+        logger.warning(f"⚠️ Could not reserve credits from the coordinator: {failure.getErrorMessage()}")
+
+    def add(self, wanted, granted):
+        self.reserved += granted
+        if granted < wanted:
+            self.exhausted = True  # the run's budget is used up
+
+    def close(self):
+        if self.reserved:
+            self.client.call('refund', self.reserved)
+            self.reserved = 0
+
+
+class ShardWorker:
+    """Extension joining a sharded run (set up by the launcher via SHARD_* settings)"""
+
+    def __init__(self, crawler, client, index=0, credit_batch=100):
+        self.crawler = crawler
+        self.client = client
+        self.index = index
+        self.budget = SharedBudget(client, credit_batch)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if settings.getint('SHARD_COUNT', 1) <= 1 or not settings.get('SHARD_COORDINATOR'):
+            raise NotConfigured
+        client = CoordinatorClient(settings.get('SHARD_COORDINATOR'), settings.get('SHARD_AUTHKEY', ''))
+        worker = cls(
+            crawler, client,
+            index=settings.getint('SHARD_INDEX', 0),
+            credit_batch=settings.getint('SHARD_CREDIT_BATCH', 100),
+        )
+        crawler.signals.connect(worker.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(worker.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(worker.response_received, signal=signals.response_received)
+        crawler.signals.connect(worker.request_dropped, signal=signals.request_dropped)
+        return worker
+
+    def spider_opened(self, spider):
+        spider.shard_worker = self
+        strategy = getattr(spider, 'fetch_strategy', None)
+        if strategy is not None:
+            strategy.shared_budget = self.budget
+
+    def spider_closed(self, spider):
+        self.budget.close()
+        self.client.close()
+
+    def call(self, op, url):
+        """Deferred result of a coordinator call, made in a thread"""
+        from twisted.internet import threads
+        return threads.deferToThread(self.client.call, op, url, self.index)
+
+    @staticmethod
+    def claimed_url(request):
+        """Page URL of a request for a claimed page type, else None"""
+        url = request.meta.get('fetch_url')
+        if url is None or page_type(url) not in CLAIMED_PAGE_TYPES:
+            return None
+        return url
+
+    async def claim(self, url):
+        """True if this worker should fetch url (pin/board pages go to the first claimant)"""
+        if await maybe_deferred_to_future(self.call('claim', url)):
+            return True
+        self.crawler.stats.inc_value('shard/duplicates_skipped')
+        return False
+
+    def release(self, request):
+        """Give back the claim of a request that failed or was dropped"""
+        url = self.claimed_url(request)
+        if url is not None and not request.meta.get('claimed_elsewhere'):
+            self.call('release', url)
+            self.crawler.stats.inc_value('shard/claims_released')
+
+    def response_received(self, response, request, spider):
+        url = self.claimed_url(request)
+        if url is not None:
+            self.call('complete', url)
+
+    def request_dropped(self, request, spider):
+        self.release(request)
+
+
+class ShardClaimMiddleware:
+    """Downloader middleware skipping pin/board pages another worker has claimed"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if crawler.settings.getint('SHARD_COUNT', 1) <= 1 or not crawler.settings.get('SHARD_COORDINATOR'):
+            raise NotConfigured
+        return cls(crawler)
+
+    async def process_request(self, request, spider=None):
+        worker = getattr(self.crawler.spider, 'shard_worker', None)
+        url = ShardWorker.claimed_url(request)
+        if worker is None or url is None:
+            return None
+        if not await worker.claim(url):
+            request.meta['claimed_elsewhere'] = True
+            raise IgnoreRequest(f"Fetched by another worker: {url}")
+        return None
+
+
+def merge_outputs(paths, output):
+    """Concatenate the workers' JSON lines feeds into one file"""
+    written = 0
+    with open(output, 'w', encoding='utf-8') as out:
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        out.write(line)
+                        written += 1
+    return written
+
+
+def worker_command(args, index, address, authkey, feed):
+    command = [sys.executable, '-m', 'scrapy', 'crawl', args.spider, '-O', feed]
+    for arg in args.spider_args:
+        command += ['-a', arg]
+    for setting in args.settings:
+        command += ['-s', setting]
+    command += [
+        '-s', f'SHARD_INDEX={index}',
+        '-s', f'SHARD_COUNT={args.workers}',
+        '-s', f'SHARD_COORDINATOR={address}',
+        '-s', f'SHARD_AUTHKEY={authkey}',
+        # The run-wide budget is enforced by the coordinator
+        '-s', 'FETCH_CREDIT_BUDGET=0',
+    ]
+    return command
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a Pinterest spider across several worker processes')
+    parser.add_argument('spider', help='pinterest_pins, pinterest_boards or pinterest_search')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-a', dest='spider_args', action='append', default=[], metavar='NAME=VALUE')
+    parser.add_argument('-s', dest='settings', action='append', default=[], metavar='NAME=VALUE')
+    parser.add_argument('--credit-budget', type=int, default=0, help='ScrapeOps credits for the whole run (0 = unlimited)')
+    parser.add_argument('--claim-ttl', type=float, default=300,
+                        help='Seconds before a page claimed by a worker that never fetched it can be claimed again')
+    parser.add_argument('--workdir', default='shards', help='Directory for the per-worker feeds')
+    parser.add_argument('--output', default=None, help='Merged JSON lines output')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+
+    if args.workers > 1 and not any(arg.startswith(SHARDED_ARGS) for arg in args.spider_args):
+        logger.warning("⚠️ Workers split the queries file between them; without one, only the first worker crawls")
+
+    os.makedirs(args.workdir, exist_ok=True)
+    authkey = os.urandom(16).hex()
+    coordinator = Coordinator(credit_budget=args.credit_budget, claim_ttl=args.claim_ttl)
+    listener = Listener(('127.0.0.1', 0), authkey=authkey.encode('utf-8'))
+    address = '%s:%d' % listener.address
+    threading.Thread(target=coordinator.serve, args=(listener,), daemon=True).start()
+
+    feeds = [os.path.join(args.workdir, f'{args.spider}-{index}.jsonl') for index in range(args.workers)]
+    logger.info(f"🚀 Starting {args.workers} {args.spider} workers (coordinator on {address})")
+    workers = [
+        subprocess.Popen(worker_command(args, index, address, authkey, feed))
+        for index, feed in enumerate(feeds)
+    ]
+    exit_codes = [worker.wait() for worker in workers]
+    listener.close()
+
+    failed = sum(1 for code in exit_codes if code != 0)
+    if failed:
+        logger.warning(f"⚠️ {failed} worker(s) exited with an error")
+    logger.info(
+        f"📊 {len(coordinator.claims)} pages claimed, {coordinator.duplicates} cross-worker duplicates skipped, "
+        f"{coordinator.expired} expired claims taken over, "
+        f"{coordinator.credits_spent} credits spent"
+    )
+
+    output = args.output or os.path.join(args.workdir, f'{args.spider}.jsonl')
+    written = merge_outputs(feeds, output)
+    logger.info(f"✅ Merged {written} items into {output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, StopDownload
+from scrapy.spidermiddlewares.httperror import HttpError
+
+from pinterest_scraper.entities import EntityCache
+from pinterest_scraper.fetch import Deadline, FetchStrategy, page_type
+from pinterest_scraper.middlewares import Superseded
+from pinterest_scraper.parsers import load_parser_backend
+from pinterest_scraper.queries import iter_queries
+from pinterest_scraper.registry import RequestRegistry
+from pinterest_scraper.shard import shard_of
+from pinterest_scraper.utils import sleep
+
+
+class PinterestBaseSpider(scrapy.Spider):
+    """Shared plumbing for the Pinterest spiders (not a runnable spider)"""
+
+    # Counters saved to / restored from the crawl frontier journal
+    progress_attrs = ()
+    # (items produced counter, spider-wide item limit) attribute names
+    budget_attrs = None
+    # Page type of the item pages that search pages lead to, if any
+    detail_page_type = None
+
+    def __init__(self, queries_file=None, deadline=None, *args, **kwargs):
+        super(PinterestBaseSpider, self).__init__(*args, **kwargs)
+        self.queries_file = queries_file
+        self.deadline = Deadline.parse(deadline) if deadline else None
+        self.query_progress = {}  # search query -> requests made for it
+        self.pending_requests = 0  # scheduled but not yet handed to the downloader
+        self.registry = RequestRegistry()  # pin/board pages requested so far
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(PinterestBaseSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.parser = load_parser_backend(crawler.settings)
+        spider.fetch_strategy = FetchStrategy.from_crawler(crawler)
+        spider.fetch_strategy.deadline = spider.deadline
+        spider.entities = EntityCache.from_crawler(crawler)
+        if spider.entities is not None:
+            crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(spider.request_dequeued, signal=signals.request_reached_downloader)
+        crawler.signals.connect(spider.request_dequeued, signal=signals.request_dropped)
+        return spider
+
+    async def start(self):
+        """Feed start_requests() to the engine without flooding the scheduler
+
+        start_requests() is a lazy generator; with a queries file it reads the
+        file as the crawl goes. The next query is only pulled while fewer than
+        START_REQUESTS_MAX_PENDING requests are waiting in the scheduler.
+        """
+        max_pending = self.settings.getint('START_REQUESTS_MAX_PENDING', 0)
+        frontier = getattr(self, 'frontier', None)
+        if frontier is not None:
+            # Resumed crawl: re-issue what was left unfinished first
+            for request in frontier.pending_requests(self):
+                yield request
+
+        shard_index, shard_count = self.shard()
+        if shard_count > 1 and not self.sharded_input() and shard_index != 0:
+            return  # a single query is crawled by the first worker only
+
+        for request in self.start_requests():
+            if self.request_unfinishable(request):
+                self.logger.info("⏰ Deadline approaching, no new queries will be started")
+                return
+            if frontier is not None and frontier.is_known(request):
+                continue
+            while max_pending and self.pending_requests >= max_pending:
+                await sleep(0.5)
+            yield request
+
+    def request_scheduled(self, request, spider):
+        if spider is self and not request.meta.get('hedge_copy'):
+            self.pending_requests += 1
+
+    def request_dequeued(self, request, spider):
+        if spider is self and not request.meta.get('hedge_copy'):
+            self.pending_requests = max(0, self.pending_requests - 1)
+
+    def spider_idle(self, spider):
+        """Emit the board/user records still waiting in the entity cache before closing"""
+        if spider is not self or not self.entities.changed:
+            return
+        self.crawler.engine.crawl(scrapy.Request(
+            'data:,',
+            callback=self.flush_entities,
+            dont_filter=True,
+            meta={'allow_offsite': True}
+        ))
+        raise DontCloseSpider
+
+    def flush_entities(self, response):
+        yield from self.entities.flush()
+
+    def entity_sightings(self, item):
+        """Feed a pin item to the entity cache; yields its records when a flush is due"""
+        if self.entities is None:
+            return
+        self.entities.add_pin(item)
+        if self.entities.due():
+            yield from self.entities.flush()
+
+    def frontier_state(self):
+        """Progress saved by the crawl frontier (see pinterest_scraper/frontier.py)"""
+        state = {attr: getattr(self, attr) for attr in self.progress_attrs}
+        state['query_progress'] = self.query_progress
+        return state
+
+    def restore_frontier_state(self, state):
+        for attr in self.progress_attrs:
+            if attr in state:
+                setattr(self, attr, state[attr])
+        self.query_progress.update(state.get('query_progress', {}))
+        self.logger.info(f"♻️ Restored progress: {state}")
+
+    def shard(self):
+        """(index, count) of this process in a sharded run, see shard.py"""
+        return self.settings.getint('SHARD_INDEX', 0), self.settings.getint('SHARD_COUNT', 1)
+
+    def sharded_input(self):
+        """True if start_requests() only reads this shard's share of the input"""
+        return bool(self.queries_file)
+
+    def query_entries(self):
+        """Lazily yield the query entries of queries_file (this shard's share of them)"""
+        self.logger.info(f"📄 Reading search queries from: {self.queries_file}")
+        shard_index, shard_count = self.shard()
+        for entry in iter_queries(self.queries_file):
+            if shard_count <= 1 or shard_of(entry['query'], shard_count) == shard_index:
+                yield entry
+
+    def query_meta(self, entry, default_budget):
+        """Request meta for a queries file entry, with its per-query item budget"""
+        meta = {
+            'search_query': entry['query'],
+            'query_budget': entry['max_items'] or default_budget,
+        }
+        if entry.get('weight'):
+            meta['query_weight'] = float(entry['weight'])  # see pqueues.py
+        return meta
+
+    def within_budget(self, meta, scraped, max_items):
+        """Check the per-query budget if the query has one, else the spider-wide one
+
+        Entity requests still in flight count against the budget, so it is
+        met exactly once they complete.
+        """
+        budget = meta.get('query_budget')
+        if budget is None:
+            return scraped + self.registry.in_flight_count() < max_items
+        query = meta.get('search_query')
+        return self.query_progress.get(query, 0) + self.registry.in_flight_count(query) < budget
+
+    def has_budget(self, meta):
+        scraped_attr, max_attr = self.budget_attrs
+        return self.within_budget(meta, getattr(self, scraped_attr), getattr(self, max_attr))
+
+    def request_redundant(self, request):
+        """True if a request can no longer add items to a budget that is not yet met
+
+        Used by BudgetCancellationMiddleware. Requests without a search query,
+        or marked budget_exempt (e.g. trending), always go through.
+        """
+        meta = request.meta
+        if self.budget_attrs is None or 'search_query' not in meta or meta.get('budget_exempt'):
+            return False
+        budget = meta.get('query_budget')
+        if budget is not None:
+            return self.query_progress.get(meta['search_query'], 0) >= budget
+        if self.queries_file:
+            return False
+        scraped_attr, max_attr = self.budget_attrs
+        return getattr(self, scraped_attr) >= getattr(self, max_attr)
+
+    def request_unfinishable(self, request):
+        """True if a request cannot produce an item before the deadline
+
+        Uses the live latency estimates of the fetch strategy: a search page
+        needs its own fetch plus at least one detail page fetch after it.
+        """
+        if self.deadline is None or 'fetch_url' not in request.meta:
+            return False
+        kind = page_type(request.meta['fetch_url'])
+        needed = self.fetch_strategy.expected_latency(kind, request.meta.get('fetch_tier'))
+        if kind != self.detail_page_type and self.detail_page_type is not None:
+            needed += self.fetch_strategy.expected_latency(self.detail_page_type)
+        return not self.deadline.allows(needed)
+
+    def count_for_query(self, meta):
+        query = meta.get('search_query')
+        self.query_progress[query] = self.query_progress.get(query, 0) + 1
+
+    def follow_entities(self, response, links, key_func, callback, meta_func):
+        """Yield detail requests for the pins/boards found on a search page
+
+        Each entity is requested once across all queries; links beyond the
+        budget are kept as spares in case an in-flight request fails.
+        """
+        query = response.meta.get('search_query')
+        budget_meta = {
+            key: response.meta[key]
+            for key in ('search_query', 'query_budget', 'query_weight')
+            if key in response.meta
+        }
+        for url in links:
+            key = key_func(url)
+            if key in self.registry:
+                self.crawler.stats.inc_value('registry/duplicates_skipped')
+                continue
+            meta = dict(meta_func(url), **budget_meta)
+            if not self.has_budget(response.meta):
+                self.registry.keep_spare(query, key, url, meta)
+                continue
+            if self.deadline and not self.deadline.allows(self.fetch_strategy.expected_latency(page_type(url))):
+                self.crawler.stats.inc_value('deadline/details_skipped')
+                continue
+            yield from self.request_entity(key, url, callback, meta)
+
+    def request_entity(self, key, url, callback, meta):
+        if not self.registry.admit(key, meta.get('search_query')):
+            return
+        url = self.entity_fetch_url(url)
+        requests = list(self.fetch(url, callback, meta=dict(meta, entity_key=key), errback=self.entity_failed))
+        if not requests:
+            self.registry.release(key)
+        yield from requests
+
+    def entity_fetch_url(self, url):
+        """URL fetched for an entity link; spiders may use a JSON endpoint instead"""
+        return url
+
+    def entity_completed(self, meta):
+        """Count an item produced from an entity page against the budgets"""
+        self.registry.complete(meta.get('entity_key'))
+        scraped_attr = self.budget_attrs[0]
+        setattr(self, scraped_attr, getattr(self, scraped_attr) + 1)
+        self.count_for_query(meta)
+
+    def entity_failed(self, failure):
+        """Release a failed entity request and replace it with a spare link"""
+        meta = failure.request.meta
+        key = meta.get('entity_key')
+        if key is None:
+            return
+        if self.superseded(failure):
+            return
+        self.registry.release(key)
+        shard_worker = getattr(self, 'shard_worker', None)
+        if shard_worker is not None:
+            shard_worker.release(failure.request)
+        if self.cancelled(failure):
+            return
+        self.crawler.stats.inc_value('registry/failed')
+        self.logger.warning(f"❌ Request failed, freeing its budget slot: {meta.get('fetch_url')}")
+
+        query = meta.get('search_query')
+        while self.has_budget(meta):
+            spare = self.registry.next_spare(query)
+            if spare is None:
+                return
+            spare_key, url, spare_meta = spare
+            yield from self.request_entity(spare_key, url, failure.request.callback, spare_meta)
+
+    def fetch(self, url, callback, meta=None, **kwargs):
+        """Yield a proxy request for a Pinterest URL on the cheapest known tier"""
+        kwargs.setdefault('errback', self.request_failed)
+        request = self.fetch_strategy.request(url, callback, meta, **kwargs)
+        if request is None:
+            self.logger.warning(f"💳 Credit budget exhausted, skipping: {url}")
+            return
+        frontier = getattr(self, 'frontier', None)
+        if frontier is not None and frontier.is_done(request):
+            # Completed by an earlier run of a resumed crawl
+            self.crawler.stats.inc_value('frontier/skipped_completed')
+            return
+        yield request
+
+    def superseded(self, failure):
+        """True if another request carries on for the failed one (hedge duplicate, held request)"""
+        return bool(failure.check(Superseded))
+
+    def cancelled(self, failure):
+        """True for requests dropped on purpose or aborted because the budget is met"""
+        if failure.check(HttpError):
+            return False  # an IgnoreRequest subclass, but a real failure
+        if failure.check(IgnoreRequest):
+            return True
+        return bool(failure.check(StopDownload)) and self.request_redundant(failure.request)
+
+    def request_failed(self, failure):
+        """Default errback of proxy fetches"""
+        if self.cancelled(failure):
+            return
+        url = failure.request.meta.get('fetch_url', failure.request.url)
+        if failure.check(HttpError):
+            self.logger.info(f"Ignoring response {failure.value.response.status}: {url}")
+            return
+        self.logger.error(f"❌ Error downloading {url}: {failure.getErrorMessage()}")
+
+    def fetch_failed(self, response):
+        """Yield a retry of the page on a more expensive tier, if one is left
+
+        Callbacks call this when their required fields came back empty; it
+        yields nothing when the page cannot be escalated any further.
+        """
+        request = self.fetch_strategy.escalate(response)
+        if request is not None:
+            self.logger.info(f"⬆️ Escalating fetch tier for: {response.meta.get('fetch_url')}")
+            yield request
@@ -1,12 +1,15 @@
-import scrapy
-import json
 import re
-from datetime import datetime
-from urllib.parse import urljoin, quote_plus
+from urllib.parse import quote_plus
+from pinterest_scraper.spiders.base import PinterestBaseSpider
 from pinterest_scraper.items import PinterestBoardItem
+from pinterest_scraper.resources import (
+    board_item, board_record, next_bookmark, pin_item, resource_data, resource_payload, resource_url
+)
+from pinterest_scraper.urls import board_path, board_url, canonical_url, url_key
+from pinterest_scraper.utils import QUOTED_PATH_RE, extract_board_id, extract_hashtags, parse_number
 
 
-class PinterestBoardsSpider(scrapy.Spider):
+class PinterestBoardsSpider(PinterestBaseSpider):
     name = "pinterest_boards"
     allowed_domains = ["pinterest.com", "proxy.scrapeops.io"]
     
@@ -16,31 +19,46 @@ class PinterestBoardsSpider(scrapy.Spider):
         'RANDOMIZE_DOWNLOAD_DELAY': 0.5,
     }
 
-    def __init__(self, search_query=None, max_boards=20, category=None, *args, **kwargs):
+    progress_attrs = ('boards_scraped',)
+    budget_attrs = ('boards_scraped', 'max_boards')
+    detail_page_type = 'board'
+
+    # Meta carried from one board feed page to the next
+    feed_meta_keys = ('search_query', 'query_budget', 'query_weight', 'entity_key', 'board_url', 'board_record', 'board_pins')
+
+    def __init__(self, search_query=None, max_boards=20, category=None, expand_pins=False, max_board_pins=0, *args, **kwargs):
         super(PinterestBoardsSpider, self).__init__(*args, **kwargs)
         self.search_query = search_query or "home decor"
         self.max_boards = int(max_boards)
         self.category = category
+        # Expand mode: stream every pin of each board from its JSON feed
+        self.expand_pins = str(expand_pins).lower() in ('1', 'true', 'yes')
+        self.max_board_pins = int(max_board_pins)  # 0 = the whole board
         self.base_url = "https://www.pinterest.com"
         self.boards_scraped = 0
 
     def start_requests(self):
         """Generate initial requests for Pinterest boards"""
         
-        # Get ScrapeOps API key from settings
-        api_key = self.settings.get('SCRAPEOPS_API_KEY')
+        # Bulk mode: one search per queries file entry, read lazily
+        if self.queries_file:
+            for entry in self.query_entries():
+                search_url = f"{self.base_url}/search/boards/?q={quote_plus(entry['query'])}"
+                yield from self.fetch(
+                    search_url,
+                    self.parse_search_results,
+                    meta=self.query_meta(entry, self.max_boards)
+                )
+            return
         
         # If specific search query provided
         if self.search_query:
             search_url = f"{self.base_url}/search/boards/?q={quote_plus(self.search_query)}"
             self.logger.info(f"🔍 Searching Pinterest boards for: {self.search_query}")
             
-            # Use ScrapeOps proxy with JavaScript rendering
-            proxy_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(search_url)}&render_js=true&wait=3000&residential=false&country=US"
-            
-            yield scrapy.Request(
-                url=proxy_url,
-                callback=self.parse_search_results,
+            yield from self.fetch(
+                search_url,
+                self.parse_search_results,
                 meta={'search_query': self.search_query}
             )
         
@@ -48,12 +66,9 @@ class PinterestBoardsSpider(scrapy.Spider):
         elif self.category:
             category_url = f"{self.base_url}/search/boards/?q={quote_plus(self.category)}"
             
-            # Use ScrapeOps proxy with JavaScript rendering
-            proxy_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(category_url)}&render_js=true&wait=3000&residential=false&country=US"
-            
-            yield scrapy.Request(
-                url=proxy_url,
-                callback=self.parse_search_results,
+            yield from self.fetch(
+                category_url,
+                self.parse_search_results,
                 meta={'search_query': self.category}
             )
         
@@ -67,12 +82,9 @@ class PinterestBoardsSpider(scrapy.Spider):
             for category in popular_categories[:3]:  # Limit to first 3 categories
                 search_url = f"{self.base_url}/search/boards/?q={quote_plus(category)}"
                 
-                # Use ScrapeOps proxy with JavaScript rendering
-                proxy_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(search_url)}&render_js=true&wait=3000&residential=false&country=US"
-                
-                yield scrapy.Request(
-                    url=proxy_url,
-                    callback=self.parse_search_results,
+                yield from self.fetch(
+                    search_url,
+                    self.parse_search_results,
                     meta={'search_query': category}
                 )
 
@@ -82,9 +94,6 @@ class PinterestBoardsSpider(scrapy.Spider):
         search_query = response.meta.get('search_query')
         self.logger.info(f"📍 Parsing board search results for: {search_query}")
         
-        # Get ScrapeOps API key from settings
-        api_key = self.settings.get('SCRAPEOPS_API_KEY')
-        
         # Look for board links using Pinterest's actual format: /username/board-name/
         board_selectors = [
             '[data-test-id="board-card"] a::attr(href)',
@@ -95,40 +104,26 @@ class PinterestBoardsSpider(scrapy.Spider):
         
         board_links = []
         for selector in board_selectors:
-            found_links = response.css(selector).getall()
+            found_links = self.parser.getall(response, selector)
             if found_links:
                 self.logger.info(f"Found {len(found_links)} board links using selector: {selector}")
                 for link in found_links:
                     if link and len(link) > 5:
-                        # Clean up the link
-                        link = link.strip()
-                        if not link.startswith('http'):
-                            full_url = urljoin(self.base_url, link)
-                        else:
-                            full_url = link
+                        full_url = canonical_url(link)
                         
                         # Validate it's a proper board URL (Pinterest format: /username/board-name/)
-                        if (full_url not in board_links and 
-                            'pinterest.com' in full_url and 
-                            not full_url.endswith('.mjs') and
+                        if ('pinterest.com' in full_url and 
+                            not '.mjs' in full_url and
                             not 'create' in full_url and
                             not 'edit' in full_url and
                             not '/search/' in full_url and
                             not '/pin/' in full_url and
-                            not '/user/' in full_url and
-                            full_url.count('/') >= 4):  # Should have at least username/boardname/
+                            not '/user/' in full_url):
                             
-                            # Convert to board URL format if needed
-                            if '/board/' not in full_url:
-                                # Extract username and board name from /username/board-name/
-                                path_parts = full_url.split('/')
-                                if len(path_parts) >= 4:
-                                    username = path_parts[-3]  # Second to last part
-                                    board_name = path_parts[-2]  # Last part
-                                    board_url = f"https://www.pinterest.com/board/{username}/{board_name}/"
-                                    board_links.append(board_url)
-                            else:
-                                board_links.append(full_url)
+                            # Convert to board URL format: /board/username/board-name/
+                            board = board_url(full_url)
+                            if board and board not in board_links:
+                                board_links.append(board)
                 break  # Use first successful selector
         
         # If no board links found, try alternative approach
@@ -139,37 +134,41 @@ class PinterestBoardsSpider(scrapy.Spider):
         if not board_links:
             board_links = self.extract_boards_from_text(response)
         
+        # Nothing extracted on this proxy tier: retry on a more expensive one
+        if not board_links:
+            yield from self.fetch_failed(response)
+            return
+        self.fetch_strategy.succeeded(response)
+        
         self.logger.info(f"✅ Found {len(board_links)} unique board URLs")
         
-        # Follow board links
-        for board_url in board_links[:self.max_boards]:
-            if self.boards_scraped >= self.max_boards:
-                break
-            
-            # Use ScrapeOps proxy with JavaScript rendering for board pages
-            proxy_board_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(board_url)}&render_js=true&wait=3000&residential=false&country=US"
-                
-            yield scrapy.Request(
-                url=proxy_board_url,
-                callback=self.parse_board,
-                meta={
-                    'search_query': search_query,
-                    'board_url': board_url
-                }
-            )
-            self.boards_scraped += 1
+        # Follow board links (each board once across all queries)
+        yield from self.follow_entities(
+            response,
+            board_links,
+            self.board_key,
+            self.parse_board_resource if self.expand_pins else self.parse_board,
+            lambda board_url: {
+                'search_query': search_query,
+                'board_url': board_url
+            }
+        )
+
+    def board_key(self, board_url):
+        """Registry key of a board: its /username/board-name path"""
+        return url_key(board_url)
 
     def extract_boards_from_scripts(self, response):
         """Extract board URLs from JavaScript/JSON data"""
         board_links = []
         
         # Look for JSON data in script tags
-        scripts = response.css('script::text').getall()
+        scripts = self.parser.getall(response, 'script::text')
         
         for script in scripts:
             if 'board' in script.lower():
                 # Look for board URLs in JavaScript - Pinterest format: /username/board-name/
-                board_matches = re.findall(r'["\'](/[^"\']+/[^"\']+/)["\']', script)
+                board_matches = QUOTED_PATH_RE.findall(script)
                 
                 for match in board_matches:
                     # Clean up the match and create proper URL
@@ -185,14 +184,9 @@ class PinterestBoardsSpider(scrapy.Spider):
                         board_path.count('/') >= 3):  # Should have at least /username/boardname/
                         
                         # Convert to board URL format
-                        path_parts = board_path.split('/')
-                        if len(path_parts) >= 3:
-                            username = path_parts[1]  # First part after /
-                            board_name = path_parts[2]  # Second part after /
-                            if username and board_name:
-                                board_url = f"https://www.pinterest.com/board/{username}/{board_name}/"
-                                if board_url not in board_links:
-                                    board_links.append(board_url)
+                        board = board_url(board_path)
+                        if board and board not in board_links:
+                            board_links.append(board)
                 
                 if board_links:
                     self.logger.info(f"Found {len(board_links)} boards in page scripts")
@@ -219,7 +213,7 @@ class PinterestBoardsSpider(scrapy.Spider):
             matches = re.findall(pattern, page_text)
             for match in matches:
                 # Clean up the match and create proper URL
-                full_url = urljoin(self.base_url, match)
+                full_url = canonical_url(match)
                 if full_url not in board_links and 'pinterest.com' in full_url:
                     board_links.append(full_url)
         
@@ -237,23 +231,118 @@ class PinterestBoardsSpider(scrapy.Spider):
         
         # Only extract the essential information
         item['board_url'] = board_url
-        item['board_id'] = self.extract_board_id(board_url)
+        item['board_id'] = extract_board_id(board_url)
         
+        self.entity_completed(response.meta)
         yield item
 
-    def extract_board_id(self, board_url):
-        """Extract board ID from URL"""
-        try:
-            # Extract username from board URL
-            if '/board/' in board_url:
-                parts = board_url.split('/board/')
-                if len(parts) > 1:
-                    board_path = parts[1].rstrip('/')
-                    username = board_path.split('/')[0]
-                    return f"{username}/"
-            return ""
-        except:
-            return ""
+    def entity_fetch_url(self, board_url):
+        """Expand mode fetches the board's JSON record instead of its rendered page"""
+        path = board_path(board_url) if self.expand_pins else None
+        if path is None:
+            return board_url
+        username, slug = path.split('/')
+        options = {'username': username, 'slug': slug, 'field_set_key': 'detailed'}
+        return resource_url('BoardResource', options, f'/{path}/')
+
+    def parse_board_resource(self, response):
+        """Board record from BoardResource, then its pin feed"""
+        payload = resource_payload(response)
+        board = resource_data(payload) if payload else None
+        if not isinstance(board, dict) or not board.get('id'):
+            escalation = list(self.fetch_failed(response))
+            if escalation:
+                yield from escalation
+            else:
+                self.registry.release(response.meta.get('entity_key'))
+                self.logger.warning(f"❌ No board record for: {response.meta.get('board_url')}")
+            return
+        self.fetch_strategy.succeeded(response)
+
+        board_url = response.meta.get('board_url')
+        self.logger.info(f"📋 Expanding board: {board_url} ({board.get('pin_count') or '?'} pins)")
+        meta = dict(response.meta, board_record=board_record(board, board_url), board_pins=0)
+        yield from self.follow_board_feed(meta)
+
+    def follow_board_feed(self, meta, bookmark=None):
+        """Request the next page of a board's feed, or finish the board when it cannot be fetched"""
+        requests = list(self.board_feed_request(meta, bookmark))
+        if requests:
+            yield from requests
+        else:
+            yield from self.finish_board(meta)
+
+    def board_feed_request(self, meta, bookmark=None):
+        """Request one page of a board's pin feed"""
+        meta = {key: meta[key] for key in self.feed_meta_keys if key in meta}
+        path = board_path(meta['board_url'])
+        options = {
+            'board_id': meta['board_record']['board_id'],
+            'board_url': f'/{path}/',
+            'page_size': self.settings.getint('BOARD_FEED_PAGE_SIZE', 100),
+        }
+        if bookmark:
+            options['bookmarks'] = [bookmark]
+        yield from self.fetch(
+            resource_url('BoardFeedResource', options, f'/{path}/'),
+            self.parse_board_feed,
+            meta=meta,
+            errback=self.board_feed_failed
+        )
+
+    def parse_board_feed(self, response):
+        """Stream the pins of one board feed page and follow its bookmark"""
+        payload = resource_payload(response)
+        pins = resource_data(payload) if payload else None
+        if not isinstance(pins, list):
+            escalation = list(self.fetch_failed(response))
+            if escalation:
+                yield from escalation
+                return
+            self.logger.warning(f"❌ Unreadable board feed, keeping the pins so far: {response.meta.get('board_url')}")
+            yield from self.finish_board(response.meta)
+            return
+        self.fetch_strategy.succeeded(response)
+
+        meta = response.meta
+        record = meta['board_record']
+        for pin in pins:
+            if not isinstance(pin, dict) or pin.get('type', 'pin') != 'pin':
+                continue  # feeds also carry stories and ads
+            if self.max_board_pins and meta['board_pins'] >= self.max_board_pins:
+                break
+            item = pin_item(pin)
+            meta['board_pins'] += 1
+            if len(record['recent_pins']) < 10:
+                record['recent_pins'].append(item['pin_url'])
+            if len(record['cover_images']) < 5 and item['image_url'] and item['image_url'] not in record['cover_images']:
+                record['cover_images'].append(item['image_url'])
+            yield item
+
+        bookmark = next_bookmark(payload)
+        if bookmark and pins and not (self.max_board_pins and meta['board_pins'] >= self.max_board_pins):
+            yield from self.follow_board_feed(meta, bookmark)
+        else:
+            yield from self.finish_board(meta)
+
+    def board_feed_failed(self, failure):
+        """Emit the board with the pins streamed before its feed failed"""
+        meta = failure.request.meta
+        if self.superseded(failure):
+            return
+        if self.cancelled(failure):
+            self.registry.release(meta.get('entity_key'))
+            return
+        self.request_failed(failure)
+        yield from self.finish_board(meta)
+
+    def finish_board(self, meta):
+        record = dict(meta['board_record'])
+        if record.get('pin_count') is None:
+            record['pin_count'] = meta['board_pins']
+        self.logger.info(f"✅ Streamed {meta['board_pins']} pins from board: {meta['board_url']}")
+        self.entity_completed(meta)
+        yield board_item(record)
 
     def extract_board_name(self, response):
         """Extract board name with multiple selectors"""
@@ -267,7 +356,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            name = response.css(selector).get()
+            name = self.parser.get(response, selector)
             if name and name.strip() and not 'Pinterest' in name:
                 return name.strip()
         
@@ -284,7 +373,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            description = response.css(selector).get()
+            description = self.parser.get(response, selector)
             if description and description.strip() and len(description.strip()) > 10:
                 return description.strip()
         
@@ -300,7 +389,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            username = response.css(selector).get()
+            username = self.parser.get(response, selector)
             if username and username.strip():
                 return username.strip()
         
@@ -315,7 +404,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            name = response.css(selector).get()
+            name = self.parser.get(response, selector)
             if name and name.strip():
                 return name.strip()
         
@@ -329,9 +418,9 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            owner_url = response.css(selector).get()
+            owner_url = self.parser.get(response, selector)
             if owner_url:
-                return urljoin(self.base_url, owner_url)
+                return canonical_url(owner_url)
         
         return ""
 
@@ -344,9 +433,9 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            count_text = response.css(selector).get()
+            count_text = self.parser.get(response, selector)
             if count_text:
-                return self.parse_number(count_text)
+                return parse_number(count_text)
         
         return 0
 
@@ -359,9 +448,9 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            count_text = response.css(selector).get()
+            count_text = self.parser.get(response, selector)
             if count_text:
-                return self.parse_number(count_text)
+                return parse_number(count_text)
         
         return 0
 
@@ -374,9 +463,9 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            count_text = response.css(selector).get()
+            count_text = self.parser.get(response, selector)
             if count_text:
-                return self.parse_number(count_text)
+                return parse_number(count_text)
         
         return 0
 
@@ -389,7 +478,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for indicator in secret_indicators:
-            if response.css(indicator).get():
+            if self.parser.exists(response, indicator):
                 return "secret"
         
         return "public"
@@ -403,7 +492,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for indicator in collaborative_indicators:
-            if response.css(indicator).get():
+            if self.parser.exists(response, indicator):
                 return True
         
         return False
@@ -417,7 +506,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            category = response.css(selector).get()
+            category = self.parser.get(response, selector)
             if category and category.strip():
                 return category.strip()
         
@@ -430,7 +519,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         # Look for hashtags in description
         description = self.extract_board_description(response)
         if description:
-            hashtags = re.findall(r'#(\w+)', description)
+            hashtags = extract_hashtags(description)
             tags.extend(hashtags)
         
         # Look for dedicated tag elements
@@ -441,7 +530,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in tag_selectors:
-            found_tags = response.css(selector).getall()
+            found_tags = self.parser.getall(response, selector)
             tags.extend([tag.strip('#') for tag in found_tags if tag])
         
         return list(set(tags[:10]))  # Remove duplicates, limit to 10
@@ -457,7 +546,7 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in topic_selectors:
-            found_topics = response.css(selector).getall()
+            found_topics = self.parser.getall(response, selector)
             topics.extend([topic.strip() for topic in found_topics if topic])
         
         return list(set(topics[:5]))  # Remove duplicates, limit to 5
@@ -472,45 +561,11 @@ class PinterestBoardsSpider(scrapy.Spider):
         ]
         
         for selector in pin_selectors:
-            found_pins = response.css(selector).getall()
+            found_pins = self.parser.getall(response, selector)
             for pin_url in found_pins[:5]:  # Limit to 5 sample pins
                 if pin_url and '/pin/' in pin_url:
-                    full_url = urljoin(self.base_url, pin_url)
+                    full_url = canonical_url(pin_url)
                     sample_pins.append(full_url)
             break  # Use first successful selector
         
         return sample_pins
-
-    def parse_number(self, text):
-        """Parse number from text with K, M, B suffixes"""
-        if not text:
-            return 0
-        
-        text = str(text).strip().replace(',', '')
-        
-        # Handle K, M, B suffixes
-        if text.lower().endswith('k'):
-            try:
-                return int(float(text[:-1]) * 1000)
-            except ValueError:
-                return 0
-        elif text.lower().endswith('m'):
-            try:
-                return int(float(text[:-1]) * 1000000)
-            except ValueError:
-                return 0
-        elif text.lower().endswith('b'):
-            try:
-                return int(float(text[:-1]) * 1000000000)
-            except ValueError:
-                return 0
-        else:
-            # Extract just numbers
-            numbers = re.findall(r'\d+', text)
-            if numbers:
-                try:
-                    return int(numbers[0])
-                except ValueError:
-                    return 0
-        
-        return 0 
\ No newline at end of file
@@ -0,0 +1,248 @@
+from collections import OrderedDict
+
+from scrapy import signals
+from pinterest_scraper.spiders.base import PinterestBaseSpider
+from pinterest_scraper.spiders.pinterest_boards import PinterestBoardsSpider
+from pinterest_scraper.spiders.pinterest_pins import PinterestPinsSpider
+from pinterest_scraper.spiders.pinterest_search import PinterestSearchSpider
+from pinterest_scraper.utils import json_safe
+
+
+# Yielded by a consumer callback that gave up on a page being escalated;
+# the combined spider drops it and sends the one escalation request itself
+ESCALATED = object()
+
+# Spiders the combined crawl can run, by consumer name
+CONSUMER_SPIDERS = {
+    'pins': PinterestPinsSpider,
+    'boards': PinterestBoardsSpider,
+    'search': PinterestSearchSpider,
+}
+
+
+class Consumer:
+    """Mixin for a spider run as one consumer of the combined crawl
+
+    Its fetches go through the combined spider, which fetches each page
+    once and routes it to every consumer that asked for it.
+    """
+
+    combined = None
+    consumer_name = None
+
+    def fetch(self, url, callback, meta=None, **kwargs):
+        return self.combined.fetch_for(self, url, callback, meta, **kwargs)
+
+    def fetch_failed(self, response):
+        # The combined spider escalates once for all consumers of the page
+        return self.combined.escalate_for(response)
+
+
+class PinterestCombinedSpider(PinterestBaseSpider):
+    name = "pinterest_combined"
+    allowed_domains = ["pinterest.com", "proxy.scrapeops.io"]
+
+    custom_settings = {
+        'DOWNLOAD_DELAY': 2,
+        'CONCURRENT_REQUESTS': 1,
+        'RANDOMIZE_DOWNLOAD_DELAY': 0.5,
+    }
+
+    def __init__(self, search_query=None, consumers="pins,boards,search", max_pins=20, max_boards=20,
+                 max_results=20, search_type="pins", *args, **kwargs):
+        super(PinterestCombinedSpider, self).__init__(*args, **kwargs)
+        self.search_query = search_query or "home decor"
+        self.consumer_names = [name.strip() for name in consumers.split(',') if name.strip()]
+        unknown = set(self.consumer_names) - set(CONSUMER_SPIDERS)
+        if unknown:
+            raise ValueError(f"Unknown consumers: {', '.join(sorted(unknown))}")
+        self.consumer_args = {
+            'pins': {'max_pins': max_pins},
+            'boards': {'max_boards': max_boards},
+            'search': {'max_results': max_results, 'search_type': search_type},
+        }
+        self.consumers = {}
+        self.routes = {}  # page URL -> route of the request fetching it
+        self.response_cache = OrderedDict()  # page URL -> complete response, most recent last
+        self.response_cache_size = 0
+        self.dispatching = {}  # consumer response -> (escalation of its page, route entry)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(PinterestCombinedSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.response_cache_size = crawler.settings.getint('COMBINED_RESPONSE_CACHE_SIZE', 32)
+        for name in spider.consumer_names:
+            spider.consumers[name] = spider.create_consumer(name, crawler)
+        crawler.signals.connect(spider.forget_route, signal=signals.request_dropped)
+        return spider
+
+    def create_consumer(self, name, crawler):
+        spidercls = CONSUMER_SPIDERS[name]
+        consumercls = type(f'{spidercls.__name__}Consumer', (Consumer, spidercls), {})
+        consumer = consumercls(
+            search_query=self.search_query,
+            queries_file=self.queries_file,
+            **self.consumer_args[name]
+        )
+        consumer.crawler = crawler
+        consumer.settings = crawler.settings
+        consumer.combined = self
+        consumer.consumer_name = name
+        consumer.parser = self.parser
+        consumer.fetch_strategy = self.fetch_strategy
+        consumer.deadline = self.deadline
+        consumer.entities = self.entities
+        return consumer
+
+    def start_requests(self):
+        """Interleave the start requests of all consumers"""
+        streams = [consumer.start_requests() for consumer in self.consumers.values()]
+        while streams:
+            for stream in list(streams):
+                request = next(stream, None)
+                if request is None:
+                    streams.remove(stream)
+                else:
+                    yield request
+
+    def fetch_for(self, consumer, url, callback, meta=None, **kwargs):
+        """Fetch a page for a consumer, sharing the fetch if the page is already on its way
+
+        A page fetched a moment ago for another consumer is served from the
+        response cache instead.
+        """
+        entry = {
+            'consumer': consumer.consumer_name,
+            'callback': callback.__name__,
+            'errback': getattr(kwargs.pop('errback', None), '__name__', 'request_failed'),
+            'meta': json_safe(meta or {}),
+        }
+        cached = self.response_cache.get(url)
+        if cached is not None:
+            self.response_cache.move_to_end(url)
+            self.crawler.stats.inc_value('combined/cache_hits')
+            yield from self.dispatch(cached, [entry])
+            return
+        route = self.routes.get(url)
+        if route is not None:
+            route.append(entry)
+            self.crawler.stats.inc_value('combined/shared_fetches')
+            return
+        meta = dict(meta or {}, route=[entry])
+        for request in self.fetch(url, self.route, meta=meta, errback=self.route_failed, **kwargs):
+            self.routes[url] = request.meta['route']
+            yield request
+
+    def forget_route(self, request, spider):
+        route = request.meta.get('route')
+        url = request.meta.get('fetch_url')
+        if route is not None and self.routes.get(url) is route:
+            del self.routes[url]
+
+    def route(self, response):
+        """Hand a fetched page to every consumer that asked for it"""
+        self.forget_route(response.request, self)
+        yield from self.dispatch(response, response.meta['route'])
+
+    def dispatch(self, response, entries):
+        """Run the consumers' callbacks on a page, each with its own copy of the meta"""
+        escalation = {'response': response, 'route': []}
+        for entry in entries:
+            consumer = self.consumers[entry['consumer']]
+            consumer_response = response.replace(request=self.consumer_request(response.request, entry))
+            self.dispatching[consumer_response] = (escalation, entry)
+            try:
+                for output in getattr(consumer, entry['callback'])(consumer_response) or ():
+                    if output is not ESCALATED:
+                        yield output
+            finally:
+                del self.dispatching[consumer_response]
+
+        # Nothing extracted for some consumers: retry on a more expensive tier, once
+        request = escalation.get('request')
+        if request is not None:
+            self.logger.info(f"⬆️ Escalating fetch tier for: {response.meta.get('fetch_url')}")
+            request.meta['route'] = escalation['route']
+            self.routes[request.meta['fetch_url']] = escalation['route']
+            yield request
+        elif 'request' not in escalation:
+            self.cache_response(response)
+
+    def escalate_for(self, consumer_response):
+        """Put a consumer on the escalation of the page it is parsing
+
+        The page is escalated once however many consumers ask. Returns the
+        ESCALATED marker for the callback to stop on, or nothing when no
+        tier is left and the consumer has to make do with the page.
+        """
+        escalation, entry = self.dispatching[consumer_response]
+        if 'request' not in escalation:
+            escalation['request'] = self.fetch_strategy.escalate(escalation['response'])
+        if escalation['request'] is None:
+            return ()
+        escalation['route'].append(entry)
+        return (ESCALATED,)
+
+    def cache_response(self, response):
+        """Keep a page every consumer could use for consumers that ask for it later"""
+        url = response.meta.get('fetch_url')
+        if not self.response_cache_size or url is None:
+            return
+        self.response_cache[url] = response
+        self.response_cache.move_to_end(url)
+        while len(self.response_cache) > self.response_cache_size:
+            self.response_cache.popitem(last=False)
+
+    def route_failed(self, failure):
+        """Hand a failed fetch to the errback of every consumer that asked for it"""
+        if self.superseded(failure):
+            return  # the page is still on its way
+        request = failure.request
+        self.forget_route(request, self)
+        called = set()
+        for entry in request.meta.get('route', ()):
+            errback = entry['errback']
+            if errback == 'request_failed' and errback in called:
+                continue  # logged once per page
+            called.add(errback)
+            failure.request = self.consumer_request(request, entry)
+            yield from getattr(self.consumers[entry['consumer']], errback)(failure) or ()
+
+    def consumer_request(self, request, entry):
+        """The request as the consumer of a route entry made it
+
+        The shared request carries the meta of the consumer that sent it;
+        other consumers get the fetch keys without it, plus their own.
+        """
+        consumer = self.consumers[entry['consumer']]
+        owned = {key for other in request.meta.get('route', ()) for key in other['meta']}
+        meta = {key: value for key, value in request.meta.items() if key not in owned}
+        meta.update(entry['meta'])
+        return request.replace(callback=getattr(consumer, entry['callback']), meta=meta)
+
+    def request_redundant(self, request):
+        """A shared fetch is redundant once it is redundant for all of its consumers"""
+        entries = request.meta.get('route')
+        if not entries:
+            return False
+        return all(
+            self.consumers[entry['consumer']].request_redundant(self.consumer_request(request, entry))
+            for entry in entries
+        )
+
+    def request_unfinishable(self, request):
+        entries = request.meta.get('route')
+        if not entries:
+            return super(PinterestCombinedSpider, self).request_unfinishable(request)
+        return all(
+            self.consumers[entry['consumer']].request_unfinishable(self.consumer_request(request, entry))
+            for entry in entries
+        )
+
+    def frontier_state(self):
+        return {name: consumer.frontier_state() for name, consumer in self.consumers.items()}
+
+    def restore_frontier_state(self, state):
+        for name, consumer in self.consumers.items():
+            if name in state:
+                consumer.restore_frontier_state(state[name])
@@ -1,12 +1,17 @@
-import scrapy
-import json
-import re
 from datetime import datetime
-from urllib.parse import urljoin, quote_plus
+from urllib.parse import quote_plus
+from scrapy import signals
+from pinterest_scraper.graph import EdgeWriter, GraphFrontier
+from pinterest_scraper.spiders.base import PinterestBaseSpider
 from pinterest_scraper.items import PinterestPinItem
+from pinterest_scraper.resources import pin_item, resource_data, resource_payload, resource_url
+from pinterest_scraper.urls import canonical_url, url_key
+from pinterest_scraper.utils import (
+    PIN_PATH_RE, extract_domain, extract_hashtags, extract_pin_id, extract_price, parse_number
+)
 
 
-class PinterestPinsSpider(scrapy.Spider):
+class PinterestPinsSpider(PinterestBaseSpider):
     name = "pinterest_pins"
     allowed_domains = ["pinterest.com", "proxy.scrapeops.io"]
     
@@ -16,31 +21,74 @@ class PinterestPinsSpider(scrapy.Spider):
         'RANDOMIZE_DOWNLOAD_DELAY': 0.5,
     }
 
-    def __init__(self, search_query=None, max_pins=20, category=None, *args, **kwargs):
+    progress_attrs = ('pins_scraped',)
+    budget_attrs = ('pins_scraped', 'max_pins')
+    detail_page_type = 'pin'
+
+    # Related-pins graph expansion (see graph.py), None when not expanding
+    graph = None
+    edges = None
+
+    def __init__(self, search_query=None, max_pins=20, category=None, expand_related=False, max_depth=2,
+                 max_fanout=10, seed_pins=None, *args, **kwargs):
         super(PinterestPinsSpider, self).__init__(*args, **kwargs)
         self.search_query = search_query or "home decor"
         self.max_pins = int(max_pins)
         self.category = category
+        self.expand_related = str(expand_related).lower() in ('1', 'true', 'yes')
+        self.max_depth = int(max_depth)  # hops from a seed pin
+        self.max_fanout = int(max_fanout)  # related pins taken per pin
+        self.seed_pins = seed_pins
         self.base_url = "https://www.pinterest.com"
         self.pins_scraped = 0
+        self.related_in_flight = 0
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(PinterestPinsSpider, cls).from_crawler(crawler, *args, **kwargs)
+        if spider.expand_related:
+            settings = crawler.settings
+            spider.graph = GraphFrontier(memory_limit=settings.getint('GRAPH_FRONTIER_MEMORY', 10000))
+            timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+            spider.edges = EdgeWriter(settings.get('GRAPH_EDGES_FILE').format(timestamp=timestamp))
+            crawler.signals.connect(spider.close_graph, signal=signals.spider_closed)
+        return spider
+
+    def close_graph(self, spider):
+        self.edges.close()
+        self.graph.close()
+        self.logger.info(f"🕸️ Wrote {self.edges.count} related-pin edges to: {self.edges.path}")
 
     def start_requests(self):
         """Generate initial requests for Pinterest pins"""
         
-        # Get ScrapeOps API key from settings
-        api_key = self.settings.get('SCRAPEOPS_API_KEY')
+        # Graph expansion from given seed pins (IDs or pin URLs)
+        if self.seed_pins:
+            for seed in self.seed_pins.split(','):
+                pin_id = extract_pin_id(seed) or seed.strip()
+                pin_url = f"{self.base_url}/pin/{pin_id}/"
+                yield from self.request_entity(f"pin:{pin_id}", pin_url, self.parse_pin, {'pin_url': pin_url})
+            return
+        
+        # Bulk mode: one search per queries file entry, read lazily
+        if self.queries_file:
+            for entry in self.query_entries():
+                search_url = f"{self.base_url}/search/pins/?q={quote_plus(entry['query'])}"
+                yield from self.fetch(
+                    search_url,
+                    self.parse_search_results,
+                    meta=self.query_meta(entry, self.max_pins)
+                )
+            return
         
         # If specific search query provided
         if self.search_query:
             search_url = f"{self.base_url}/search/pins/?q={quote_plus(self.search_query)}"
             self.logger.info(f"🔍 Searching Pinterest for: {self.search_query}")
             
-            # Use ScrapeOps proxy with JavaScript rendering
-            proxy_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(search_url)}&render_js=true&wait=3000&residential=false&country=US"
-            
-            yield scrapy.Request(
-                url=proxy_url,
-                callback=self.parse_search_results,
+            yield from self.fetch(
+                search_url,
+                self.parse_search_results,
                 meta={'search_query': self.search_query}
             )
         
@@ -48,12 +96,9 @@ class PinterestPinsSpider(scrapy.Spider):
         elif self.category:
             category_url = f"{self.base_url}/search/pins/?q={quote_plus(self.category)}"
             
-            # Use ScrapeOps proxy with JavaScript rendering
-            proxy_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(category_url)}&render_js=true&wait=3000&residential=false&country=US"
-            
-            yield scrapy.Request(
-                url=proxy_url,
-                callback=self.parse_search_results,
+            yield from self.fetch(
+                category_url,
+                self.parse_search_results,
                 meta={'search_query': self.category}
             )
         
@@ -67,12 +112,9 @@ class PinterestPinsSpider(scrapy.Spider):
             for query in popular_queries[:3]:  # Limit to first 3 queries
                 search_url = f"{self.base_url}/search/pins/?q={quote_plus(query)}"
                 
-                # Use ScrapeOps proxy with JavaScript rendering
-                proxy_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(search_url)}&render_js=true&wait=3000&residential=false&country=US"
-                
-                yield scrapy.Request(
-                    url=proxy_url,
-                    callback=self.parse_search_results,
+                yield from self.fetch(
+                    search_url,
+                    self.parse_search_results,
                     meta={'search_query': query}
                 )
 
@@ -82,9 +124,6 @@ class PinterestPinsSpider(scrapy.Spider):
         search_query = response.meta.get('search_query')
         self.logger.info(f"📍 Parsing search results for: {search_query}")
         
-        # Get ScrapeOps API key from settings
-        api_key = self.settings.get('SCRAPEOPS_API_KEY')
-        
         # Look for pin links using multiple selectors
         pin_selectors = [
             'a[href*="/pin/"]::attr(href)',
@@ -95,14 +134,16 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         pin_links = []
+        seen = set()
         for selector in pin_selectors:
-            found_links = response.css(selector).getall()
+            found_links = self.parser.getall(response, selector)
             if found_links:
                 self.logger.info(f"Found {len(found_links)} pin links using selector: {selector}")
                 for link in found_links:
                     if link and '/pin/' in link and len(link) > 10:
-                        full_url = urljoin(self.base_url, link)
-                        if full_url not in pin_links:
+                        full_url = canonical_url(link)
+                        if full_url not in seen:
+                            seen.add(full_url)
                             pin_links.append(full_url)
                 break  # Use first successful selector
         
@@ -110,41 +151,47 @@ class PinterestPinsSpider(scrapy.Spider):
         if not pin_links:
             pin_links = self.extract_pins_from_scripts(response)
         
+        # Nothing extracted on this proxy tier: retry on a more expensive one
+        if not pin_links:
+            yield from self.fetch_failed(response)
+            return
+        self.fetch_strategy.succeeded(response)
+        
         self.logger.info(f"✅ Found {len(pin_links)} unique pin URLs")
         
-        # Follow pin links
-        for pin_url in pin_links[:self.max_pins]:
-            if self.pins_scraped >= self.max_pins:
-                break
-            
-            # Use ScrapeOps proxy with JavaScript rendering for pin pages
-            proxy_pin_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(pin_url)}&render_js=true&wait=3000&residential=false&country=US"
-                
-            yield scrapy.Request(
-                url=proxy_pin_url,
-                callback=self.parse_pin,
-                meta={
-                    'search_query': search_query,
-                    'pin_url': pin_url
-                }
-            )
-            self.pins_scraped += 1
+        # Follow pin links (each pin once across all queries)
+        yield from self.follow_entities(
+            response,
+            pin_links,
+            self.pin_key,
+            self.parse_pin,
+            lambda pin_url: {
+                'search_query': search_query,
+                'pin_url': pin_url
+            }
+        )
+
+    def pin_key(self, pin_url):
+        """Registry key of a pin: its ID, or the canonical URL if it has none"""
+        return url_key(pin_url)
 
     def extract_pins_from_scripts(self, response):
         """Extract pin URLs from JavaScript/JSON data"""
         pin_links = []
         
         # Look for JSON data in script tags
-        scripts = response.css('script::text').getall()
+        scripts = self.parser.getall(response, 'script::text')
         
         for script in scripts:
             if 'pin' in script.lower() and '/pin/' in script:
                 # Use regex to find pin URLs in JavaScript
-                pin_matches = re.findall(r'/pin/\d+/', script)
+                pin_matches = PIN_PATH_RE.findall(script)
                 
+                seen = set()
                 for match in pin_matches:
-                    full_url = urljoin(self.base_url, match)
-                    if full_url not in pin_links:
+                    full_url = canonical_url(match)
+                    if full_url not in seen:
+                        seen.add(full_url)
                         pin_links.append(full_url)
                 
                 if pin_links:
@@ -164,8 +211,8 @@ class PinterestPinsSpider(scrapy.Spider):
         item = PinterestPinItem()
         
         # Basic pin information
-        item['pin_url'] = pin_url
-        item['pin_id'] = self.extract_pin_id(pin_url)
+        item['pin_url'] = canonical_url(pin_url)
+        item['pin_id'] = extract_pin_id(pin_url)
         item['title'] = self.extract_pin_title(response)
         item['description'] = self.extract_pin_description(response)
         
@@ -173,6 +220,15 @@ class PinterestPinsSpider(scrapy.Spider):
         item['image_url'] = self.extract_image_url(response)
         item['media_type'] = self.extract_media_type(response)
         
+        # Required fields missing: the page needs a more expensive proxy tier
+        if item['title'] == "No title available" or not item['image_url']:
+            escalation = list(self.fetch_failed(response))
+            if escalation:
+                yield from escalation
+                return
+        else:
+            self.fetch_strategy.succeeded(response)
+        
         # Board information
         item['board_name'] = self.extract_board_name(response)
         item['board_url'] = self.extract_board_url(response)
@@ -203,13 +259,74 @@ class PinterestPinsSpider(scrapy.Spider):
         item['is_shoppable'] = self.extract_shoppable_status(response)
         item['product_price'] = self.extract_product_price(response)
         
+        self.entity_completed(response.meta)
         yield item
+        yield from self.entity_sightings(item)
+        
+        # Graph mode: the pin is a seed of the related-pins expansion
+        if self.graph is not None and item['pin_id'] and self.max_depth > 0:
+            if self.graph.see(item['pin_id']):
+                self.graph.push(item['pin_id'], 0, parse_number(item['pin_repins']))
+            yield from self.expand_graph()
 
-    def extract_pin_id(self, pin_url):
-        """Extract pin ID from URL"""
-        # Pinterest pin URLs format: /pin/PIN_ID/
-        match = re.search(r'/pin/(\d+)/', pin_url)
-        return match.group(1) if match else ""
+    def expand_graph(self):
+        """Request related pins of the best waiting pins, keeping a few requests in flight"""
+        limit = max(2, self.settings.getint('CONCURRENT_REQUESTS') * 2)
+        while self.related_in_flight < limit:
+            entry = self.graph.pop()
+            if entry is None:
+                return
+            pin_id, depth = entry
+            options = {'pin_id': pin_id, 'page_size': self.max_fanout, 'context_pin_ids': []}
+            for request in self.fetch(
+                resource_url('RelatedModulesResource', options, f'/pin/{pin_id}/'),
+                self.parse_related,
+                meta={'graph_pin': pin_id, 'graph_depth': depth},
+                errback=self.related_failed
+            ):
+                self.related_in_flight += 1
+                yield request
+
+    def parse_related(self, response):
+        """Emit the related pins of a pin and their edges, and queue them for expansion"""
+        self.related_in_flight -= 1
+        payload = resource_payload(response)
+        pins = resource_data(payload) if payload else None
+        if not isinstance(pins, list):
+            escalation = list(self.fetch_failed(response))
+            self.related_in_flight += len(escalation)
+            yield from escalation
+            if not escalation:
+                self.logger.warning(f"❌ No related pins for: {response.meta['graph_pin']}")
+                yield from self.expand_graph()
+            return
+        self.fetch_strategy.succeeded(response)
+
+        source = response.meta['graph_pin']
+        depth = response.meta['graph_depth']
+        related = [pin for pin in pins if isinstance(pin, dict) and pin.get('type', 'pin') == 'pin' and pin.get('id')]
+        for rank, pin in enumerate(related[:self.max_fanout]):
+            target = str(pin['id'])
+            if source.isdigit() and target.isdigit():
+                self.edges.write(source, target, depth, rank)
+            if not self.graph.see(target):
+                continue
+            item = pin_item(pin)
+            self.crawler.stats.inc_value('graph/pins')
+            yield item
+            yield from self.entity_sightings(item)
+            if depth + 1 < self.max_depth:
+                self.graph.push(target, depth + 1, (item['pin_repins'] or 0) + (item['pin_saves'] or 0))
+        self.crawler.stats.set_value('graph/edges', self.edges.count)
+        self.crawler.stats.max_value('graph/frontier_max', len(self.graph))
+        yield from self.expand_graph()
+
+    def related_failed(self, failure):
+        if self.superseded(failure):
+            return
+        self.related_in_flight -= 1
+        self.request_failed(failure)
+        yield from self.expand_graph()
 
     def extract_pin_title(self, response):
         """Extract pin title with multiple selectors"""
@@ -223,7 +340,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            title = response.css(selector).get()
+            title = self.parser.get(response, selector)
             if title and title.strip() and not 'Pinterest' in title:
                 return title.strip()
         
@@ -240,7 +357,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            description = response.css(selector).get()
+            description = self.parser.get(response, selector)
             if description and description.strip() and len(description.strip()) > 10:
                 return description.strip()
         
@@ -257,7 +374,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            image_url = response.css(selector).get()
+            image_url = self.parser.get(response, selector)
             if image_url and ('pinimg' in image_url or 'pinterest' in image_url):
                 return image_url
         
@@ -266,9 +383,9 @@ class PinterestPinsSpider(scrapy.Spider):
     def extract_media_type(self, response):
         """Determine if pin is image, video, or other"""
         # Check for video indicators
-        if response.css('video, .video, [data-test-id="video"]').get():
+        if self.parser.exists(response, 'video, .video, [data-test-id="video"]'):
             return "video"
-        elif response.css('img, .image, [data-test-id="image"]').get():
+        elif self.parser.exists(response, 'img, .image, [data-test-id="image"]'):
             return "image"
         else:
             return "unknown"
@@ -283,7 +400,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            board_name = response.css(selector).get()
+            board_name = self.parser.get(response, selector)
             if board_name and board_name.strip():
                 return board_name.strip()
         
@@ -297,9 +414,9 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            board_url = response.css(selector).get()
+            board_url = self.parser.get(response, selector)
             if board_url:
-                return urljoin(self.base_url, board_url)
+                return canonical_url(board_url)
         
         return ""
 
@@ -313,7 +430,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            username = response.css(selector).get()
+            username = self.parser.get(response, selector)
             if username and username.strip():
                 return username.strip()
         
@@ -328,7 +445,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            name = response.css(selector).get()
+            name = self.parser.get(response, selector)
             if name and name.strip():
                 return name.strip()
         
@@ -342,9 +459,9 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            pinner_url = response.css(selector).get()
+            pinner_url = self.parser.get(response, selector)
             if pinner_url:
-                return urljoin(self.base_url, pinner_url)
+                return canonical_url(pinner_url)
         
         return ""
 
@@ -358,9 +475,9 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            likes_text = response.css(selector).get()
+            likes_text = self.parser.get(response, selector)
             if likes_text:
-                return self.parse_number(likes_text)
+                return parse_number(likes_text)
         
         return 0
 
@@ -373,9 +490,9 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            comments_text = response.css(selector).get()
+            comments_text = self.parser.get(response, selector)
             if comments_text:
-                return self.parse_number(comments_text)
+                return parse_number(comments_text)
         
         return 0
 
@@ -388,9 +505,9 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            saves_text = response.css(selector).get()
+            saves_text = self.parser.get(response, selector)
             if saves_text:
-                return self.parse_number(saves_text)
+                return parse_number(saves_text)
         
         return 0
 
@@ -403,7 +520,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in selectors:
-            source_url = response.css(selector).get()
+            source_url = self.parser.get(response, selector)
             if source_url and source_url.startswith('http'):
                 return source_url
         
@@ -413,8 +530,7 @@ class PinterestPinsSpider(scrapy.Spider):
         """Extract domain from source URL"""
         source_url = self.extract_source_url(response)
         if source_url:
-            match = re.search(r'https?://([^/]+)', source_url)
-            return match.group(1) if match else ""
+            return extract_domain(source_url)
         return ""
 
     def extract_pin_tags(self, response):
@@ -424,7 +540,7 @@ class PinterestPinsSpider(scrapy.Spider):
         # Look for hashtags in description or dedicated tag areas
         description = self.extract_pin_description(response)
         if description:
-            hashtags = re.findall(r'#(\w+)', description)
+            hashtags = extract_hashtags(description)
             tags.extend(hashtags)
         
         # Look for dedicated tag elements
@@ -435,7 +551,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in tag_selectors:
-            found_tags = response.css(selector).getall()
+            found_tags = self.parser.getall(response, selector)
             tags.extend([tag.strip('#') for tag in found_tags if tag])
         
         return list(set(tags[:10]))  # Remove duplicates, limit to 10
@@ -451,7 +567,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in topic_selectors:
-            found_topics = response.css(selector).getall()
+            found_topics = self.parser.getall(response, selector)
             topics.extend([topic.strip() for topic in found_topics if topic])
         
         return list(set(topics[:5]))  # Remove duplicates, limit to 5
@@ -466,7 +582,7 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for indicator in shopping_indicators:
-            if response.css(indicator).get():
+            if self.parser.exists(response, indicator):
                 return True
         
         return False
@@ -480,44 +596,9 @@ class PinterestPinsSpider(scrapy.Spider):
         ]
         
         for selector in price_selectors:
-            price_text = response.css(selector).get()
+            price_text = self.parser.get(response, selector)
             if price_text and '$' in price_text:
                 # Extract price using regex
-                price_match = re.search(r'\$[\d,]+\.?\d*', price_text)
-                return price_match.group(0) if price_match else ""
+                return extract_price(price_text)
         
         return ""
-
-    def parse_number(self, text):
-        """Parse number from text with K, M, B suffixes"""
-        if not text:
-            return 0
-        
-        text = str(text).strip().replace(',', '')
-        
-        # Handle K, M, B suffixes
-        if text.lower().endswith('k'):
-            try:
-                return int(float(text[:-1]) * 1000)
-            except ValueError:
-                return 0
-        elif text.lower().endswith('m'):
-            try:
-                return int(float(text[:-1]) * 1000000)
-            except ValueError:
-                return 0
-        elif text.lower().endswith('b'):
-            try:
-                return int(float(text[:-1]) * 1000000000)
-            except ValueError:
-                return 0
-        else:
-            # Extract just numbers
-            numbers = re.findall(r'\d+', text)
-            if numbers:
-                try:
-                    return int(numbers[0])
-                except ValueError:
-                    return 0
-        
-        return 0 
\ No newline at end of file
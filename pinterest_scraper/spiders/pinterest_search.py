@@ -1,12 +1,16 @@
-import scrapy
-import json
-import re
 from datetime import datetime
-from urllib.parse import urljoin, quote_plus
+from urllib.parse import quote_plus
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from pinterest_scraper.spiders.base import PinterestBaseSpider
 from pinterest_scraper.items import PinterestSearchItem, PinterestTrendingItem
+from pinterest_scraper.queries import QueryFrontier
+from pinterest_scraper.trends import position_score, trend_id
+from pinterest_scraper.urls import canonical_url
+from pinterest_scraper.utils import extract_result_id, parse_number
 
 
-class PinterestSearchSpider(scrapy.Spider):
+class PinterestSearchSpider(PinterestBaseSpider):
     name = "pinterest_search"
     allowed_domains = ["pinterest.com", "proxy.scrapeops.io"]
     
@@ -16,62 +20,101 @@ class PinterestSearchSpider(scrapy.Spider):
         'RANDOMIZE_DOWNLOAD_DELAY': 0.5,
     }
 
-    def __init__(self, search_query=None, search_type="pins", max_results=20, *args, **kwargs):
+    progress_attrs = ('results_scraped',)
+    budget_attrs = ('results_scraped', 'max_results')
+
+    def __init__(self, search_query=None, search_type="pins", max_results=20, expand_queries=False, max_queries=50,
+                 max_query_depth=2, *args, **kwargs):
         super(PinterestSearchSpider, self).__init__(*args, **kwargs)
         self.search_query = search_query or "home decor ideas"
         self.search_type = search_type  # pins, boards, users
         self.max_results = int(max_results)
         self.base_url = "https://www.pinterest.com"
         self.results_scraped = 0
+        # Expansion mode: crawl the search suggestions as new queries
+        self.query_frontier = None
+        if str(expand_queries).lower() in ('1', 'true', 'yes'):
+            self.query_frontier = QueryFrontier(max_queries=int(max_queries), max_depth=int(max_query_depth))
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(PinterestSearchSpider, cls).from_crawler(crawler, *args, **kwargs)
+        if spider.query_frontier is not None:
+            spider.query_frontier.min_count = crawler.settings.getint('QUERY_EXPANSION_MIN_COUNT', 1)
+            crawler.signals.connect(spider.expand_queries, signal=signals.spider_idle)
+        return spider
 
     def start_requests(self):
         """Generate initial requests for Pinterest search"""
         
-        # Get ScrapeOps API key from settings
-        api_key = self.settings.get('SCRAPEOPS_API_KEY')
-        
-        if self.search_query:
-            # Search for specific query
-            search_urls = []
-            
-            if self.search_type == "pins" or self.search_type == "all":
-                search_urls.append(f"{self.base_url}/search/pins/?q={quote_plus(self.search_query)}")
-            
-            if self.search_type == "boards" or self.search_type == "all":
-                search_urls.append(f"{self.base_url}/search/boards/?q={quote_plus(self.search_query)}")
-            
-            if self.search_type == "users" or self.search_type == "all":
-                search_urls.append(f"{self.base_url}/search/people/?q={quote_plus(self.search_query)}")
-            
-            for search_url in search_urls:
-                search_type = "pins" if "/pins/" in search_url else ("boards" if "/boards/" in search_url else "users")
-                self.logger.info(f"🔍 Searching {search_type} for: {self.search_query}")
-                
-                # Use ScrapeOps proxy with JavaScript rendering
-                proxy_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(search_url)}&render_js=true&wait=3000&residential=false&country=US"
-                
-                yield scrapy.Request(
-                    url=proxy_url,
-                    callback=self.parse_search_results,
-                    meta={
-                        'search_query': self.search_query,
-                        'search_type': search_type,
-                        'search_url': search_url
-                    }
-                )
-        
-        # Also get trending content
+        # Trending content first, so bulk runs don't leave it for last
         trending_url = f"{self.base_url}/today/"
         self.logger.info("📈 Getting trending Pinterest content")
         
-        # Use ScrapeOps proxy for trending content
-        proxy_trending_url = f"https://proxy.scrapeops.io/v1/?api_key={api_key}&url={quote_plus(trending_url)}&render_js=true&wait=3000&residential=false&country=US"
-        
-        yield scrapy.Request(
-            url=proxy_trending_url,
-            callback=self.parse_trending,
-            meta={'search_query': 'trending'}
+        yield from self.fetch(
+            trending_url,
+            self.parse_trending,
+            meta={'search_query': 'trending', 'budget_exempt': True}
         )
+        
+        # Bulk mode: searches for every queries file entry, read lazily
+        if self.queries_file:
+            for entry in self.query_entries():
+                if self.query_frontier is not None:
+                    self.query_frontier.add_seed(entry['query'])
+                yield from self.search_requests(entry['query'], self.query_meta(entry, self.max_results))
+        
+        elif self.query_frontier is not None:
+            # Expansion mode: every query, the seed included, gets max_results
+            self.query_frontier.add_seed(self.search_query)
+            entry = {'query': self.search_query, 'max_items': None}
+            yield from self.search_requests(self.search_query, self.query_meta(entry, self.max_results))
+        
+        elif self.search_query:
+            # Search for specific query
+            yield from self.search_requests(self.search_query, {'search_query': self.search_query})
+
+    def expand_queries(self, spider):
+        """Schedule the most often suggested queries once the current ones are done"""
+        if spider is not self:
+            return
+        scheduled = False
+        for _ in range(self.settings.getint('QUERY_EXPANSION_BATCH', 5)):
+            candidate = self.query_frontier.pop()
+            if candidate is None:
+                break
+            query, depth = candidate
+            self.logger.info(f"🌱 Expanding to suggested query: {query} (depth {depth})")
+            self.crawler.stats.inc_value('queries/expanded')
+            meta = dict(self.query_meta({'query': query, 'max_items': None}, self.max_results), query_depth=depth)
+            for request in self.search_requests(query, meta):
+                self.crawler.engine.crawl(request)
+                scheduled = True
+        if scheduled:
+            raise DontCloseSpider
+
+    def search_requests(self, query, meta):
+        """Generate search requests for every configured search type of a query"""
+        search_urls = []
+        
+        if self.search_type == "pins" or self.search_type == "all":
+            search_urls.append(f"{self.base_url}/search/pins/?q={quote_plus(query)}")
+        
+        if self.search_type == "boards" or self.search_type == "all":
+            search_urls.append(f"{self.base_url}/search/boards/?q={quote_plus(query)}")
+        
+        if self.search_type == "users" or self.search_type == "all":
+            search_urls.append(f"{self.base_url}/search/people/?q={quote_plus(query)}")
+        
+        for search_url in search_urls:
+            search_type = "pins" if "/pins/" in search_url else ("boards" if "/boards/" in search_url else "users")
+            self.logger.info(f"🔍 Searching {search_type} for: {query}")
+            
+            yield from self.fetch(
+                search_url,
+                self.parse_search_results,
+                meta=dict(meta, search_type=search_type, search_url=search_url)
+            )
 
     def parse_search_results(self, response):
         """Parse Pinterest search results"""
@@ -86,52 +129,38 @@ class PinterestSearchSpider(scrapy.Spider):
         total_results = self.extract_total_results(response)
         search_suggestions = self.extract_search_suggestions(response)
         
-        # Define selectors based on search type
-        if search_type == "pins":
-            result_selectors = [
-                'a[href*="/pin/"]',
-                '[data-test-id="pin"]',
-                '.pinWrapper',
-                '.Pin'
-            ]
-        elif search_type == "boards":
-            result_selectors = [
-                'a[href*="/board/"]',
-                '[data-test-id="board"]',
-                '.boardWrapper',
-                '.Board'
-            ]
-        else:  # users
-            result_selectors = [
-                'a[href^="/"][href$="/"]',
-                '[data-test-id="user"]',
-                '.userWrapper',
-                '.User'
-            ]
+        # One pass over the result containers of the first matching selector
+        selector, results = self.parser.search_results(response, search_type)
+        if results:
+            self.logger.info(f"Found {len(results)} {search_type} results using selector: {selector}")
         
         results_found = []
         position = 1
         
-        for selector in result_selectors:
-            results = response.css(selector)
-            if results:
-                self.logger.info(f"Found {len(results)} {search_type} results using selector: {selector}")
-                
-                for result in results[:self.max_results]:
-                    if self.results_scraped >= self.max_results:
-                        break
-                    
-                    search_item = self.extract_search_result(
-                        result, search_query, search_type, search_url, 
-                        position, total_results, search_suggestions
-                    )
-                    
-                    if search_item:
-                        results_found.append(search_item)
-                        position += 1
-                        self.results_scraped += 1
-                
-                break  # Use first successful selector
+        for result in results:
+            if not self.has_budget(response.meta):
+                break
+            
+            search_item = self.search_item(
+                self.parser.result_fields(result), search_query, search_type, search_url,
+                position, total_results, search_suggestions
+            )
+            results_found.append(search_item)
+            position += 1
+            self.results_scraped += 1
+            self.count_for_query(response.meta)
+        
+        # Nothing extracted on this proxy tier: retry on a more expensive one
+        if not results:
+            yield from self.fetch_failed(response)
+            return
+        self.fetch_strategy.succeeded(response)
+        if not results_found:
+            return  # the page was fine, the budget was already met
+        
+        # Expansion mode: suggestions are candidate queries one level deeper
+        if self.query_frontier is not None:
+            self.query_frontier.observe(search_suggestions, response.meta.get('query_depth', 0) + 1)
         
         # Yield all found results
         for item in results_found:
@@ -139,8 +168,8 @@ class PinterestSearchSpider(scrapy.Spider):
         
         self.logger.info(f"✅ Extracted {len(results_found)} {search_type} search results")
 
-    def extract_search_result(self, result_element, search_query, search_type, search_url, position, total_results, suggestions):
-        """Extract individual search result"""
+    def search_item(self, fields, search_query, search_type, search_url, position, total_results, suggestions):
+        """Build a search result item from the fields of one result"""
         
         item = PinterestSearchItem()
         
@@ -153,81 +182,15 @@ class PinterestSearchSpider(scrapy.Spider):
         item['total_results'] = total_results
         item['search_suggestions'] = suggestions
         
-        # Extract result URL
-        result_url = result_element.css('a::attr(href)').get()
-        if result_url:
-            item['result_url'] = urljoin(self.base_url, result_url)
-            item['result_id'] = self.extract_result_id(result_url, search_type)
-        
-        # Extract result title/name
-        title_selectors = [
-            '::attr(alt)',
-            '::attr(title)',
-            '::text',
-            'img::attr(alt)',
-            'h3::text',
-            'h4::text',
-            '.title::text'
-        ]
-        
-        for selector in title_selectors:
-            title = result_element.css(selector).get()
-            if title and title.strip() and len(title.strip()) > 2:
-                item['result_title'] = title.strip()
-                break
-        
-        if not item.get('result_title'):
-            item['result_title'] = f"{search_type.rstrip('s').title()} Result"
-        
-        # Extract description
-        desc_selectors = [
-            '.description::text',
-            '.desc::text',
-            'p::text',
-            'span::text'
-        ]
-        
-        for selector in desc_selectors:
-            description = result_element.css(selector).get()
-            if description and description.strip() and len(description.strip()) > 5:
-                item['result_description'] = description.strip()
-                break
-        
-        if not item.get('result_description'):
-            item['result_description'] = ""
-        
-        # Extract thumbnail/preview image
-        img_selectors = [
-            'img::attr(src)',
-            '::attr(data-src)',
-            '.image img::attr(src)'
-        ]
-        
-        for selector in img_selectors:
-            thumbnail = result_element.css(selector).get()
-            if thumbnail and ('pinimg' in thumbnail or 'pinterest' in thumbnail):
-                item['thumbnail_url'] = thumbnail
-                break
-        
-        if not item.get('thumbnail_url'):
-            item['thumbnail_url'] = ""
-        
-        # Extract creator information
-        creator_selectors = [
-            '.creator::text',
-            '.author::text',
-            '.user-name::text',
-            '.pinner::text'
-        ]
-        
-        for selector in creator_selectors:
-            creator = result_element.css(selector).get()
-            if creator and creator.strip():
-                item['creator_name'] = creator.strip()
-                break
+        # Result URL and ID
+        if fields['href']:
+            item['result_url'] = canonical_url(fields['href'])
+            item['result_id'] = extract_result_id(fields['href'], search_type)
         
-        if not item.get('creator_name'):
-            item['creator_name'] = ""
+        item['result_title'] = fields['title'] or f"{search_type.rstrip('s').title()} Result"
+        item['result_description'] = fields['description']
+        item['thumbnail_url'] = fields['thumbnail']
+        item['creator_name'] = fields['creator']
         
         # Metadata
         item['scraped_at'] = datetime.now().isoformat()
@@ -235,19 +198,6 @@ class PinterestSearchSpider(scrapy.Spider):
         
         return item
 
-    def extract_result_id(self, result_url, search_type):
-        """Extract ID from result URL"""
-        if search_type == "pins":
-            match = re.search(r'/pin/(\d+)/', result_url)
-            return match.group(1) if match else ""
-        elif search_type == "boards":
-            # Board URLs are more complex, use the whole path segment
-            match = re.search(r'/([^/]+/[^/]+)/?$', result_url.rstrip('/'))
-            return match.group(1) if match else ""
-        else:  # users
-            match = re.search(r'/([^/]+)/?$', result_url.rstrip('/'))
-            return match.group(1) if match else ""
-
     def extract_total_results(self, response):
         """Extract total number of search results"""
         count_selectors = [
@@ -257,13 +207,12 @@ class PinterestSearchSpider(scrapy.Spider):
         ]
         
         for selector in count_selectors:
-            count_text = response.css(selector).get()
+            count_text = self.parser.get(response, selector)
             if count_text:
-                return self.parse_number(count_text)
+                return parse_number(count_text)
         
-        # Fallback: count visible results
-        visible_results = response.css('[data-test-id], .Pin, .Board, .User').getall()
-        return len(visible_results) if visible_results else 0
+        # Fallback: count visible results (without serializing them)
+        return self.parser.visible_results_count(response)
 
     def extract_search_suggestions(self, response):
         """Extract search suggestions"""
@@ -276,7 +225,7 @@ class PinterestSearchSpider(scrapy.Spider):
         ]
         
         for selector in suggestion_selectors:
-            found_suggestions = response.css(selector).getall()
+            found_suggestions = self.parser.getall(response, selector)
             suggestions.extend([s.strip() for s in found_suggestions if s.strip()])
         
         return list(set(suggestions[:10]))  # Remove duplicates, limit to 10
@@ -312,6 +261,12 @@ class PinterestSearchSpider(scrapy.Spider):
         
 
         
+        # Nothing extracted on this proxy tier: retry on a more expensive one
+        if not trending_items:
+            yield from self.fetch_failed(response)
+            return
+        self.fetch_strategy.succeeded(response)
+        
         # Yield trending items
         for item in trending_items:
             yield item
@@ -344,8 +299,9 @@ class PinterestSearchSpider(scrapy.Spider):
         if not item.get('trend_name'):
             return None  # Skip if no trend name found
         
-        # Generate trend ID
-        item['trend_id'] = f"trend_{position}_{datetime.now().strftime('%Y%m%d')}"
+        # Stable trend ID (hash of the normalized name) and position-based score
+        item['trend_id'] = trend_id(item['trend_name'])
+        item['trend_score'] = position_score(position)
         
         # Determine trend type
         if item['trend_name'].startswith('#'):
@@ -355,7 +311,7 @@ class PinterestSearchSpider(scrapy.Spider):
         
         # Extract associated links
         links = trend_element.css('a::attr(href)').getall()
-        sample_pins = [urljoin(self.base_url, link) for link in links if '/pin/' in link]
+        sample_pins = [canonical_url(link) for link in links if '/pin/' in link]
         item['sample_pins'] = sample_pins[:5]  # Limit to 5
         
         # Metadata
@@ -363,39 +319,3 @@ class PinterestSearchSpider(scrapy.Spider):
         item['scraped_at'] = datetime.now().isoformat()
         
         return item
-
-
-
-    def parse_number(self, text):
-        """Parse number from text with K, M, B suffixes"""
-        if not text:
-            return 0
-        
-        text = str(text).strip().replace(',', '')
-        
-        # Handle K, M, B suffixes
-        if text.lower().endswith('k'):
-            try:
-                return int(float(text[:-1]) * 1000)
-            except ValueError:
-                return 0
-        elif text.lower().endswith('m'):
-            try:
-                return int(float(text[:-1]) * 1000000)
-            except ValueError:
-                return 0
-        elif text.lower().endswith('b'):
-            try:
-                return int(float(text[:-1]) * 1000000000)
-            except ValueError:
-                return 0
-        else:
-            # Extract just numbers
-            numbers = re.findall(r'\d+', text)
-            if numbers:
-                try:
-                    return int(numbers[0])
-                except ValueError:
-                    return 0
-        
-        return 0 
\ No newline at end of file
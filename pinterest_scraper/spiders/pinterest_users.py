@@ -0,0 +1,117 @@
+from scrapy import signals
+from pinterest_scraper.resources import resource_data, resource_payload, resource_url, user_item
+from pinterest_scraper.shard import shard_of
+from pinterest_scraper.spiders.base import PinterestBaseSpider
+from pinterest_scraper.urls import parse_username
+from pinterest_scraper.users import UserStateStore, batched, iter_usernames
+
+
+class PinterestUsersSpider(PinterestBaseSpider):
+    name = "pinterest_users"
+    allowed_domains = ["pinterest.com", "proxy.scrapeops.io"]
+
+    custom_settings = {
+        'DOWNLOAD_DELAY': 0,
+        'RANDOMIZE_DOWNLOAD_DELAY': 0.5,
+    }
+
+    progress_attrs = ('users_scraped',)
+    budget_attrs = ('users_scraped', 'max_users')
+    detail_page_type = 'resource'
+
+    def __init__(self, usernames_file=None, usernames=None, max_users=0, *args, **kwargs):
+        super(PinterestUsersSpider, self).__init__(*args, **kwargs)
+        self.usernames_file = usernames_file
+        self.usernames = usernames
+        self.max_users = int(max_users)  # 0 = every username given
+        self.base_url = "https://www.pinterest.com"
+        self.users_scraped = 0
+        self.state = None
+
+    @classmethod
+    def update_settings(cls, settings):
+        super(PinterestUsersSpider, cls).update_settings(settings)
+        # Profiles are independent single JSON calls: run USERS_CONCURRENCY at once
+        concurrency = settings.getint('USERS_CONCURRENCY', 8)
+        for name in ('CONCURRENT_REQUESTS', 'CONCURRENT_REQUESTS_PER_DOMAIN'):
+            settings.set(name, concurrency, priority='spider')
+        settings.set('AUTOTHROTTLE_TARGET_CONCURRENCY', float(concurrency), priority='spider')
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(PinterestUsersSpider, cls).from_crawler(crawler, *args, **kwargs)
+        state_file = crawler.settings.get('USERS_STATE_FILE')
+        if state_file:
+            spider.state = UserStateStore(state_file)
+            crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        return spider
+
+    def spider_closed(self, spider):
+        self.state.close()
+
+    def start_requests(self):
+        """Request the profiles of all usernames, skipping ones fetched recently"""
+        max_age = self.settings.getfloat('USERS_REFRESH_DAYS', 7) * 86400
+        batch_size = self.settings.getint('USERS_BATCH_SIZE', 200)
+
+        for batch in batched(self.username_stream(), batch_size):
+            fresh = self.state.fresh(batch, max_age) if self.state else set()
+            if fresh:
+                self.crawler.stats.inc_value('users/fresh_skipped', len(fresh))
+            for username in batch:
+                if username in fresh:
+                    continue
+                if not self.has_budget({}):
+                    return
+                yield from self.request_entity(
+                    f"user:{username}",
+                    f"{self.base_url}/{username}/",
+                    self.parse_user,
+                    {'username': username}
+                )
+
+    def username_stream(self):
+        """Usernames of -a usernames and usernames_file (this shard's share of them)"""
+        shard_index, shard_count = self.shard()
+        if self.usernames and shard_index == 0:
+            names = (parse_username(name) for name in self.usernames.split(','))
+            yield from (name for name in names if name)
+        if self.usernames_file:
+            self.logger.info(f"📄 Reading usernames from: {self.usernames_file}")
+            for username in iter_usernames(self.usernames_file):
+                if shard_count <= 1 or shard_of(username, shard_count) == shard_index:
+                    yield username
+
+    def sharded_input(self):
+        return bool(self.usernames_file)
+
+    def has_budget(self, meta):
+        return not self.max_users or super(PinterestUsersSpider, self).has_budget(meta)
+
+    def entity_fetch_url(self, profile_url):
+        """Profiles are fetched from UserResource, not the rendered profile page"""
+        username = parse_username(profile_url)
+        options = {'username': username, 'field_set_key': 'profile'}
+        return resource_url('UserResource', options, f'/{username}/')
+
+    def parse_user(self, response):
+        """Build a PinterestUserItem from a UserResource response"""
+        payload = resource_payload(response)
+        user = resource_data(payload) if payload else None
+        username = response.meta.get('username')
+        if not isinstance(user, dict) or not user.get('username'):
+            escalation = list(self.fetch_failed(response))
+            if escalation:
+                yield from escalation
+            else:
+                self.registry.release(response.meta.get('entity_key'))
+                self.logger.warning(f"❌ No profile record for: {username}")
+            return
+        self.fetch_strategy.succeeded(response)
+
+        item = user_item(user)
+        self.logger.info(f"👤 Profile: {item['username']} ({item['follower_count']} followers)")
+        if self.state is not None:
+            self.state.mark(username, item['user_id'])
+        self.entity_completed(response.meta)
+        yield item
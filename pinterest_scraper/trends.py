@@ -0,0 +1,297 @@
+# Trending time series
+#
+# Every trending snapshot (pinterest_search's /today/ page) is appended to a
+# TrendStore as (trend, timestamp, position, score) rows:
+#
+#   TREND_STORE_DIR/journal.jsonl     rows not compacted yet, append-only
+#   TREND_STORE_DIR/segment-000001/   compacted rows, one binary file per
+#       trend.u64 ts.f64 position.u16 score.f32   column, sorted by (trend, ts)
+#   TREND_STORE_DIR/names.json        trend ID -> trend name
+#   TREND_STORE_DIR/lock              held while a store writes
+#
+# The journal is compacted into a new segment every TREND_COMPACT_EVERY rows,
+# and segments are merged once there are more than TREND_MAX_SEGMENTS. The
+# merged segment is written under the next segment number and lists the
+# segments it replaces in sources.json; they are deleted afterwards, and
+# skipped on load if a crash left them behind. Several crawls may share one
+# directory: every write takes an exclusive lock on the lock file and
+# compaction reads the journal back from disk, so no store drops rows
+# another one appended. A
+# trend's rows are found by binary search on the sorted trend column, so
+# series and growth-rate queries over months of snapshots only read the
+# matching slice instead of every CSV ever written.
+#
+#   python -m pinterest_scraper.trends data/trends "christmas decor"
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import time
+from array import array
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: one store per directory
+    fcntl = None
+
+
+# Column name -> array type code
+COLUMNS = (('trend', 'Q'), ('ts', 'd'), ('position', 'H'), ('score', 'f'))
+FILE_SUFFIXES = {'Q': 'u64', 'd': 'f64', 'H': 'u16', 'f': 'f32'}
+SEGMENT_PREFIX = 'segment-'
+
+
+def normalize_trend_name(name):
+    return ' '.join(name.lower().lstrip('#').split())
+
+
+def trend_key(name):
+    """64-bit key of a trend name, stable across positions, runs and machines"""
+    digest = hashlib.sha1(normalize_trend_name(name).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def trend_id(name):
+    """Stable trend_id of a PinterestTrendingItem"""
+    return f"trend_{trend_key(name):016x}"
+
+
+def position_score(position, size=100):
+    """Score of a position in a trending list: size for the top, 1 for the last"""
+    return max(0, size + 1 - int(position))
+
+
+class Segment:
+    """Compacted rows, loaded column by column"""
+
+    def __init__(self, path):
+        self.path = path
+        self.number = int(os.path.basename(path)[len(SEGMENT_PREFIX):])
+        self.sources = []  # names of the segments a merged segment replaces
+        sources_path = os.path.join(path, 'sources.json')
+        if os.path.exists(sources_path):
+            with open(sources_path, encoding='utf-8') as file:
+                self.sources = json.load(file)
+        self.columns = {}
+        for name, code in COLUMNS:
+            column = array(code)
+            column_path = os.path.join(path, f'{name}.{FILE_SUFFIXES[code]}')
+            with open(column_path, 'rb') as file:
+                column.frombytes(file.read())
+            self.columns[name] = column
+
+    def __len__(self):
+        return len(self.columns['trend'])
+
+    def rows(self, key=None, since=None):
+        """(trend, ts, position, score) rows, all or those of one trend key (since a time)"""
+        trend = self.columns['trend']
+        if key is None:
+            start, end = 0, len(trend)
+        else:
+            start, end = bisect.bisect_left(trend, key), bisect.bisect_right(trend, key)
+            if since is not None:
+                # Rows of one trend are sorted by timestamp
+                start = bisect.bisect_left(self.columns['ts'], since, start, end)
+        columns = [self.columns[name][start:end] for name, _ in COLUMNS]
+        return zip(*columns)
+
+    @classmethod
+    def write(cls, path, rows, sources=()):
+        """Write sorted rows as a segment directory (atomically)"""
+        rows = sorted(rows)
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for index, (name, code) in enumerate(COLUMNS):
+            column = array(code, (row[index] for row in rows))
+            with open(os.path.join(tmp_path, f'{name}.{FILE_SUFFIXES[code]}'), 'wb') as file:
+                column.tofile(file)
+        if sources:
+            with open(os.path.join(tmp_path, 'sources.json'), 'w', encoding='utf-8') as file:
+                json.dump(list(sources), file)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+
+class TrendStore:
+    """Append-only trend time series with periodic columnar compaction"""
+
+    def __init__(self, directory, compact_every=1000, max_segments=8):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self.journal_path = os.path.join(directory, 'journal.jsonl')
+        self.names_path = os.path.join(directory, 'names.json')
+        self.lock_file = open(os.path.join(directory, 'lock'), 'a')
+        self.names = {}
+        with self.locked():
+            self.load()
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock on the directory, against other stores writing to it"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        """Read names, segments and journal rows from disk"""
+        self.read_names()
+        segments = [
+            Segment(os.path.join(self.directory, name))
+            for name in sorted(os.listdir(self.directory))
+            if name.startswith(SEGMENT_PREFIX) and name[len(SEGMENT_PREFIX):].isdigit()
+        ]
+        # Segments a merge replaced, left behind by a crash before they were deleted
+        replaced = {source for segment in segments for source in segment.sources}
+        for segment in segments:
+            if os.path.basename(segment.path) in replaced:
+                shutil.rmtree(segment.path)
+        self.segments = [segment for segment in segments if os.path.basename(segment.path) not in replaced]
+        self.pending = list(self.read_journal())
+
+    def read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a crashed run
+                key = int(record['trend'], 16)
+                self.names.setdefault(key, record.get('name', ''))
+                yield key, record['ts'], record['position'], record['score']
+
+    def append(self, name, position, score=None, timestamp=None):
+        """Record one trend of a snapshot; compacts when the journal is full"""
+        key = trend_key(name)
+        row = (key, timestamp or time.time(), int(position), float(score if score is not None else position_score(position)))
+        self.names.setdefault(key, name)
+        with self.locked():
+            self.journal.write(json.dumps({
+                'trend': f'{key:016x}', 'name': name, 'ts': row[1], 'position': row[2], 'score': row[3]
+            }) + '\n')
+            self.journal.flush()
+        self.pending.append(row)
+        if len(self.pending) >= self.compact_every:
+            self.compact()
+        return row
+
+    def compact(self):
+        """Move the journal into a new segment, merging segments when there are too many"""
+        with self.locked():
+            # Other stores may have appended or compacted since: start from disk
+            self.journal.close()
+            self.load()
+            if self.pending:
+                self.segments.append(Segment.write(self.segment_path(), self.pending))
+                self.save_names()
+                open(self.journal_path, 'w').close()  # truncate
+                self.pending = []
+            self.journal = open(self.journal_path, 'a', encoding='utf-8')
+            if len(self.segments) > self.max_segments:
+                self.merge_segments()
+
+    def segment_path(self):
+        number = self.segments[-1].number + 1 if self.segments else 1
+        return os.path.join(self.directory, f'{SEGMENT_PREFIX}{number:06d}')
+
+    def merge_segments(self):
+        """Replace all segments with one; a crash at any point loses no rows"""
+        old = self.segments
+        rows = [row for segment in old for row in segment.rows()]
+        sources = [os.path.basename(segment.path) for segment in old]
+        merged = Segment.write(self.segment_path(), rows, sources)
+        for segment in old:
+            shutil.rmtree(segment.path)
+        self.segments = [merged]
+
+    def read_names(self):
+        if os.path.exists(self.names_path):
+            with open(self.names_path, encoding='utf-8') as file:
+                for key, name in json.load(file).items():
+                    self.names.setdefault(int(key, 16), name)
+
+    def save_names(self):
+        tmp_path = self.names_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({f'{key:016x}': name for key, name in self.names.items()}, file, ensure_ascii=False)
+        os.replace(tmp_path, self.names_path)
+
+    def series(self, name, since=None):
+        """[(ts, position, score)] of a trend, oldest first"""
+        key = trend_key(name)
+        rows = [row for segment in self.segments for row in segment.rows(key, since)]
+        rows += [row for row in self.pending if row[0] == key]
+        return sorted((ts, position, score) for _, ts, position, score in rows if since is None or ts >= since)
+
+    def trend_score(self, name, window=86400, now=None):
+        """Mean score of a trend over the last window seconds, or None"""
+        now = now or time.time()
+        scores = [score for ts, _, score in self.series(name, since=now - window) if ts <= now]
+        return sum(scores) / len(scores) if scores else None
+
+    def growth_rate(self, name, window=7 * 86400, now=None):
+        """Relative change of the mean score between the last window and the one before
+
+        None while the trend has no history in the previous window.
+        """
+        now = now or time.time()
+        current = previous = 0.0
+        current_count = previous_count = 0
+        for ts, _, score in self.series(name, since=now - 2 * window):
+            if ts > now:
+                continue
+            if ts >= now - window:
+                current += score
+                current_count += 1
+            else:
+                previous += score
+                previous_count += 1
+        if not previous_count or not previous:
+            return None
+        current = current / current_count if current_count else 0.0
+        return round((current - previous / previous_count) / (previous / previous_count), 4)
+
+    def close(self):
+        self.journal.close()
+        with self.locked():
+            self.read_names()  # names other stores saved meanwhile
+            self.save_names()
+        self.lock_file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the trending time series")
+    parser.add_argument('directory', help="TREND_STORE_DIR of the crawls")
+    parser.add_argument('trend', help="Trend name")
+    parser.add_argument('--window', type=float, default=7, help="Growth window in days (default 7)")
+    args = parser.parse_args(argv)
+
+    store = TrendStore(args.directory)
+    try:
+        series = store.series(args.trend)
+        print(f"{args.trend}: {len(series)} snapshots")
+        for ts, position, score in series[-10:]:
+            print(f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(ts))}  #{position}  score {score:g}")
+        print(f"trend_score (1 day): {store.trend_score(args.trend)}")
+        print(f"growth_rate ({args.window:g} days): {store.growth_rate(args.trend, window=args.window * 86400)}")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
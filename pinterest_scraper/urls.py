@@ -0,0 +1,176 @@
+# URL normalization and validation
+#
+# The same pin, board or profile shows up under many spellings: relative
+# hrefs, pinterest.com / www.pinterest.com / country domains, /board/user/name/
+# and /user/name/, tracking query strings, fragments, a missing trailing
+# slash. canonical_url() maps them all to one https://www.pinterest.com URL
+# and url_key() to one key ("pin:<id>", "board:<user>/<name>",
+# "user:<username>"), which the spiders' request registry and the
+# DuplicateFilterPipeline use to recognise them.
+#
+# The spiders canonicalize URLs once, when they build an item; URLs already
+# in canonical form are recognised by one compiled pattern (is_canonical())
+# and pass through canonical_url() and url_key() without being rebuilt. Other
+# spellings repeat heavily across pages (every pin of a board names the same
+# board and pinner), so canonical_url(), url_key() and is_valid_url() keep
+# bounded LRU caches keyed on the raw string, and Pinterest URLs are taken apart by one compiled
+# pattern instead of urljoin()/urlsplit().
+#
+# Usernames and board paths are read from URLs here too (parse_username(),
+# board_path()), so profiles, boards and site pages are told apart by one
+# list of SITE_PATHS everywhere.
+
+import re
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+
+BASE_URL = 'https://www.pinterest.com'
+
+# Entries per cache; a few MB at most
+CACHE_SIZE = 65536
+
+# Absolute Pinterest URL (pinterest.com, www.pinterest.com, de.pinterest.com,
+# pinterest.co.uk, ...) or site-relative path: its path and query string
+PINTEREST_URL_RE = re.compile(
+    r'(?:https?://(?:[a-z]{2,3}\.)?pinterest\.[a-z]{2,3}(?:\.[a-z]{2})?(?::\d+)?)?'
+    r'(?P<path>/(?!/)[^?#]*)?(?:\?(?P<query>[^#]*))?(?:#.*)?',
+    re.IGNORECASE
+)
+PIN_PATH_RE = re.compile(r'/pin/(\d+)')
+# What canonical_url() returns for a Pinterest URL: a pin, a path ending in a
+# slash, or a search/resource path with its query string
+CANONICAL_URL_RE = re.compile(
+    r'https://www\.pinterest\.com/'
+    r'(?:pin/\d+/|(?:(?!pin/|/)[^?#\s]*/)?|(?:search|resource)(?:/[^?#\s]*)?/\?[^#\s]+)'
+)
+CANONICAL_PIN_RE = re.compile(r'https://www\.pinterest\.com/pin/(\d+)/')
+USERNAME_RE = re.compile(r'[A-Za-z0-9_.-]{3,30}')
+VALID_URL_RE = re.compile(
+    r'^https?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+# First path segments that are site pages, not profiles or boards, and so
+# never usernames
+SITE_PATHS = {
+    'pin', 'search', 'today', 'ideas', 'board', 'resource', 'explore', 'settings', 'business', 'user', 'create',
+}
+# Site pages whose query string selects the content
+QUERY_PATHS = {'search', 'resource'}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def is_valid_url(url):
+    """True for an absolute http(s) URL; cached, as the same URLs are checked again and again"""
+    return VALID_URL_RE.match(url) is not None
+
+
+def is_canonical(url):
+    """True if a URL is already in the form canonical_url() gives it"""
+    return CANONICAL_URL_RE.fullmatch(url) is not None
+
+
+def canonical_url(url):
+    """Canonical form of a (possibly relative) Pinterest URL; other URLs are only made absolute"""
+    if url and CANONICAL_URL_RE.fullmatch(url):
+        return url
+    return rebuild_url(url)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def rebuild_url(url):
+    url = (url or '').strip()
+    if not url:
+        return ''
+    match = PINTEREST_URL_RE.fullmatch(url)
+    if match is None:
+        absolute = urljoin(BASE_URL + '/', url)
+        match = PINTEREST_URL_RE.fullmatch(absolute)
+        if match is None:
+            parts = urlsplit(absolute)
+            return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, parts.fragment))
+
+    path, query = match.group('path', 'query')
+    path = path or '/'
+    pin = PIN_PATH_RE.match(path)
+    if pin:
+        return f'{BASE_URL}/pin/{pin.group(1)}/'
+    if not path.endswith('/'):
+        path += '/'
+    if query and path[1:].split('/', 1)[0] in QUERY_PATHS:
+        return f'{BASE_URL}{path}?{query}'
+    return BASE_URL + path
+
+
+def path_segments(url):
+    """Non-empty path segments of a Pinterest URL, or None for other URLs"""
+    url = canonical_url(url)
+    if not url.startswith(BASE_URL + '/'):
+        return None
+    path = url[len(BASE_URL):].split('?', 1)[0]
+    return [segment for segment in path.split('/') if segment]
+
+
+def url_key(url):
+    """Identity of a URL: "pin:<id>", "board:<user>/<board>", "user:<username>" or the canonical URL"""
+    pin = CANONICAL_PIN_RE.fullmatch(url) if url else None
+    if pin is not None:
+        return f'pin:{pin.group(1)}'  # the most common kind, and rarely seen twice
+    return cached_url_key(url)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_url_key(url):
+    canonical = canonical_url(url)
+    segments = path_segments(canonical)
+    if not segments:
+        return canonical
+    if segments[0] == 'pin' and len(segments) == 2:
+        return f'pin:{segments[1]}'
+    if segments[0] == 'user' and len(segments) >= 2:
+        return f'user:{segments[1].lower()}'
+    if segments[0] == 'board':
+        segments = segments[1:]
+    if not segments or segments[0] in SITE_PATHS:
+        return canonical
+    if len(segments) == 1:
+        return f'user:{segments[0].lower()}'
+    return f'board:{segments[0].lower()}/{segments[1].lower()}'
+
+
+def board_path(url):
+    """'<user>/<board>' (lowercase) of a board URL in any form, or None"""
+    key = url_key(url)
+    return key[len('board:'):] if key.startswith('board:') else None
+
+
+def board_url(url):
+    """https://www.pinterest.com/board/<user>/<board>/ of a board URL in any form, or None"""
+    segments = path_segments(url)
+    if segments and segments[0] == 'board':
+        segments = segments[1:]
+    if not segments or len(segments) < 2 or segments[0] in SITE_PATHS:
+        return None
+    return f'{BASE_URL}/board/{segments[0]}/{segments[1]}/'
+
+
+def parse_username(value):
+    """Lowercase username of a username ('@name' too) or profile URL, or None"""
+    value = (value or '').strip()
+    if '/' in value:
+        key = url_key(value)
+        username = key[len('user:'):] if key.startswith('user:') else ''
+    else:
+        username = value[1:].lower() if value.startswith('@') else value.lower()
+    if not USERNAME_RE.fullmatch(username) or username in SITE_PATHS:
+        return None
+    return username
+
+
+def cache_info():
+    """Hit/miss counts of the URL caches"""
+    return {function.__name__: function.cache_info() for function in (is_valid_url, rebuild_url, cached_url_key)}
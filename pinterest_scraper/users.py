@@ -0,0 +1,127 @@
+# Usernames and cross-run profile state for the pinterest_users spider
+#
+# Usernames come from a file, read lazily like a queries file (see
+# queries.py):
+#
+#   users.txt     one username or profile URL per line ('#' starts a comment)
+#   users.jsonl   {"username": "..."} or any record with a pinner/owner URL
+#   pins.csv      any CSV, e.g. the pins / boards exports of the other
+#                 spiders: every cell holding a profile URL or a
+#                 username/pinner_username/owner_username column counts
+#
+# UserStateStore remembers when each profile was last fetched, in an SQLite
+# file shared by all runs, so a rerun only refreshes profiles older than
+# USERS_REFRESH_DAYS.
+
+import csv
+import json
+import os
+import sqlite3
+import time
+
+from pinterest_scraper.queries import file_format, open_text
+from pinterest_scraper.urls import parse_username
+
+
+# Record keys that may name a user
+USER_KEYS = ('username', 'pinner_username', 'owner_username', 'profile_url', 'pinner_url', 'owner_url')
+
+
+def iter_usernames(path):
+    """Lazily yield the usernames of a file, in file order (may repeat)"""
+    with open_text(path) as file:
+        fmt = file_format(path)
+        if fmt == 'jsonl':
+            records = (json.loads(line) for line in file if line.strip())
+            values = (record.get(key) for record in records for key in USER_KEYS)
+        elif fmt == 'csv':
+            values = csv_values(file)
+        else:
+            values = (line for line in file if not line.lstrip().startswith('#'))
+
+        for value in values:
+            username = parse_username(value) if isinstance(value, str) else None
+            if username:
+                yield username
+
+
+def csv_values(file):
+    """Candidate cells of a CSV file
+
+    The CSV exports only write a row's non-empty fields, so columns do not
+    always line up with the header; profile URLs are taken from any cell and
+    plain usernames only from a username column.
+    """
+    rows = csv.reader(file)
+    header = [name.strip().lower() for name in next(rows, [])]
+    username_columns = {
+        index for index, name in enumerate(header) if name in ('username', 'pinner_username', 'owner_username')
+    }
+    if header == ['username']:
+        yield from (row[0] for row in rows if row)
+        return
+    for row in rows:
+        for index, cell in enumerate(row):
+            if cell.startswith('http') or (index in username_columns and len(row) == len(header)):
+                yield cell
+
+
+def batched(iterable, size):
+    """Lists of up to size consecutive entries"""
+    batch = []
+    for entry in iterable:
+        batch.append(entry)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class UserStateStore:
+    """Last fetch time of every profile, kept in SQLite across runs"""
+
+    def __init__(self, path, commit_every=500, clock=time.time):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every
+        self.clock = clock
+        self.uncommitted = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, user_id TEXT, fetched_at REAL)'
+        )
+
+    def fresh(self, usernames, max_age):
+        """The usernames fetched less than max_age seconds ago, in one query"""
+        if not usernames or max_age <= 0:
+            return set()
+        placeholders = ','.join('?' * len(usernames))
+        rows = self.db.execute(
+            f'SELECT username FROM users WHERE fetched_at >= ? AND username IN ({placeholders})',
+            [self.clock() - max_age, *usernames]
+        )
+        return {username for username, in rows}
+
+    def mark(self, username, user_id=None):
+        """Record a profile as fetched now; committed every commit_every marks"""
+        self.db.execute(
+            'INSERT OR REPLACE INTO users (username, user_id, fetched_at) VALUES (?, ?, ?)',
+            (username, user_id, self.clock())
+        )
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def close(self):
+        self.commit()
+        self.db.close()
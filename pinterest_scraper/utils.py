@@ -0,0 +1,148 @@
+# Small helpers shared across the project
+#
+# Also the extraction core used by the spiders and pipelines: number parsing
+# for counts like "1.2k" (memoized, since the same strings recur on every
+# page), pin/board/user ID extraction and hashtag/domain patterns, all
+# compiled once at import.
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import scrapy
+from scrapy.utils.defer import maybe_deferred_to_future
+
+
+async def sleep(seconds):
+    """Reactor-agnostic asynchronous sleep"""
+    from twisted.internet import reactor, task
+    await maybe_deferred_to_future(task.deferLater(reactor, seconds, lambda: None))
+
+
+def json_safe(meta):
+    """Keep the meta entries that survive a JSON round trip"""
+    safe = {}
+    for key, value in meta.items():
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        safe[key] = value
+    return safe
+
+
+def request_key(request, crawler):
+    """Dedupe key of a request: the Pinterest page it fetches, whatever the proxy tier"""
+    page_url = request.meta.get('fetch_url')
+    if page_url:
+        return hashlib.sha1(page_url.encode('utf-8')).hexdigest()
+    return crawler.request_fingerprinter.fingerprint(request).hex()
+
+
+def request_to_record(request):
+    """JSON-serializable record of a GET request to a spider callback"""
+    return {
+        'url': request.url,
+        'callback': getattr(request.callback, '__name__', None),
+        'errback': getattr(request.errback, '__name__', None),
+        'meta': json_safe(request.meta),
+        'priority': request.priority,
+        'dont_filter': request.dont_filter,
+    }
+
+
+def request_from_record(record, spider, **kwargs):
+    """Rebuild a request from request_to_record() output"""
+    options = {
+        'callback': getattr(spider, record['callback']) if record.get('callback') else None,
+        'errback': getattr(spider, record['errback']) if record.get('errback') else None,
+        'meta': record.get('meta', {}),
+        'priority': record.get('priority', 0),
+        'dont_filter': record.get('dont_filter', False),
+    }
+    options.update(kwargs)
+    return scrapy.Request(record['url'], **options)
+
+
+# First number of a count, with an optional K/M/B suffix: "1.2k", "3,400 saves"
+COUNT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([kmb])?(?![a-z])', re.IGNORECASE)
+COUNT_SUFFIXES = {'k': 1000, 'm': 1000000, 'b': 1000000000}
+PIN_ID_RE = re.compile(r'/pin/(\d+)/')
+HASHTAG_RE = re.compile(r'#(\w+)')
+DOMAIN_RE = re.compile(r'https?://([^/]+)')
+PRICE_RE = re.compile(r'\$[\d,]+\.?\d*')
+# Pin paths and quoted /username/board-name/ paths in page scripts
+PIN_PATH_RE = re.compile(r'/pin/\d+/')
+QUOTED_PATH_RE = re.compile(r'["\'](/[^"\']+/[^"\']+/)["\']')
+
+
+@lru_cache(maxsize=4096)
+def parse_count(text):
+    """Parse the count in a text: "1.2k" -> 1200, "3,400 saves" -> 3400, "N/A" -> 0"""
+    match = COUNT_RE.search(text.replace(',', ''))
+    if match is None:
+        return 0
+    number, suffix = match.groups()
+    if suffix:
+        return int(float(number) * COUNT_SUFFIXES[suffix.lower()])
+    return int(float(number))
+
+
+def parse_number(value):
+    """Number of a scraped count; numbers pass through, anything unparsable is 0"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if not value:
+        return 0
+    return parse_count(str(value).strip())
+
+
+def parse_numbers(values):
+    """parse_number() over a list of counts"""
+    parse = parse_number
+    return [parse(value) for value in values]
+
+
+def extract_pin_id(pin_url):
+    """Pin ID of a /pin/<id>/ URL, or ''"""
+    match = PIN_ID_RE.search(pin_url)
+    return match.group(1) if match else ""
+
+
+def extract_board_id(board_url):
+    """'username/board-name' of a board URL (with or without /board/), or ''"""
+    parts = [part for part in urlparse(board_url).path.split('/') if part]
+    if parts and parts[0] == 'board':
+        parts = parts[1:]
+    return '/'.join(parts[-2:]) if len(parts) >= 2 else ""
+
+
+def extract_username(profile_url):
+    """Last path segment of a profile URL, or ''"""
+    parts = [part for part in urlparse(profile_url).path.split('/') if part]
+    return parts[-1] if parts else ""
+
+
+def extract_result_id(result_url, search_type):
+    """ID of a search result: pin ID, board path or username"""
+    if search_type == "pins":
+        return extract_pin_id(result_url)
+    if search_type == "boards":
+        return extract_board_id(result_url)
+    return extract_username(result_url)
+
+
+def extract_hashtags(text):
+    return HASHTAG_RE.findall(text)
+
+
+def extract_domain(url):
+    match = DOMAIN_RE.search(url)
+    return match.group(1) if match else ""
+
+
+def extract_price(text):
+    match = PRICE_RE.search(text)
+    return match.group(0) if match else ""
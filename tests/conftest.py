@@ -0,0 +1,23 @@
+import os
+
+import pytest
+from scrapy.http import HtmlResponse, Request
+
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+
+
+def saved_page(name, url='https://www.pinterest.com/', meta=None):
+    """HtmlResponse of a saved page under tests/fixtures/pages"""
+    with open(os.path.join(PAGES_DIR, name), 'rb') as file:
+        body = file.read()
+    return HtmlResponse(url=url, body=body, encoding='utf-8', request=Request(url, meta=meta or {}))
+
+
+def saved_page_names():
+    return sorted(name for name in os.listdir(PAGES_DIR) if name.endswith('.html'))
+
+
+@pytest.fixture
+def page():
+    return saved_page
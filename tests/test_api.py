@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Two crawls of a local page (DNS lookups go through the reactor's thread
+# pool), the second one abandoned after its first item
+SCRIPT = textwrap.dedent('''
+    import asyncio
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    import scrapy
+
+    from pinterest_scraper.api import crawl
+
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.end_headers()
+            self.wfile.write(b'<a href="/a">a</a><a href="/b">b</a>')
+
+        def log_message(self, *args):
+            pass
+
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+    class LocalSpider(scrapy.Spider):
+        name = 'local'
+        start_urls = ['http://localhost:%d/' % server.server_address[1]]
+
+        def parse(self, response):
+            for href in response.css('a::attr(href)').getall():
+                yield {'href': href}
+
+
+    SETTINGS = {'LOG_LEVEL': 'ERROR', 'ROBOTSTXT_OBEY': False, 'DOWNLOAD_DELAY': 0}
+
+
+    async def main():
+        print([item['href'] async for item in crawl(LocalSpider, settings=SETTINGS)])
+        items = crawl(LocalSpider, settings=SETTINGS)
+        async for item in items:
+            print(item['href'])
+            break
+        await items.aclose()
+
+    asyncio.run(main())
+''')
+
+
+def test_process_exits_after_crawls():
+    result = subprocess.run(
+        [sys.executable, '-c', SCRIPT],
+        cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["['/a',", "'/b']", '/a']
+
+
+def test_spiders_are_found_outside_the_project(tmp_path):
+    script = (
+        'from scrapy.spiderloader import SpiderLoader\n'
+        'from pinterest_scraper.api import project_settings\n'
+        'print(sorted(SpiderLoader.from_settings(project_settings()).list()))\n'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=str(tmp_path),
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert 'pinterest_pins' in result.stdout
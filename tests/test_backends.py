@@ -0,0 +1,180 @@
+import socketserver
+import threading
+import time
+
+import pytest
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.backends import RESERVE_SCRIPT, BackendError, RespBackend, SharedScheduler
+from pinterest_scraper.spiders.pinterest_search import PinterestSearchSpider
+
+
+class FakeRedis:
+    """The few Redis commands RespBackend uses, with RESERVE_SCRIPT done in Python"""
+
+    def __init__(self):
+        self.sets = {}
+        self.zsets = {}
+        self.lock = threading.Lock()
+
+    def execute(self, name, *args):
+        with self.lock:
+            return getattr(self, name.lower())(*args)
+
+    def select(self, db):
+        return 'OK'
+
+    def sadd(self, key, *members):
+        current = self.sets.setdefault(key, set())
+        added = len(set(members) - current)
+        current.update(members)
+        return added
+
+    def zadd(self, key, *pairs):
+        zset = self.zsets.setdefault(key, {})
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def zrem(self, key, *members):
+        zset = self.zsets.get(key, {})
+        return sum(zset.pop(member, None) is not None for member in members)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def delete(self, *keys):
+        return sum(self.sets.pop(key, None) is not None or self.zsets.pop(key, None) is not None for key in keys)
+
+    def eval(self, script, numkeys, queue, reserved, timeout):
+        assert script == RESERVE_SCRIPT
+        now = time.time()
+        pending, held = self.zsets.setdefault(queue, {}), self.zsets.setdefault(reserved, {})
+        for receipt in [receipt for receipt, deadline in held.items() if deadline <= now]:
+            score, member = receipt.split('|', 1)
+            pending[member] = float(score)
+            del held[receipt]
+        if not pending:
+            return None
+        member = min(pending, key=lambda member: (pending[member], member))
+        receipt = f'{pending.pop(member):g}|{member}'
+        held[receipt] = now + float(timeout)
+        return receipt
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode('utf-8'))
+            name = 'delete' if args[0] == 'DEL' else args[0]
+            try:
+                reply = encode(self.server.redis.execute(name, *args[1:]))
+            except AttributeError:
+                reply = b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+
+
+def encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if reply == 'OK':
+        return b'+OK\r\n'
+    data = reply.encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+@pytest.fixture
+def server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), RespHandler)
+    server.daemon_threads = True
+    server.redis = FakeRedis()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class CountingSocket:
+    """Counts the writes (one per pipelined round trip) of a socket"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.writes = 0
+
+    def sendall(self, data):
+        self.writes += 1
+        return self.sock.sendall(data)
+
+    def close(self):
+        self.sock.close()
+
+
+def open_scheduler(server, **settings):
+    url = 'redis://%s:%d/1' % server.server_address
+    crawler = get_crawler(PinterestSearchSpider, dict({'QUEUE_BACKEND': url}, **settings))
+    spider = PinterestSearchSpider.from_crawler(crawler)
+    crawler.spider = spider
+    scheduler = SharedScheduler.from_crawler(crawler)
+    scheduler.open(spider)
+    scheduler.backend.sock = CountingSocket(scheduler.backend.sock)
+    return spider, scheduler
+
+
+def pin_request(spider, pin_id, priority=0):
+    [request] = spider.fetch(f'https://www.pinterest.com/pin/{pin_id}/', spider.parse_search_results)
+    return request.replace(priority=priority)
+
+
+def test_enqueue_is_batched_and_deduplicated(server):
+    spider, scheduler = open_scheduler(server)
+    for pin_id in [1, 2, 3, 2, 4]:
+        assert scheduler.enqueue_request(pin_request(spider, pin_id, priority=pin_id))
+    assert scheduler.backend.sock.writes == 0  # nothing sent yet
+
+    request = scheduler.next_request()
+    # SADD x5 in one write, one ZADD for the four new requests, the reservation
+    assert scheduler.backend.sock.writes == 3
+    assert request.meta['fetch_url'] == 'https://www.pinterest.com/pin/4/'
+    assert spider.crawler.stats.get_value('scheduler/dupefiltered') == 1
+    assert len(scheduler) == 4  # three queued and one reserved
+
+
+def test_equal_priorities_stay_fifo(server):
+    spider, scheduler = open_scheduler(server)
+    for pin_id in [5, 3, 9]:
+        scheduler.enqueue_request(pin_request(spider, pin_id))
+    fetched = [scheduler.next_request().meta['fetch_url'] for _ in range(3)]
+    assert fetched == [f'https://www.pinterest.com/pin/{pin_id}/' for pin_id in [5, 3, 9]]
+
+
+def test_unacknowledged_request_is_delivered_again(server):
+    spider, scheduler = open_scheduler(server, QUEUE_VISIBILITY_TIMEOUT=0)
+    scheduler.enqueue_request(pin_request(spider, 1))
+    first = scheduler.next_request()  # this host dies with the request in hand
+    assert first is not None
+
+    _, other_host = open_scheduler(server, QUEUE_VISIBILITY_TIMEOUT=60)
+    again = other_host.next_request()
+    assert again.meta['fetch_url'] == first.meta['fetch_url']
+
+    other_host.finished(again)  # downloaded: acknowledged with the next reservation
+    assert other_host.next_request() is None
+    assert len(other_host) == 0
+
+
+def test_pipeline_error_keeps_the_connection_in_sync(server):
+    backend = RespBackend(*server.server_address)
+    with pytest.raises(BackendError):
+        backend.pipeline([('SADD', 's', 'a'), ('NOPE',), ('SADD', 's', 'b')])
+    assert backend.add_many('s', ['a', 'c']) == [False, True]
+    backend.close()
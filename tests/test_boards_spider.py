@@ -0,0 +1,70 @@
+import json
+
+from scrapy.http import Request, TextResponse
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.items import PinterestBoardItem, PinterestPinItem
+from pinterest_scraper.spiders.pinterest_boards import PinterestBoardsSpider
+
+
+BOARD_URL = 'https://www.pinterest.com/jane/kitchens/'
+
+
+def boards_spider(settings=None, **kwargs):
+    crawler = get_crawler(PinterestBoardsSpider, settings)
+    spider = PinterestBoardsSpider.from_crawler(crawler, expand_pins=True, **kwargs)
+    crawler.spider = spider
+    return spider
+
+
+def respond(request, data, bookmark=None):
+    body = json.dumps({'resource_response': {'data': data, 'bookmark': bookmark}})
+    return TextResponse(request.url, body=body, encoding='utf-8', request=request)
+
+
+def pins(*ids):
+    return [{'id': pin_id, 'images': {'orig': {'url': f'https://i.pinimg.com/{pin_id}.jpg'}}} for pin_id in ids]
+
+
+def board_request(spider):
+    [request] = spider.request_entity(
+        'board:jane/kitchens', BOARD_URL, spider.parse_board_resource, {'board_url': BOARD_URL}
+    )
+    return request
+
+
+def test_board_record_then_feed_pages():
+    spider = boards_spider()
+    request = board_request(spider)
+    assert 'BoardResource' in request.meta['fetch_url']
+
+    [feed] = spider.parse_board_resource(respond(request, {'id': '42', 'name': 'Kitchens'}))
+    assert 'BoardFeedResource' in feed.meta['fetch_url']
+
+    # First page: its pins, then the next page by bookmark
+    output = list(spider.parse_board_feed(respond(feed, pins('1', '2'), bookmark='next')))
+    assert [item['pin_id'] for item in output if isinstance(item, PinterestPinItem)] == ['1', '2']
+    [next_page] = [request for request in output if isinstance(request, Request)]
+    assert 'next' in next_page.meta['fetch_url']
+
+    # Last page: its pins, then the board with the pins counted
+    output = list(spider.parse_board_feed(respond(next_page, pins('3'), bookmark='-end-')))
+    assert [item['pin_id'] for item in output if isinstance(item, PinterestPinItem)] == ['3']
+    [board] = [item for item in output if isinstance(item, PinterestBoardItem)]
+    assert board['board_id'] == '42' and board['pin_count'] == 3
+    assert board['recent_pins'] == [f'https://www.pinterest.com/pin/{pin_id}/' for pin_id in '123']
+    assert spider.boards_scraped == 1
+
+
+def test_board_finishes_when_the_next_page_is_over_budget():
+    spider = boards_spider({'FETCH_CREDIT_BUDGET': 2})
+    request = board_request(spider)
+    [feed] = spider.parse_board_resource(respond(request, {'id': '42'}))
+
+    # No credits left for the bookmark page: the board is emitted with its pins so far
+    output = list(spider.parse_board_feed(respond(feed, pins('1'), bookmark='next')))
+    assert not [request for request in output if isinstance(request, Request)]
+    [board] = [item for item in output if isinstance(item, PinterestBoardItem)]
+    assert board['pin_count'] == 1
+    assert spider.boards_scraped == 1
+    assert spider.registry.in_flight_count() == 0
@@ -0,0 +1,73 @@
+import pytest
+from scrapy.exceptions import IgnoreRequest, NotConfigured, StopDownload
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from pinterest_scraper.middlewares import BudgetCancellationMiddleware
+from pinterest_scraper.spiders.pinterest_search import PinterestSearchSpider
+
+
+def open_crawl(settings=None, **kwargs):
+    crawler = get_crawler(PinterestSearchSpider, settings)
+    spider = PinterestSearchSpider.from_crawler(crawler, max_results=2, **kwargs)
+    crawler.spider = spider
+    return spider, BudgetCancellationMiddleware.from_crawler(crawler)
+
+
+def search_request(spider, **meta):
+    [request] = spider.fetch(
+        'https://www.pinterest.com/search/pins/?q=decor', spider.parse_search_results,
+        meta=dict(search_query='decor', **meta)
+    )
+    return request
+
+
+def test_requests_go_through_under_budget():
+    spider, middleware = open_crawl()
+    request = search_request(spider)
+    assert middleware.process_request(request) is None
+    middleware.response_started({}, 0, request, spider)  # no StopDownload
+
+
+def test_queued_request_is_dropped_once_the_budget_is_met():
+    spider, middleware = open_crawl()
+    request = search_request(spider)
+    spider.results_scraped = 2
+    with pytest.raises(IgnoreRequest):
+        middleware.process_request(request)
+    stats = spider.crawler.stats
+    assert stats.get_value('budget/requests_dropped') == 1
+    assert stats.get_value('budget/requests_avoided') == 1
+
+
+def test_download_in_flight_is_aborted_once_the_budget_is_met():
+    spider, middleware = open_crawl()
+    request = search_request(spider)
+    assert middleware.process_request(request) is None
+    spider.results_scraped = 2
+    with pytest.raises(StopDownload) as stopped:
+        middleware.response_started({}, 0, request, spider)
+    assert stopped.value.fail
+    assert spider.crawler.stats.get_value('budget/downloads_aborted') == 1
+
+    # The errback sees the abort as a cancellation, not an error
+    failure = Failure(stopped.value)
+    failure.request = request
+    assert spider.cancelled(failure)
+
+
+def test_per_query_budget_and_exempt_requests():
+    spider, middleware = open_crawl()
+    spider.query_progress['decor'] = 5
+    with pytest.raises(IgnoreRequest):
+        middleware.process_request(search_request(spider, query_budget=5))
+    assert middleware.process_request(search_request(spider, query_budget=6)) is None
+
+    spider.results_scraped = 2
+    assert middleware.process_request(search_request(spider, budget_exempt=True)) is None
+
+
+def test_can_be_turned_off():
+    crawler = get_crawler(PinterestSearchSpider, {'BUDGET_CANCELLATION_ENABLED': False})
+    with pytest.raises(NotConfigured):
+        BudgetCancellationMiddleware.from_crawler(crawler)
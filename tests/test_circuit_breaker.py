@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from scrapy import Spider
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest
+from scrapy.http import Request
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.middlewares import CircuitBreakerRetryMiddleware, RequestHeld
+
+
+class FakeEngine:
+    def __init__(self):
+        self.crawled = []
+
+    def crawl(self, request):
+        self.crawled.append(request)
+
+
+@pytest.fixture
+def middleware():
+    crawler = get_crawler(Spider, {'BREAKER_FAILURE_THRESHOLD': 1, 'BREAKER_MAX_HOLD': 60})
+    crawler.spider = Spider('breaker')
+    crawler.engine = FakeEngine()
+    middleware = CircuitBreakerRetryMiddleware.from_crawler(crawler)
+    yield middleware
+    middleware.spider_closed(crawler.spider)
+
+
+def proxy_request(page='pin/1'):
+    url = f'https://www.pinterest.com/{page}/'
+    return Request('https://proxy.example/?url=' + url, meta={'fetch_url': url})
+
+
+def test_open_breaker_frees_the_slot(middleware):
+    request = proxy_request()
+    endpoint, breaker = middleware.breaker_for(request)
+    middleware.record_failure(endpoint, breaker)
+
+    started = time.monotonic()
+    with pytest.raises(RequestHeld):
+        middleware.process_request(request)
+    assert time.monotonic() - started < 0.5  # raised at once, nothing slept
+    assert middleware.process_request(proxy_request('search/pins')) is None  # other endpoints go on
+
+    with pytest.raises(DontCloseSpider):
+        middleware.spider_idle(middleware.crawler.spider)
+    [call] = middleware.held
+    call.cancel()
+    middleware.release(request)
+    [rescheduled] = middleware.crawler.engine.crawled
+    assert rescheduled.dont_filter and rescheduled.meta['breaker_held_since']
+    middleware.spider_idle(middleware.crawler.spider)  # nothing held any more
+
+
+def test_backoff_is_served_from_the_scheduler(middleware):
+    request = proxy_request()
+    request.meta['retry_not_before'] = time.time() + 30
+    with pytest.raises(RequestHeld):
+        middleware.process_request(request)
+    request.meta['retry_not_before'] = time.time() - 1
+    assert middleware.process_request(request) is None
+
+
+def test_request_held_too_long_is_dropped(middleware):
+    request = proxy_request()
+    endpoint, breaker = middleware.breaker_for(request)
+    middleware.record_failure(endpoint, breaker)
+    request.meta['breaker_held_since'] = time.time() - 61
+    with pytest.raises(IgnoreRequest) as raised:
+        middleware.process_request(request)
+    assert not isinstance(raised.value, RequestHeld)
+    assert middleware.crawler.stats.get_value('breaker/requests_dropped') == 1
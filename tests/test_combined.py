@@ -0,0 +1,86 @@
+import os
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from conftest import PAGES_DIR
+from pinterest_scraper.items import PinterestPinItem
+
+from pinterest_scraper.spiders.pinterest_combined import PinterestCombinedSpider
+
+
+URL = 'https://www.pinterest.com/pin/1/'
+
+
+def open_crawl():
+    crawler = get_crawler(PinterestCombinedSpider, {'COMBINED_RESPONSE_CACHE_SIZE': 2})
+    spider = PinterestCombinedSpider.from_crawler(crawler, consumers='pins,search')
+    crawler.spider = spider
+    return spider
+
+
+def recorder(consumer, seen):
+    def parse_page(response):
+        seen.append((consumer.consumer_name, dict(response.meta)))
+        return ()
+    consumer.parse_page = parse_page
+    return parse_page
+
+
+def respond(request, body=b'<html></html>'):
+    return HtmlResponse(request.url, body=body, request=request)
+
+
+def test_consumers_get_their_own_meta():
+    spider = open_crawl()
+    seen = []
+    pins, search = spider.consumers['pins'], spider.consumers['search']
+    [request] = pins.fetch(URL, recorder(pins, seen), meta={'depth': 1})
+    assert list(search.fetch(URL, recorder(search, seen), meta={'query': 'decor'})) == []  # shared
+
+    response = respond(request)
+    list(spider.route(response))
+    assert seen[0][0] == 'pins' and seen[0][1]['depth'] == 1 and 'query' not in seen[0][1]
+    assert seen[1][0] == 'search' and seen[1][1]['query'] == 'decor' and 'depth' not in seen[1][1]
+    assert 'query' not in response.meta  # the shared response is left alone
+
+
+def test_recent_page_is_served_from_cache():
+    spider = open_crawl()
+    seen = []
+    pins, search = spider.consumers['pins'], spider.consumers['search']
+    [request] = pins.fetch(URL, recorder(pins, seen))
+    list(spider.route(respond(request)))
+
+    # Asked for after the fetch finished: no second request
+    assert list(search.fetch(URL, recorder(search, seen), meta={'query': 'decor'})) == []
+    assert [name for name, _ in seen] == ['pins', 'search']
+    assert seen[1][1]['query'] == 'decor'
+    assert spider.crawler.stats.get_value('combined/cache_hits') == 1
+
+    # Bounded: the oldest page is evicted
+    for pin in (2, 3):
+        [other] = pins.fetch(f'https://www.pinterest.com/pin/{pin}/', pins.parse_page)
+        list(spider.route(respond(other)))
+    assert URL not in spider.response_cache
+
+
+def test_escalation_emits_the_page_once():
+    spider = open_crawl()
+    seen = []
+    pins, search = spider.consumers['pins'], spider.consumers['search']
+    [request] = pins.fetch(URL, pins.parse_pin, meta={'pin_url': URL})
+    list(search.fetch(URL, recorder(search, seen)))
+
+    # The pin came back empty: no degraded item, one retry for the pins consumer only
+    [escalation] = list(spider.route(respond(request)))
+    assert isinstance(escalation, Request)
+    assert escalation.meta['fetch_tier'] == 1
+    assert [entry['consumer'] for entry in escalation.meta['route']] == ['pins']
+    assert [name for name, _ in seen] == ['search']
+    assert URL not in spider.response_cache
+
+    with open(os.path.join(PAGES_DIR, 'pin.html'), 'rb') as file:
+        output = list(spider.route(respond(escalation, file.read())))
+    assert len([item for item in output if isinstance(item, PinterestPinItem)]) == 1
+    assert [name for name, _ in seen] == ['search']
@@ -0,0 +1,62 @@
+import json
+from io import BytesIO
+
+import pytest
+from scrapy.settings import Settings
+from twisted.web.test.requesthelper import DummyRequest
+
+from pinterest_scraper.daemon import CrawlDaemon, build_site, parse_every, parse_job
+
+
+def post_job(payload):
+    """Status code and JSON reply of POST /jobs, without starting the crawl"""
+    daemon = CrawlDaemon(Settings({'SPIDER_MODULES': ['pinterest_scraper.spiders']}))
+    daemon.run = lambda job: None
+    request = DummyRequest([b''])
+    request.method = b'POST'
+    request.content = BytesIO(payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8'))
+    jobs = build_site(daemon).resource.children[b'jobs']
+    body = jobs.render(request)
+    return request.responseCode, json.loads(body), daemon
+
+
+def test_job_body_is_parsed():
+    body = json.dumps({'spider': 'pinterest_search', 'args': {'search_query': 'decor'}, 'every': '900'})
+    assert parse_job(body) == {
+        'spider': 'pinterest_search', 'args': {'search_query': 'decor'}, 'settings': None, 'every': '900',
+    }
+
+
+@pytest.mark.parametrize('body', [b'not json', b'[]', b'{}', b'{"spider": "x", "args": "a=1"}'])
+def test_malformed_job_body_is_refused(body):
+    with pytest.raises(ValueError):
+        parse_job(body)
+
+
+@pytest.mark.parametrize('every, seconds', [(None, None), (900, 900.0), ('90.5', 90.5)])
+def test_every_is_seconds(every, seconds):
+    assert parse_every(every) == seconds
+
+
+@pytest.mark.parametrize('every', ['15m', '', 0, -5, 'nan', 'inf', [900]])
+def test_bad_every_is_refused(every):
+    with pytest.raises(ValueError):
+        parse_every(every)
+
+
+def test_submitted_job_is_created():
+    code, reply, daemon = post_job({'spider': 'pinterest_search', 'every': '900'})
+    assert code == 201
+    assert reply['every'] == 900.0 and reply['state'] == 'scheduled'
+    assert list(daemon.jobs) == [reply['id']]
+
+
+@pytest.mark.parametrize('payload', [
+    {'spider': 'pinterest_search', 'every': '15m'},
+    {'spider': 'no_such_spider'},
+    b'{',
+])
+def test_bad_job_is_a_400(payload):
+    code, reply, daemon = post_job(payload)
+    assert code == 400 and 'error' in reply
+    assert daemon.jobs == {}
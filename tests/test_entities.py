@@ -0,0 +1,30 @@
+from itemadapter import ItemAdapter
+
+from pinterest_scraper.entities import EntityCache
+from pinterest_scraper.items import PinterestPinItem, PinterestUserItem
+from pinterest_scraper.pipelines import DuplicateFilterPipeline
+from pinterest_scraper.resources import user_item
+
+
+def test_users_from_pin_pages_share_the_profile_key():
+    cache = EntityCache()
+    cache.add_pin(PinterestPinItem(
+        pin_url='https://www.pinterest.com/pin/1/',
+        board_url='https://www.pinterest.com/Jane/Kitchen/',
+        pinner_url='https://www.pinterest.com/Jane/',
+        pinner_name='Jane Doe',
+    ))
+    records = {type(item).__name__: item for item in cache.flush()}
+    assert records['PinterestBoardItem']['board_id'] == 'jane/kitchen'
+
+    seen = records['PinterestUserItem']
+    assert seen['username'] == 'jane' and not seen.get('user_id')
+    fetched = user_item({'id': 12345, 'username': 'Jane'})
+    assert fetched['user_id'] == '12345'
+
+    pipeline = DuplicateFilterPipeline()
+    keys = {
+        pipeline.get_unique_identifier(ItemAdapter(item), PinterestUserItem.__name__)
+        for item in (seen, fetched)
+    }
+    assert keys == {'user:jane'}
@@ -0,0 +1,135 @@
+import pytest
+from scrapy.http import HtmlResponse
+
+from pinterest_scraper.fetch import Deadline, FetchStrategy, LatencyTracker, RenderWaitTuner
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+PIN = 'https://www.pinterest.com/pin/1/'
+
+
+def respond(request):
+    return HtmlResponse(request.url, body=b'<html></html>', request=request)
+
+
+def test_latency_quantile_needs_enough_samples():
+    tracker = LatencyTracker(window=100, min_samples=5)
+    for seconds in (1, 2, 3, 4):
+        tracker.observe('pin', seconds)
+    assert tracker.quantile('pin', 0.95) is None
+    assert tracker.mean('pin') == 2.5
+    tracker.observe('pin', 10)
+    assert tracker.quantile('pin', 0.5) == 3
+    assert tracker.quantile('pin', 0.95) == 10
+    assert tracker.quantile('board', 0.5) is None and tracker.mean('board') is None
+
+
+def test_latency_window_forgets_old_samples():
+    tracker = LatencyTracker(window=3, min_samples=1)
+    for seconds in (100, 1, 1, 1):
+        tracker.observe('pin', seconds)
+    assert tracker.mean('pin') == 1
+    assert tracker.quantile('pin', 1.0) == 1
+
+
+@pytest.mark.parametrize('value, seconds', [('900', 900), (90, 90), ('45m', 2700), ('2h', 7200), (' 1.5 H ', 5400)])
+def test_deadline_durations(value, seconds):
+    assert Deadline.parse(value).seconds == seconds
+
+
+@pytest.mark.parametrize('value', ['', '15 minutes', '-5', '1d', 'h'])
+def test_bad_deadline_is_refused(value):
+    with pytest.raises(ValueError):
+        Deadline.parse(value)
+
+
+def test_deadline_allows_work_that_fits():
+    clock = Clock()
+    deadline = Deadline(60, clock=clock)
+    assert deadline.allows(60)
+    clock.now = 50
+    assert deadline.remaining() == 10
+    assert deadline.allows(10) and not deadline.allows(11)
+    clock.now = 70
+    assert deadline.remaining() == 0
+
+
+def test_short_deadline_picks_a_faster_tier():
+    clock = Clock()
+    strategy = FetchStrategy('key')
+    strategy.learned_tiers['pin'] = 2
+    strategy.deadline = Deadline(100, clock=clock)
+    assert strategy.request(PIN, None).meta['fetch_tier'] == 2
+
+    clock.now = 96  # 4 seconds left: only the plain tier (2s prior) can finish
+    assert strategy.request(PIN, None).meta['fetch_tier'] == 0
+    assert strategy.learned_tiers['pin'] == 2  # what worked is still remembered
+
+
+def test_learned_latency_replaces_the_prior():
+    strategy = FetchStrategy('key')
+    assert strategy.expected_latency('pin', 0) == 2.0
+    assert strategy.expected_latency('pin', 1) == 5.0  # plus the render wait
+    strategy.latency.observe('pin/1', 8.0)
+    assert strategy.expected_latency('pin', 1) == 8.0
+
+
+def test_no_escalation_that_cannot_finish():
+    clock = Clock()
+    strategy = FetchStrategy('key')
+    strategy.deadline = Deadline(3, clock=clock)
+    request = strategy.request(PIN, None)
+    assert strategy.escalate(respond(request)) is None  # the rendering tier needs 5s
+    assert strategy.credits_spent == 1
+
+
+def test_render_wait_doubles_on_failure_up_to_the_maximum():
+    tuner = RenderWaitTuner(initial=1000, maximum=5000)
+    assert tuner.wait_for('pin') == 1000
+    assert tuner.record_failure('pin', 1000)
+    assert tuner.wait_for('pin') == 2000
+    assert tuner.record_failure('pin', 2000) and tuner.record_failure('pin', 4000)
+    assert tuner.wait_for('pin') == 5000
+    assert not tuner.record_failure('pin', 5000)  # nothing longer to try
+    assert tuner.wait_for('board') == 1000  # learned per page type
+
+
+def test_stale_failure_does_not_double_twice():
+    tuner = RenderWaitTuner(initial=1000)
+    tuner.record_failure('pin', 1000)
+    assert tuner.record_failure('pin', 1000)  # sent before the wait grew
+    assert tuner.wait_for('pin') == 2000
+
+
+def test_render_wait_settles_after_a_run_of_successes():
+    tuner = RenderWaitTuner(initial=1000, settle=3)
+    tuner.record_failure('pin', 1000)
+    tuner.record_failure('pin', 2000)
+    for _ in range(3):
+        tuner.record_success('pin', 4000)
+    assert tuner.wait_for('pin') == 3600
+    for _ in range(100):
+        tuner.record_success('pin', tuner.wait_for('pin'))
+    assert tuner.wait_for('pin') == 1000  # never below the initial wait
+
+
+def test_incomplete_render_is_retried_once_with_a_longer_wait():
+    strategy = FetchStrategy('key', wait_tuner=RenderWaitTuner(initial=1000))
+    strategy.learned_tiers['pin'] = 1
+    request = strategy.request(PIN, None)
+    assert request.meta['render_wait'] == 1000 and 'wait=1000' in request.url
+
+    retry = strategy.escalate(respond(request))
+    assert retry.meta['fetch_tier'] == 1 and retry.meta['render_wait'] == 2000
+    # Still incomplete with the longer wait: on to the next tier
+    assert strategy.escalate(respond(retry)).meta['fetch_tier'] == 2
+
+    strategy.succeeded(respond(retry))
+    assert strategy.wait_tuner.streaks['pin'] == 1
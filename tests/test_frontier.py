@@ -0,0 +1,81 @@
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.frontier import CrawlFrontier, FrontierSpiderMiddleware
+from pinterest_scraper.spiders.pinterest_search import PinterestSearchSpider
+
+
+def open_crawl(directory):
+    crawler = get_crawler(PinterestSearchSpider, {'FRONTIER_DIR': str(directory)})
+    spider = PinterestSearchSpider.from_crawler(crawler, max_results=10)
+    crawler.spider = spider
+    frontier = CrawlFrontier.from_crawler(crawler)
+    frontier.spider_opened(spider)
+    return spider, frontier, FrontierSpiderMiddleware.from_crawler(crawler)
+
+
+def schedule(spider, url):
+    [request] = spider.fetch(url, spider.parse_search_results)
+    spider.frontier.request_scheduled(request, spider)
+    return request
+
+
+def run_callback(middleware, request, output=()):
+    response = HtmlResponse(request.url, body=b'<html></html>', request=request)
+    return list(middleware.process_spider_output(response, iter(output), request))
+
+
+def test_resume_reissues_only_unfinished_requests(tmp_path):
+    spider, frontier, middleware = open_crawl(tmp_path)
+    done = schedule(spider, 'https://www.pinterest.com/pin/1/')
+    schedule(spider, 'https://www.pinterest.com/pin/2/')
+    escalated = schedule(spider, 'https://www.pinterest.com/pin/3/')
+
+    run_callback(middleware, done)
+    spider.results_scraped = 1
+    retry = spider.fetch_strategy.escalate(HtmlResponse(escalated.url, body=b'', request=escalated))
+    run_callback(middleware, escalated, [retry])  # the page is fetched again on tier 1
+    frontier.request_scheduled(retry, spider)
+    frontier.save_progress()
+    frontier.file.flush()  # the process dies here: no spider_closed, pin 2 never answered
+
+    spider, frontier, _ = open_crawl(tmp_path)
+    assert spider.results_scraped == 1
+    resumed = {request.meta['fetch_url']: request for request in frontier.pending_requests(spider)}
+    assert sorted(resumed) == ['https://www.pinterest.com/pin/2/', 'https://www.pinterest.com/pin/3/']
+    assert resumed['https://www.pinterest.com/pin/3/'].meta['fetch_tier'] == 1
+
+    # Completed pages are skipped before they are scheduled, so nothing leaks
+    assert list(spider.fetch('https://www.pinterest.com/pin/1/', spider.parse_search_results)) == []
+    assert spider.crawler.stats.get_value('frontier/skipped_completed') == 1
+    assert spider.pending_requests == 0
+
+
+def test_callback_error_leaves_request_pending(tmp_path):
+    spider, frontier, middleware = open_crawl(tmp_path)
+    request = schedule(spider, 'https://www.pinterest.com/pin/1/')
+
+    def failing():
+        yield from ()
+        raise ValueError('parse error')
+
+    response = HtmlResponse(request.url, body=b'', request=request)
+    try:
+        list(middleware.process_spider_output(response, failing(), spider))
+    except ValueError:
+        pass
+    assert not frontier.is_done(request)
+
+
+def test_compaction_keeps_state(tmp_path):
+    spider, frontier, middleware = open_crawl(tmp_path)
+    frontier.compact_every = 3
+    requests = [schedule(spider, f'https://www.pinterest.com/pin/{n}/') for n in range(5)]
+    for request in requests[:3]:
+        run_callback(middleware, request)
+    frontier.spider_closed(spider, 'finished')
+    assert spider.crawler.stats.get_value('frontier/compactions')
+
+    spider, frontier, _ = open_crawl(tmp_path)
+    assert [frontier.is_done(request) for request in requests] == [True] * 3 + [False] * 2
+    assert len(list(frontier.pending_requests(spider))) == 2
@@ -0,0 +1,50 @@
+from pinterest_scraper.graph import EdgeWriter, GraphFrontier, read_edges
+
+
+def drain(frontier):
+    entries = []
+    while True:
+        entry = frontier.pop()
+        if entry is None:
+            return entries
+        entries.append(entry)
+
+
+def test_pins_are_seen_once():
+    frontier = GraphFrontier()
+    assert frontier.see('1')
+    assert not frontier.see('1')
+    assert frontier.see('2')
+    frontier.close()
+
+
+def test_pop_order_is_depth_then_engagement():
+    frontier = GraphFrontier()
+    frontier.push('shallow-low', 0, 1)
+    frontier.push('deep', 1, 100)
+    frontier.push('shallow-high', 0, 50)
+    frontier.push('shallow-tie', 0, 1)  # FIFO among equals
+    assert drain(frontier) == [('shallow-high', 0), ('shallow-low', 0), ('shallow-tie', 0), ('deep', 1)]
+    frontier.close()
+
+
+def test_spilled_entries_keep_their_order():
+    frontier = GraphFrontier(memory_limit=4)
+    for number in range(20):
+        frontier.push(str(number), number % 3, number)
+    assert frontier.spilled and len(frontier.heap) <= 4
+    assert len(frontier) == 20
+
+    expected = sorted(((number % 3, -number), str(number)) for number in range(20))
+    assert drain(frontier) == [(pin_id, depth) for (depth, _), pin_id in expected]
+    assert len(frontier) == 0
+    frontier.close()
+
+
+def test_edges_round_trip(tmp_path):
+    path = str(tmp_path / 'edges.bin')
+    writer = EdgeWriter(path)
+    writer.write('1', '2', 0, 0)
+    writer.write(2, 3, 300, 1)  # depth is clamped to a byte
+    writer.close()
+    assert list(read_edges(path)) == [(1, 2, 0, 0), (2, 3, 255, 1)]
@@ -0,0 +1,104 @@
+import pytest
+from scrapy import Spider
+from scrapy.exceptions import StopDownload
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.fetch import FetchStrategy
+from pinterest_scraper.middlewares import HedgedRequestMiddleware, HedgeLost
+
+
+class FakeEngine:
+    def __init__(self):
+        self.crawled = []
+
+    def crawl(self, request):
+        self.crawled.append(request)
+
+
+@pytest.fixture
+def middleware():
+    crawler = get_crawler(Spider, {'HEDGED_REQUESTS_ENABLED': True, 'HEDGE_MAX_RATIO': 1.0})
+    crawler.spider = Spider('hedge')
+    crawler.engine = FakeEngine()
+    middleware = HedgedRequestMiddleware.from_crawler(crawler)
+    for _ in range(middleware.latency.min_samples):
+        middleware.latency.observe('pin', 1.0)
+    yield middleware
+    middleware.spider_closed(crawler.spider)
+
+
+def proxy_request():
+    url = 'https://www.pinterest.com/pin/123/'
+    return Request('https://proxy.example/?url=' + url, meta={'fetch_url': url})
+
+
+def response_for(request):
+    return HtmlResponse(request.url, body=b'<html></html>', request=request)
+
+
+def test_original_is_downloaded_normally(middleware):
+    request = proxy_request()
+    assert middleware.process_request(request) is None
+    assert middleware.crawler.engine.crawled == []  # no duplicate before the threshold
+    assert middleware.process_response(request, response_for(request)).request is request
+    assert middleware.races == {}
+
+
+def test_first_response_wins_and_the_other_is_dropped(middleware):
+    request = proxy_request()
+    middleware.process_request(request)
+    middleware.hedge(request)  # the threshold passed
+    [copy] = middleware.crawler.engine.crawled
+    assert copy.meta['hedge_copy'] and copy.dont_filter
+    assert middleware.process_request(copy) is None
+
+    assert middleware.process_response(copy, response_for(copy)).request is copy
+    with pytest.raises(StopDownload):
+        middleware.response_started({}, 0, request, middleware.crawler.spider)
+    with pytest.raises(HedgeLost):
+        middleware.process_exception(request, StopDownload(fail=True))
+    assert middleware.races == {}
+    assert middleware.crawler.stats.get_value('hedge/won') == 1
+
+
+def test_failure_counts_only_if_both_copies_fail(middleware):
+    request = proxy_request()
+    middleware.process_request(request)
+    middleware.hedge(request)
+    [copy] = middleware.crawler.engine.crawled
+
+    with pytest.raises(HedgeLost):
+        middleware.process_exception(request, TimeoutError())
+    assert middleware.process_exception(copy, TimeoutError()) is None  # reaches the errback
+    assert middleware.races == {}
+
+
+def with_budget(middleware, credits):
+    strategy = FetchStrategy('key', credit_budget=credits)
+    strategy.latency = middleware.latency  # keep the learned latencies
+    middleware.crawler.spider.fetch_strategy = strategy
+
+
+def test_duplicate_is_charged_to_the_credit_budget(middleware):
+    with_budget(middleware, 25)
+    request = proxy_request()
+    request.meta['fetch_tier'] = 1  # 10 credits
+    middleware.process_request(request)
+    middleware.hedge(request)
+    assert len(middleware.crawler.engine.crawled) == 1
+    assert middleware.crawler.spider.fetch_strategy.credits_spent == 10
+
+
+def test_no_duplicate_over_budget(middleware):
+    with_budget(middleware, 5)
+    request = proxy_request()
+    request.meta['fetch_tier'] = 1
+    middleware.process_request(request)
+    middleware.hedge(request)
+    assert middleware.crawler.engine.crawled == []
+    assert middleware.crawler.stats.get_value('hedge/skipped_budget') == 1
+
+    # The original still settles the race
+    middleware.process_response(request, response_for(request))
+    assert middleware.races == {}
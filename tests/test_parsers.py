@@ -0,0 +1,80 @@
+import ast
+import glob
+import os
+
+import pytest
+from scrapy.http import HtmlResponse
+
+from pinterest_scraper.parsers import LxmlBackend, compare_backends
+
+from conftest import saved_page, saved_page_names
+
+pytest.importorskip('selectolax')
+
+from pinterest_scraper.parsers import SelectolaxBackend  # noqa: E402
+
+
+SPIDERS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'pinterest_scraper', 'spiders')
+
+# Queries beyond the spiders' own, covering the pseudo-element forms
+EXTRA_QUERIES = [
+    'div ::text', '.Pin-content ::text', 'a ::attr(href)', '.meta ::text', 'img::attr(alt)', 'h3', 'a',
+]
+
+
+def spider_queries():
+    """Every CSS query with ::text / ::attr() written in the spiders"""
+    queries = set()
+    for path in glob.glob(os.path.join(SPIDERS_DIR, '*.py')):
+        with open(path, encoding='utf-8') as file:
+            tree = ast.parse(file.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                if '::text' in node.value or '::attr(' in node.value:
+                    queries.add(node.value)
+    return sorted(queries)
+
+
+@pytest.mark.parametrize('name', saved_page_names())
+def test_backends_agree_on_saved_pages(name):
+    response = saved_page(name)
+    queries = spider_queries() + EXTRA_QUERIES
+    assert compare_backends(response, queries, [LxmlBackend(), SelectolaxBackend()]) == {}
+
+
+@pytest.mark.parametrize('name', saved_page_names())
+def test_first_match_agrees(name):
+    response = saved_page(name)
+    lxml, selectolax = LxmlBackend(), SelectolaxBackend()
+    for query in spider_queries() + EXTRA_QUERIES:
+        assert selectolax.get(response, query) == lxml.get(response, query), query
+        assert selectolax.exists(response, query) == lxml.exists(response, query), query
+
+
+def test_descendant_text_includes_nested_elements():
+    response = HtmlResponse(
+        'https://www.pinterest.com/',
+        body=b'<div class="a">x<b>y<i>z</i></b>w<div class="a">q</div></div>',
+        encoding='utf-8'
+    )
+    backend = SelectolaxBackend()
+    assert backend.getall(response, '.a ::text') == ['x', 'y', 'z', 'w', 'q']
+    assert backend.getall(response, '.a::text') == ['x', 'w', 'q']
+    assert backend.get(response, 'b ::text') == 'y'
+
+
+def search_extraction(backend, response, search_type):
+    selector, results = backend.search_results(response, search_type)
+    return selector, [backend.result_fields(result) for result in results], backend.visible_results_count(response)
+
+
+@pytest.mark.parametrize('name', ['search_pins.html', 'search_boards.html'])
+@pytest.mark.parametrize('search_type', ['pins', 'boards', 'users'])
+def test_backends_agree_on_search_results(name, search_type):
+    response = saved_page(name, url='https://www.pinterest.com/search/pins/?q=home+decor')
+    lxml = search_extraction(LxmlBackend(), response, search_type)
+    assert search_extraction(SelectolaxBackend(), response, search_type) == lxml
+
+
+def test_spider_queries_found():
+    assert 'h1::text' in spider_queries()
@@ -0,0 +1,98 @@
+import pytest
+import scrapy.pqueues
+from scrapy import Request
+from scrapy.squeues import FifoMemoryQueue, PickleFifoDiskQueue
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.pqueues import FairQueryPriorityQueue, path_safe
+
+
+def fair_queue(settings=None, queue_cls=FifoMemoryQueue, key='', startprios=None):
+    return FairQueryPriorityQueue.from_crawler(get_crawler(settings_dict=settings), queue_cls, key, startprios)
+
+
+def pin(query, number, **meta):
+    return Request(f'https://www.pinterest.com/pin/{number}/', meta=dict(search_query=query, **meta))
+
+
+def search(query):
+    return Request(f'https://www.pinterest.com/search/pins/?q={query}', meta={'search_query': query})
+
+
+def drain(queue):
+    popped = []
+    while len(queue):
+        request = queue.pop()
+        popped.append((request.meta['search_query'], request.url.rstrip('/').rsplit('/', 1)[-1]))
+    return popped
+
+
+def test_queries_are_served_round_robin():
+    queue = fair_queue()
+    for number in range(4):
+        queue.push(pin('a', number))
+    for number in range(2):
+        queue.push(pin('b', 10 + number))
+    assert [query for query, _ in drain(queue)] == ['a', 'b', 'a', 'b', 'a', 'a']
+
+
+def test_priority_still_applies_within_a_query():
+    queue = fair_queue()
+    queue.push(pin('a', 1))
+    queue.push(Request('https://www.pinterest.com/pin/2/', priority=5, meta={'search_query': 'a'}))
+    assert [number for _, number in drain(queue)] == ['2', '1']
+
+
+def test_weights_share_downloads():
+    queue = fair_queue({'QUERY_WEIGHTS': {'b': 2}})
+    for number in range(6):
+        queue.push(pin('a', number))
+        queue.push(pin('b', 10 + number))
+    assert [query for query, _ in drain(queue)[:6]] == ['a', 'b', 'b', 'a', 'b', 'b']
+
+
+def test_search_pages_and_pin_pages_are_separate_groups():
+    queue = fair_queue({'SCHEDULER_DETAIL_WEIGHT': 3})
+    queue.push(search('a'))
+    queue.push(search('a'))
+    for number in range(3):
+        queue.push(pin('a', number))
+    kinds = ['search' if 'q=' in name else 'pin' for _, name in drain(queue)]
+    assert kinds == ['pin', 'search', 'pin', 'pin', 'search']
+
+
+def test_late_query_gets_no_back_credit():
+    queue = fair_queue()
+    for number in range(6):
+        queue.push(pin('a', number))
+    for _ in range(4):
+        queue.pop()
+    # b starts at the current virtual time instead of catching up on four pops
+    for number in range(3):
+        queue.push(pin('b', 10 + number))
+    assert [query for query, _ in drain(queue)] == ['b', 'a', 'b', 'a', 'b']
+
+
+def test_disk_queues_resume(tmp_path):
+    queue = fair_queue(queue_cls=PickleFifoDiskQueue, key=str(tmp_path))
+    queue.push(pin('home decor', 1))
+    queue.push(pin('kitchens?', 2))
+    startprios = queue.close()
+    assert set(startprios) == {'detail:home decor', 'detail:kitchens?'}
+
+    resumed = fair_queue(queue_cls=PickleFifoDiskQueue, key=str(tmp_path), startprios=startprios)
+    assert sorted(drain(resumed)) == [('home decor', '1'), ('kitchens?', '2')]
+
+
+def test_resume_needs_the_same_queue_class():
+    with pytest.raises(ValueError):
+        fair_queue(startprios=[0])
+
+
+@pytest.mark.parametrize('group', ['detail:home decor', 'discovery:', 'detail:día/de ñ?*'])
+def test_path_safe_names(group):
+    name = path_safe(group)
+    assert '/' not in name and ' ' not in name
+    assert name != path_safe(group + ' ')
+    if hasattr(scrapy.pqueues, '_path_safe'):
+        assert name == scrapy.pqueues._path_safe(group)  # earlier JOBDIRs still resume
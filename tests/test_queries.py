@@ -0,0 +1,103 @@
+import gzip
+import json
+
+import pytest
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.queries import QueryFrontier, iter_queries, normalize_query
+from pinterest_scraper.spiders.pinterest_search import PinterestSearchSpider
+
+
+def entries(path):
+    return [(entry['query'], entry['max_items']) for entry in iter_queries(str(path))]
+
+
+def test_text_file(tmp_path):
+    path = tmp_path / 'queries.txt'
+    path.write_text('home decor\n\n# skipped\n  kitchen ideas  \n')
+    assert entries(path) == [('home decor', None), ('kitchen ideas', None)]
+
+
+def test_csv_file_with_budgets_and_extra_columns(tmp_path):
+    path = tmp_path / 'queries.csv'
+    path.write_text('query,max_items,weight\nhome decor,50,2\nkitchen ideas,,\n,10,\nrugs,lots,\n')
+    assert entries(path) == [('home decor', 50), ('kitchen ideas', None), ('rugs', None)]
+    assert next(iter_queries(str(path)))['weight'] == '2'
+
+
+def test_jsonl_file(tmp_path):
+    path = tmp_path / 'queries.jsonl'
+    rows = [{'query': 'home decor', 'max_items': 5}, {'search_query': 'rugs'}, {'max_items': 3}]
+    path.write_text('\n'.join(json.dumps(row) for row in rows) + '\n\n')
+    assert entries(path) == [('home decor', 5), ('rugs', None)]
+    assert 'search_query' not in list(iter_queries(str(path)))[1]
+
+
+@pytest.mark.parametrize('name', ['queries.txt.gz', 'queries.csv.gz'])
+def test_gzip_files(tmp_path, name):
+    path = tmp_path / name
+    body = 'query\nhome decor\n' if '.csv' in name else 'home decor\n'
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        file.write(body)
+    assert entries(path) == [('home decor', None)]
+
+
+def test_spider_requests_carry_per_query_budgets(tmp_path):
+    path = tmp_path / 'queries.csv'
+    path.write_text('query,max_items\nhome decor,5\nrugs,\n')
+    crawler = get_crawler(PinterestSearchSpider)
+    spider = PinterestSearchSpider.from_crawler(crawler, queries_file=str(path), max_results=20)
+    metas = [spider.query_meta(entry, spider.max_results) for entry in spider.query_entries()]
+    assert metas == [
+        {'search_query': 'home decor', 'query_budget': 5},
+        {'search_query': 'rugs', 'query_budget': 20},
+    ]
+
+
+def drain(frontier):
+    popped = []
+    while True:
+        entry = frontier.pop()
+        if entry is None:
+            return popped
+        popped.append(entry)
+
+
+def test_suggestions_are_ranked_by_recurrence():
+    frontier = QueryFrontier()
+    frontier.add_seed('Home Decor')
+    frontier.observe(['kitchen ideas', 'rugs', 'home  decor'], depth=1)  # the seed is not a candidate
+    frontier.observe(['Kitchen Ideas', 'rugs', 'lamps'], depth=1)
+    frontier.observe(['kitchen ideas'], depth=2)
+    assert drain(frontier) == [('kitchen ideas', 1), ('rugs', 1), ('lamps', 1)]
+
+
+def test_ties_go_to_the_shallowest_query():
+    frontier = QueryFrontier()
+    frontier.observe(['deep'], depth=2)
+    frontier.observe(['shallow'], depth=1)
+    assert drain(frontier) == [('shallow', 1), ('deep', 2)]
+
+
+def test_queries_are_crawled_once_and_capped():
+    frontier = QueryFrontier(max_queries=3)
+    frontier.add_seed('seed')
+    frontier.observe(['a', 'b', 'c'], depth=1)
+    assert len(drain(frontier)) == 2  # the seed counts towards max_queries
+    assert frontier.exhausted()
+    frontier.observe(['a'], depth=1)
+    assert frontier.pop() is None
+
+
+def test_too_deep_or_too_rare_suggestions_wait():
+    frontier = QueryFrontier(max_depth=1, min_count=2)
+    frontier.observe(['rugs'], depth=2)
+    assert len(frontier) == 0
+    frontier.observe(['lamps'], depth=1)
+    assert frontier.pop() is None  # seen on one page only
+    frontier.observe(['lamps'], depth=1)
+    assert frontier.pop() == ('lamps', 1)
+
+
+def test_normalize_query():
+    assert normalize_query('  Home   DECOR ') == 'home decor'
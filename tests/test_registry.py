@@ -0,0 +1,50 @@
+from pinterest_scraper.registry import RequestRegistry
+
+
+def test_key_is_admitted_once():
+    registry = RequestRegistry()
+    assert registry.admit('pin:1', 'decor')
+    assert not registry.admit('pin:1', 'kitchens')  # found again under another query
+    assert registry.in_flight_count() == 1
+    assert registry.in_flight_count('decor') == 1
+    assert registry.in_flight_count('kitchens') == 0
+
+
+def test_completed_key_stays_known():
+    registry = RequestRegistry()
+    registry.admit('pin:1', 'decor')
+    assert registry.complete('pin:1') == 'decor'
+    assert 'pin:1' in registry
+    assert not registry.admit('pin:1', 'decor')
+    assert registry.in_flight_count('decor') == 0
+
+
+def test_released_key_frees_its_slot_and_can_be_retried():
+    registry = RequestRegistry()
+    registry.admit('pin:1', 'decor')
+    assert registry.release('pin:1') == 'decor'
+    assert 'pin:1' not in registry
+    assert registry.in_flight_count('decor') == 0
+    assert registry.admit('pin:1', 'decor')
+    assert registry.release('pin:2') is None  # never admitted
+
+
+def test_spares_replace_failed_requests_in_order():
+    registry = RequestRegistry()
+    registry.keep_spare('decor', 'pin:2', '/pin/2/', {'rank': 2})
+    registry.keep_spare('decor', 'pin:3', '/pin/3/', {'rank': 3})
+    registry.keep_spare('kitchens', 'pin:4', '/pin/4/', {})
+    registry.admit('pin:2', 'other')  # requested meanwhile under another query
+    assert registry.next_spare('decor') == ('pin:3', '/pin/3/', {'rank': 3})
+    assert registry.next_spare('decor') is None
+    assert registry.next_spare('unknown') is None
+
+
+def test_spares_are_bounded_and_skip_known_keys():
+    registry = RequestRegistry(spare_limit=2)
+    registry.admit('pin:1', 'decor')
+    registry.keep_spare('decor', 'pin:1', '/pin/1/', {})  # already requested
+    for number in range(2, 6):
+        registry.keep_spare('decor', f'pin:{number}', f'/pin/{number}/', {})
+    assert [registry.next_spare('decor')[0] for _ in range(2)] == ['pin:2', 'pin:3']
+    assert registry.next_spare('decor') is None
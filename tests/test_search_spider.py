@@ -0,0 +1,47 @@
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.spiders.pinterest_search import PinterestSearchSpider
+
+from conftest import saved_page
+
+
+def search_spider(**kwargs):
+    crawler = get_crawler(PinterestSearchSpider)
+    return PinterestSearchSpider.from_crawler(crawler, **kwargs)
+
+
+def search_page(name, spider, **meta):
+    url = 'https://www.pinterest.com/search/pins/?q=home+decor+ideas'
+    meta = dict(
+        search_query=spider.search_query, search_type='pins', search_url=url,
+        fetch_url=url, fetch_tier=0, **meta
+    )
+    return saved_page(name, url=url, meta=meta)
+
+
+def test_results_become_items():
+    spider = search_spider(max_results=2)
+    output = list(spider.parse_search_results(search_page('search_pins.html', spider)))
+    assert [item['result_id'] for item in output] == ['1099582627899271234', '1099582627899270001']
+    assert spider.fetch_strategy.learned_tiers == {'search': 0}
+
+
+def test_met_budget_does_not_escalate():
+    spider = search_spider(max_results=2)
+    spider.results_scraped = 2
+    output = list(spider.parse_search_results(search_page('search_pins.html', spider)))
+    assert output == []  # no items and no escalated request
+    assert spider.fetch_strategy.learned_tiers == {'search': 0}
+
+
+def test_empty_page_escalates():
+    spider = search_spider(max_results=2)
+    page = search_page('search_pins.html', spider)
+    empty = HtmlResponse(
+        page.url, body=b'<html><body>Loading...</body></html>', encoding='utf-8',
+        request=Request(page.url, meta=page.meta)
+    )
+    output = list(spider.parse_search_results(empty))
+    assert len(output) == 1
+    assert output[0].meta['fetch_tier'] == 1
@@ -0,0 +1,107 @@
+import threading
+from multiprocessing.connection import Listener
+
+import pytest
+from twisted.internet import defer, threads
+
+from pinterest_scraper.shard import Coordinator, CoordinatorClient, SharedBudget
+
+
+PIN = 'https://www.pinterest.com/pin/1/'
+
+
+def test_released_claim_goes_to_the_next_worker():
+    coordinator = Coordinator()
+    assert coordinator.claim(PIN, 0)
+    assert not coordinator.claim(PIN, 1)
+    assert coordinator.claim(PIN, 0)  # its own retry
+    coordinator.release(PIN, 1)  # not the holder: ignored
+    assert not coordinator.claim(PIN, 1)
+    coordinator.release(PIN, 0)
+    assert coordinator.claim(PIN, 1)
+
+
+def test_claims_expire_unless_the_page_was_fetched():
+    coordinator = Coordinator(claim_ttl=0)
+    assert coordinator.claim(PIN, 0)
+    assert coordinator.claim(PIN, 1)  # worker 0 never got the page
+    assert coordinator.expired == 1
+    coordinator.complete(PIN, 1)
+    coordinator.release(PIN, 1)  # too late: the page is fetched
+    assert not coordinator.claim(PIN, 2)
+    assert coordinator.duplicates == 1
+
+
+def test_client_round_trip():
+    coordinator = Coordinator(credit_budget=10)
+    listener = Listener(('127.0.0.1', 0), authkey=b'secret')
+    threading.Thread(target=coordinator.serve, args=(listener,), daemon=True).start()
+    client = CoordinatorClient('%s:%d' % listener.address, 'secret')
+    try:
+        assert client.call('claim', PIN, 0) is True
+        assert client.call('claim', PIN, 1) is False
+        assert client.call('release', PIN, 0) is True
+        assert client.call('claim', PIN, 1) is True
+        assert client.call('reserve', 8) == 8
+        assert client.call('reserve', 8) == 2  # what is left
+        assert client.call('refund', 2) is True
+        assert coordinator.credits_spent == 8
+    finally:
+        client.close()
+        listener.close()
+
+
+@pytest.fixture
+def client():
+    coordinator = Coordinator(credit_budget=250)
+    listener = Listener(('127.0.0.1', 0), authkey=b'secret')
+    threading.Thread(target=coordinator.serve, args=(listener,), daemon=True).start()
+    client = CoordinatorClient('%s:%d' % listener.address, 'secret')
+    client.coordinator = coordinator
+    calls = []
+    call = client.call
+    client.call = lambda op, *args: calls.append(op) or call(op, *args)
+    client.calls = calls
+    yield client
+    client.close()
+    listener.close()
+
+
+@pytest.fixture
+def refill_now(monkeypatch):
+    """Run the refills' coordinator calls at once instead of in a thread"""
+    monkeypatch.setattr(threads, 'deferToThread', lambda f, *args: defer.maybeDeferred(f, *args))
+
+
+def test_credits_are_spent_from_a_local_reservation(client, refill_now):
+    budget = SharedBudget(client, batch=100)
+    assert all(budget.spend(10) for _ in range(20))
+    # 200 credits in 20 requests: two batches, refilled half way through each
+    assert client.calls == ['reserve', 'reserve', 'reserve']
+    assert client.coordinator.credits_spent == 250  # the third batch got what was left
+
+
+def test_budget_runs_out_across_workers(client, refill_now):
+    workers = [SharedBudget(client, batch=100), SharedBudget(client, batch=100)]
+    requests = 0
+    for _ in range(10):
+        requests += sum(worker.spend(25) for worker in workers)
+    assert all(worker.exhausted for worker in workers)
+    for worker in workers:
+        worker.close()
+    assert requests * 25 == client.coordinator.credits_spent <= 250
+
+
+def test_unspent_credits_are_refunded(client):
+    budget = SharedBudget(client, batch=100)
+    budget.refill = lambda: None  # no reactor here
+    assert budget.spend(25)
+    budget.close()
+    assert client.coordinator.credits_spent == 25
+
+
+def test_large_request_reserves_what_it_needs(client):
+    budget = SharedBudget(client, batch=10)
+    budget.refill = lambda: None
+    assert budget.spend(25)
+    assert budget.reserved == 0
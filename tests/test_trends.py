@@ -0,0 +1,71 @@
+import os
+import shutil
+
+from pinterest_scraper.trends import Segment, TrendStore
+
+
+DAY = 86400.0
+
+
+def fill(store, days, start=0):
+    for day in range(start, start + days):
+        store.append('Christmas Decor', position=1 + day % 5, timestamp=day * DAY)
+        store.append('Spring Nails', position=10, timestamp=day * DAY)
+
+
+def segment_names(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('segment-'))
+
+
+def test_merge_keeps_every_row(tmp_path):
+    store = TrendStore(str(tmp_path), compact_every=4, max_segments=2)
+    fill(store, 10)
+    series = store.series('christmas decor')
+    assert len(series) == 10 and [ts for ts, _, _ in series] == sorted(ts for ts, _, _ in series)
+    assert len(store.segments) <= 2
+    store.close()
+
+    reopened = TrendStore(str(tmp_path))
+    assert reopened.series('christmas decor') == series
+    assert len(reopened.series('spring nails')) == 10
+    reopened.close()
+
+
+def test_crash_after_merge_write_loses_nothing(tmp_path):
+    store = TrendStore(str(tmp_path), compact_every=2, max_segments=10)
+    fill(store, 3)  # three segments of two rows
+    store.close()
+    old = segment_names(tmp_path)
+    assert len(old) == 3
+
+    # The process dies after the merged segment is written, before the old ones are deleted
+    backup = tmp_path / 'backup'
+    for name in old:
+        shutil.copytree(tmp_path / name, backup / name)
+    store = TrendStore(str(tmp_path), compact_every=2, max_segments=10)
+    store.merge_segments()
+    store.close()
+    for name in old:
+        shutil.copytree(backup / name, tmp_path / name)
+
+    reopened = TrendStore(str(tmp_path))
+    assert len(reopened.series('christmas decor')) == 3  # not counted twice
+    assert segment_names(tmp_path) == ['segment-000004']
+    assert Segment(str(tmp_path / 'segment-000004')).sources == old
+    reopened.close()
+
+
+def test_stores_sharing_a_directory_keep_each_others_rows(tmp_path):
+    first = TrendStore(str(tmp_path), compact_every=3, max_segments=2)
+    second = TrendStore(str(tmp_path), compact_every=3, max_segments=2)
+    for day in range(6):
+        first.append('Christmas Decor', position=1, timestamp=day * DAY)
+        second.append('Spring Nails', position=2, timestamp=day * DAY)
+    first.close()
+    second.close()
+
+    reopened = TrendStore(str(tmp_path))
+    assert len(reopened.series('christmas decor')) == 6
+    assert len(reopened.series('spring nails')) == 6
+    assert reopened.names and set(reopened.names.values()) == {'Christmas Decor', 'Spring Nails'}
+    reopened.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from pinterest_scraper.urls import (
+    board_path, board_url, cache_info, canonical_url, is_canonical, is_valid_url, parse_username, url_key
+)
+
+
+@pytest.mark.parametrize('url, canonical', [
+    ('/pin/123/?mt=login', 'https://www.pinterest.com/pin/123/'),
+    ('https://de.pinterest.com/pin/123/comments/', 'https://www.pinterest.com/pin/123/'),
+    ('https://pinterest.com/jane/kitchen', 'https://www.pinterest.com/jane/kitchen/'),
+    ('https://www.pinterest.com/jane/?rs=rp#top', 'https://www.pinterest.com/jane/'),
+    ('/search/pins/?q=home+decor', 'https://www.pinterest.com/search/pins/?q=home+decor'),
+    ('https://example.com/page', 'https://example.com/page'),
+])
+def test_canonical_url(url, canonical):
+    assert canonical_url(url) == canonical
+    assert is_canonical(canonical) or not canonical.startswith('https://www.pinterest.com/')
+    assert not is_canonical(url)
+
+
+def test_canonical_urls_pass_through_unchanged():
+    for url in ('https://www.pinterest.com/pin/1/', 'https://www.pinterest.com/', 'https://www.pinterest.com/Jane/Kitchen/'):
+        assert is_canonical(url) and canonical_url(url) == url
+
+
+def test_keys_and_paths():
+    assert url_key('https://www.pinterest.com/pin/42/') == url_key('/pin/42/?rs=rp') == 'pin:42'
+    assert url_key('/board/Jane/Kitchen/') == 'board:jane/kitchen'
+    assert board_path('https://www.pinterest.com/Jane/Kitchen/') == 'jane/kitchen'
+    assert board_path('https://www.pinterest.com/jane/') is None
+    assert board_url('/Jane/Kitchen/') == 'https://www.pinterest.com/board/Jane/Kitchen/'
+
+
+@pytest.mark.parametrize('value, username', [
+    ('Jane', 'jane'),
+    ('@jane', 'jane'),
+    ('https://de.pinterest.com/Jane/', 'jane'),
+    ('https://www.pinterest.com/user/jane/', 'jane'),
+    ('/jane/', 'jane'),
+    ('https://www.pinterest.com/jane/kitchen/', None),
+    ('https://example.com/jane/', None),
+    ('search', None),
+    ('user', None),  # a site path, as in url_key()
+    ('a b', None),
+])
+def test_parse_username(value, username):
+    assert parse_username(value) == username
+
+
+def test_is_valid_url_is_cached():
+    is_valid_url.cache_clear()
+    assert is_valid_url('https://www.pinterest.com/pin/1/')
+    assert is_valid_url('https://www.pinterest.com/pin/1/')
+    assert not is_valid_url('/pin/1/')
+    info = cache_info()['is_valid_url']
+    assert (info.hits, info.misses) == (1, 2)
@@ -0,0 +1,74 @@
+import pytest
+from scrapy.utils.test import get_crawler
+
+from pinterest_scraper.shard import shard_of
+from pinterest_scraper.spiders.pinterest_users import PinterestUsersSpider
+from pinterest_scraper.users import UserStateStore, batched, iter_usernames
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fresh_profiles_are_skipped_until_they_age(tmp_path):
+    clock = Clock()
+    store = UserStateStore(str(tmp_path / 'users.db'), clock=clock)
+    store.mark('jane', '42')
+    clock.now += 100
+    store.mark('bob')
+    assert store.fresh(['jane', 'bob', 'ann'], max_age=150) == {'jane', 'bob'}
+    assert store.fresh(['jane', 'bob', 'ann'], max_age=50) == {'bob'}
+    assert store.fresh(['jane'], max_age=0) == set()  # refresh everything
+    assert store.fresh([], max_age=150) == set()
+
+    store.mark('jane')  # fetched again
+    assert store.fresh(['jane'], max_age=50) == {'jane'}
+    assert len(store) == 2
+    store.close()
+
+
+def test_state_is_kept_across_runs(tmp_path):
+    path = str(tmp_path / 'state' / 'users.db')
+    store = UserStateStore(path, commit_every=500)
+    store.mark('jane', '42')
+    store.close()  # commits the pending marks
+
+    reopened = UserStateStore(path)
+    assert reopened.fresh(['jane'], max_age=3600) == {'jane'}
+    assert reopened.db.execute('SELECT user_id FROM users').fetchone() == ('42',)
+    reopened.close()
+
+
+def test_usernames_file_formats(tmp_path):
+    text = tmp_path / 'users.txt'
+    text.write_text('jane\n# comment\nhttps://www.pinterest.com/Bob/\n@ann\nhttps://www.pinterest.com/pin/1/\n')
+    assert list(iter_usernames(str(text))) == ['jane', 'bob', 'ann']
+
+    jsonl = tmp_path / 'pins.jsonl'
+    jsonl.write_text('{"pinner_url": "https://www.pinterest.com/jane/"}\n{"owner_username": "Bob"}\n')
+    assert list(iter_usernames(str(jsonl))) == ['jane', 'bob']
+
+    csv = tmp_path / 'pins.csv'
+    csv.write_text('pin_url,pinner_username,pinner_url\n'
+                   'https://www.pinterest.com/pin/1/,jane,https://www.pinterest.com/jane/\n')
+    assert list(iter_usernames(str(csv))) == ['jane', 'jane']
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.parametrize('index', [0, 1])
+def test_usernames_file_is_split_between_shards(tmp_path, index):
+    names = ['user%02d' % number for number in range(20)]
+    path = tmp_path / 'users.txt'
+    path.write_text('\n'.join(names))
+    crawler = get_crawler(PinterestUsersSpider, {'SHARD_INDEX': index, 'SHARD_COUNT': 2})
+    spider = PinterestUsersSpider.from_crawler(crawler, usernames_file=str(path), usernames='jane')
+    assert spider.sharded_input()
+    expected = [name for name in names if shard_of(name, 2) == index]
+    assert list(spider.username_stream()) == (['jane'] if index == 0 else []) + expected
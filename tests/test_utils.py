@@ -0,0 +1,74 @@
+import pytest
+
+from benchmarks.extraction import (
+    DIFFERENCES, count_corpus, legacy_board_id, legacy_pipeline_number, legacy_result_id, legacy_spider_number
+)
+from pinterest_scraper.utils import (
+    extract_board_id, extract_domain, extract_hashtags, extract_pin_id, extract_price, extract_result_id,
+    parse_number, parse_numbers
+)
+
+
+COUNTS = [
+    '', None, '0', '7', '1,234', '12,345,678', '1.2k', '3.4K', '2M', '1.5b', '999', 'N/A', 'abc',
+    '1,234 saves', '56 Pins', '3,400 followers', ' 12 ', 'k',
+]
+# Counts both spiders and DataValidationPipeline could parse: no trailing words
+PLAIN_COUNTS = ['0', '7', '1,234', '12,345,678', '1.2k', '3.4K', '2M', '1.5b', '999', 'N/A', '', ' 12 ']
+
+
+@pytest.mark.parametrize('text', COUNTS + count_corpus(100, seed=1))
+def test_parse_number_matches_the_spiders(text):
+    assert parse_number(text) == legacy_spider_number(text)
+
+
+@pytest.mark.parametrize('text', PLAIN_COUNTS + [value for value in count_corpus(100, seed=2) if value[-1:].isdigit()])
+def test_parse_number_matches_the_pipeline(text):
+    assert parse_number(text) == legacy_pipeline_number(text)
+
+
+@pytest.mark.parametrize('value', [0, 12, 3.5])
+def test_numbers_pass_through(value):
+    assert parse_number(value) == legacy_pipeline_number(value) == value
+
+
+@pytest.mark.parametrize('text, spiders, pipeline, now', DIFFERENCES)
+def test_deliberate_differences(text, spiders, pipeline, now):
+    assert (legacy_spider_number(text), legacy_pipeline_number(text)) == (spiders, pipeline)
+    assert parse_number(text) == now
+
+
+def test_parse_numbers():
+    assert parse_numbers(['1.2k', '', 5, '3,400 saves']) == [1200, 0, 5, 3400]
+
+
+@pytest.mark.parametrize('search_type, url', [
+    ('pins', 'https://www.pinterest.com/pin/1234567890/'),
+    ('pins', '/pin/42/'),
+    ('pins', '/pin/abc/'),
+    ('boards', 'https://www.pinterest.com/alice/recipes/'),
+    ('boards', '/alice/recipes/'),
+    ('boards', '/alice/recipes'),
+    ('users', 'https://www.pinterest.com/alice/'),
+    ('users', '/alice/'),
+    ('users', '/alice'),
+])
+def test_result_ids_match_the_search_spider(search_type, url):
+    assert extract_result_id(url, search_type) == legacy_result_id(url, search_type)
+
+
+def test_board_id_drops_the_board_prefix():
+    url = 'https://www.pinterest.com/board/alice/recipes/'
+    assert legacy_board_id(url) == 'alice/'
+    assert extract_board_id(url) == 'alice/recipes'
+    assert extract_board_id('https://www.pinterest.com/alice/') == ''
+
+
+def test_pin_page_helpers():
+    assert extract_pin_id('https://www.pinterest.com/pin/123/?mt=login') == '123'
+    assert extract_pin_id('https://www.pinterest.com/alice/') == ''
+    assert extract_domain('https://shop.example.com/item?id=1') == 'shop.example.com'
+    assert extract_domain('not a url') == ''
+    assert extract_hashtags('Cozy #kitchen ideas #DIY') == ['kitchen', 'DIY']
+    assert extract_price('Now $1,299.99 (was $1,500)') == '$1,299.99'
+    assert extract_price('Free') == ''